@@ -0,0 +1,70 @@
+"""
+Сравнение форматирования дат: прежний datetime_convert (fromisoformat и strftime на каждый вызов)
+и contests.dates.datetime_convert (кэш по строке даты и формату, сборка строки без strftime).
+
+Даты повторяются так же, как в списках конкурсов: много элементов и немного различных сроков.
+Запуск из каталога step с теми же переменными окружения, что и для manage.py:
+
+    python benchmarks/bench_dates.py [--items 10000] [--distinct 50] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'step.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from contests.dates import DATE_FORMAT, HISTORY_DATE_FORMAT, datetime_convert, formatted_date  # noqa: E402
+
+
+def previous_datetime_convert(date, format_date='%d.%m.%Y'):
+    """ Прежняя реализация из contests.services """
+    if date is None or not date:
+        result = date
+    else:
+        result = datetime.fromisoformat(date.rstrip("Z") + "+00:00").strftime(format_date)
+    return result
+
+
+def measure(function, dates, date_format: str, repeat: int) -> float:
+    """ Лучшее из repeat время одного преобразования, в наносекундах """
+    timer = timeit.Timer(lambda: [function(date, date_format) for date in dates])
+    return min(timer.repeat(repeat=repeat, number=1)) / len(dates) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10000, help="Число дат в одном прогоне")
+    parser.add_argument('--distinct', type=int, default=50, help="Число различных дат")
+    parser.add_argument('--repeat', type=int, default=5, help="Число прогонов (берется лучший)")
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1, 21, 0)
+    distinct = [(start + timedelta(days=day)).isoformat() + 'Z' for day in range(args.distinct)]
+    dates = [random.choice(distinct) for _ in range(args.items)] + [None, '']
+
+    print(f"дат в прогоне: {len(dates)}, различных: {args.distinct}, прогонов: {args.repeat}")
+    for date_format in (DATE_FORMAT, HISTORY_DATE_FORMAT):
+        for date in distinct:
+            assert datetime_convert(date, date_format) == previous_datetime_convert(date, date_format)
+        previous_time = measure(previous_datetime_convert, dates, date_format, args.repeat)
+        formatted_date.cache_clear()
+        current_time = measure(datetime_convert, dates, date_format, args.repeat)
+        formatted_date.cache_clear()
+        cold_time = measure(lambda date, fmt: date and formatted_date.__wrapped__(date, fmt), dates, date_format,
+                            args.repeat)
+        print(f"{date_format!r}:")
+        print(f"  прежний datetime_convert:   {previous_time:8.0f} нс")
+        print(f"  datetime_convert с кэшем:   {current_time:8.0f} нс (x{previous_time / current_time:.1f})")
+        print(f"  без кэша (промах):          {cold_time:8.0f} нс (x{previous_time / cold_time:.1f})")
+
+
+if __name__ == '__main__':
+    main()
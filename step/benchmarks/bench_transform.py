@@ -0,0 +1,94 @@
+"""
+Сравнение преобразования конкурса из Райды для страницы конкурса: прежний путь через ContestsSerializer
+(валидация, save() в датакласс Contest, __dict__) и contests.transform.contest_details.
+
+Запуск из каталога step с теми же переменными окружения, что и для manage.py:
+
+    python benchmarks/bench_transform.py [--items 1000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'step.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.utils.encoders import JSONEncoder  # noqa: E402
+
+from contests.serializers import ContestsSerializer  # noqa: E402
+from contests.transform import contest_details, contest_item  # noqa: E402
+
+
+def raida_contest(index: int) -> dict:
+    """ Конкурс в формате ответа Райды """
+    return {
+        'id': str(uuid.uuid4()),
+        'title': f'Конкурс {index}',
+        'description': 'Описание конкурса ' * 20,
+        'created_at': '2024-05-17T10:00:00Z',
+        'updated_at': '2024-05-18T10:00:00Z',
+        'process': {'id': str(uuid.uuid4())},
+        'status': {'id': str(uuid.uuid4()), 'name': 'Прием работ'},
+        'custom_fields': {
+            'cf_brief': 'Бриф',
+            'cf_profession': 'Дизайнер',
+            'cf_deadline': '2024-06-30T21:00:00Z',
+            'cf_award': '100000',
+            'cf_konkurs_category': 'Графика',
+            'cf_projects': 'Проект',
+        },
+        'attachments': [{'id': str(uuid.uuid4()), 'name': f'file{i}.pdf', 'url': 'https://example.com'} for i in range(3)],
+    }
+
+
+def serializer_contest_data(response_data: dict) -> dict:
+    """ Прежнее преобразование через сериализатор DRF """
+    serializer = ContestsSerializer(data=response_data)
+    serializer.is_valid()
+    return serializer.save().__dict__
+
+
+def as_json(data) -> str:
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, sort_keys=True)
+
+
+def measure(function, contests, repeat: int) -> float:
+    """ Лучшее из repeat время преобразования одного конкурса, в микросекундах """
+    timer = timeit.Timer(lambda: [function(contest) for contest in contests])
+    return min(timer.repeat(repeat=repeat, number=1)) / len(contests) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1000, help="Число конкурсов в одном прогоне")
+    parser.add_argument('--repeat', type=int, default=5, help="Число прогонов (берется лучший)")
+    args = parser.parse_args()
+
+    contests = [raida_contest(index) for index in range(args.items)]
+    # результат должен совпадать с прежним после рендеринга в JSON (UUID из сериализатора становится строкой)
+    for contest in contests[:100]:
+        assert as_json(contest_details(contest)) == as_json(serializer_contest_data(contest))
+
+    serializer_time = measure(serializer_contest_data, contests, args.repeat)
+    details_time = measure(contest_details, contests, args.repeat)
+    details_unchecked_time = measure(contest_details._transform, contests, args.repeat)
+    item_time = measure(contest_item, contests, args.repeat)
+
+    print(f"конкурсов в прогоне: {args.items}, прогонов: {args.repeat}")
+    print(f"ContestsSerializer:                    {serializer_time:8.2f} мкс/конкурс")
+    print(f"contest_details (с проверкой):         {details_time:8.2f} мкс/конкурс "
+          f"(x{serializer_time / details_time:.1f})")
+    print(f"contest_details (без проверки):        {details_unchecked_time:8.2f} мкс/конкурс "
+          f"(x{serializer_time / details_unchecked_time:.1f})")
+    print(f"contest_item (элемент списка):         {item_time:8.2f} мкс/конкурс")
+
+
+if __name__ == '__main__':
+    main()
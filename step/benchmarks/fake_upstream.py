@@ -0,0 +1,462 @@
+"""
+Локальная замена Райды и сервиса конфигов для нагрузочного тестирования (benchmarks/load_test.py).
+
+HTTP-сервер в отдельном потоке отвечает на те же запросы, что делает приложение: конфиги проекта,
+сервисный токен, RQL-запросы конкурсов и заявок, получение, создание и изменение задач, вложения.
+Данные генерируются детерминированно по числу конкурсов, размеру описания и числу заявок, ответы
+задерживаются на заданное время. Сервер считает полученные запросы по видам (FakeUpstream.calls) и хранит
+последние запросы (FakeUpstream.requests); на следующие запросы вида можно ответить ошибкой (FakeUpstream.fail),
+так фейковые сервисы используются и в тестах (contests/tests).
+
+Заявки пользователя создаются при первом обращении: у каждого пользователя есть заявки на первые
+participations конкурсов (первая - без решения, остальные - с отправленным решением), поэтому
+запросы на запись можно выполнять от имени новых пользователей без сброса состояния.
+
+Отдельный запуск - для ручной проверки приложения, запущенного как обычно (runserver, gunicorn, uvicorn):
+
+    python benchmarks/fake_upstream.py [--port 8081] [--contests 200] [--latency-ms 20] --key-file bench.pem
+
+Команда печатает переменные окружения, с которыми нужно запустить приложение (с --env только печатает их);
+токены пользователей подписываются ключом из --key-file. load_test.py с параметром --target сам запускает
+фейковые сервисы на --upstream-port.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+NAMESPACE = uuid.UUID('6f1c2a57-3b1e-4a44-9c55-0f6b1b0d7a10')
+
+PROJECT_ID = '5a3d7c1e-2b4f-4e8a-9d6c-1f0e2a3b4c5d'
+
+
+def fake_id(*parts) -> str:
+    """ Постоянный UUID для сущности фейковой Райды """
+    return str(uuid.uuid5(NAMESPACE, ':'.join(map(str, parts))))
+
+
+NODE_ID = fake_id('node')
+CONTEST_PROCESS_ID = fake_id('process', 'contest')
+TASK_PROCESS_ID = fake_id('process', 'task')
+
+CONTEST_STATUSES = {name: fake_id('contest_status', name) for name in (
+    'acceptance_works', 'acceptance_works_done', 'voting', 'sum_results', 'done', 'no_winner')}
+TASK_STATUSES = {name: fake_id('task_status', name) for name in ('new', 'approved', 'completed', 'rejection')}
+STATUS_NAMES = {
+    CONTEST_STATUSES['acceptance_works']: 'Прием работ',
+    CONTEST_STATUSES['acceptance_works_done']: 'Прием работ завершен',
+    CONTEST_STATUSES['voting']: 'Голосование',
+    CONTEST_STATUSES['sum_results']: 'Подведение итогов',
+    CONTEST_STATUSES['done']: 'Завершен',
+    CONTEST_STATUSES['no_winner']: 'Завершен без победителя',
+    TASK_STATUSES['new']: 'Новая',
+    TASK_STATUSES['approved']: 'Одобрена',
+    TASK_STATUSES['completed']: 'Задание выполнено',
+    TASK_STATUSES['rejection']: 'Отказ',
+}
+
+CONFIGS = {
+    'node_id': {'value': NODE_ID},
+    'contest_process_id': {'value': CONTEST_PROCESS_ID},
+    'task_process_id': {'value': TASK_PROCESS_ID},
+    'contest_status_id': CONTEST_STATUSES,
+    'task_status_id': TASK_STATUSES,
+}
+
+QUOTED = re.compile(r"'([^']*)'")
+CONDITIONS = {
+    name: re.compile(rf"{re.escape(field)} (?:IN \(([^)]*)\)|= ('[^']*'))")
+    for name, field in (('process', 'process.id'), ('status', 'status.id'), ('contest', 'cf_konkurs_id'),
+                        ('user', 'cf_userid'), ('project', 'cf_projects'))
+}
+
+
+class TokenIssuer:
+    """ Пара ключей RS256: приложение проверяет подписью открытого ключа токены пользователей нагрузки """
+
+    def __init__(self, private_key=None):
+        self.private_key = private_key or rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'TokenIssuer':
+        """ Ключ из файла PEM; если файла нет, ключ создается и сохраняется """
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                return cls(serialization.load_pem_private_key(file.read(), password=None))
+        issuer = cls()
+        with open(path, 'wb') as file:
+            file.write(issuer.private_key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        return issuer
+
+    @property
+    def public_key(self) -> str:
+        """ Открытый ключ в формате ACCESS_TOKEN_PUBLIC_KEY (переводы строк как \\n) """
+        pem = self.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+        return pem.strip().replace('\n', '\\n')
+
+    def token(self, user_id: str, ttl: int = 3600) -> str:
+        payload = {'sub': {'user_id': user_id}, 'exp': int(time.time()) + ttl}
+        return jwt.encode(payload, self.private_key, algorithm='RS256')
+
+
+def project(item: Dict, fields: List[str]) -> Dict:
+    """ Проекция полей задачи, как в RQL-запросе с fields (вложенные поля через точку) """
+    if not fields:
+        return item
+    result = {}
+    for field in fields:
+        source, target = item, result
+        *path, name = field.split('.')
+        for part in path:
+            source = (source or {}).get(part)
+            target = target.setdefault(part, {})
+        if isinstance(source, dict) and name in source:
+            target[name] = source[name]
+    return result
+
+
+class InjectedFault(Exception):
+    """ Ответ на запрос ошибкой, заданной через FakeUpstream.fail """
+
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+def condition(rql: str, name: str) -> Optional[set]:
+    """ Значения условия name из RQL-запроса (None, если условия нет) """
+    match = CONDITIONS[name].search(rql)
+    if match is None:
+        return None
+    return set(QUOTED.findall(match.group(1) or match.group(2)))
+
+
+class FakeUpstream:
+    """ Данные и счетчики фейковых Райды и сервиса конфигов """
+
+    def __init__(
+            self,
+            contests: int = 200,
+            description_bytes: int = 1000,
+            tasks_per_contest: int = 20,
+            participations: int = 12,
+            latency_ms: float = 20,
+            jitter_ms: float = 5,
+    ):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.participations = min(participations, contests)
+        statuses = list(CONTEST_STATUSES.values())
+        self.contests = [self.contest(index, statuses[index % len(statuses)], description_bytes)
+                         for index in range(contests)]
+        self.contests_by_id = {contest['id']: contest for contest in self.contests}
+        self.contest_tasks = {
+            contest['id']: [self.task(fake_id('participant', index), contest['id'], TASK_STATUSES['completed'])
+                            for index in range(tasks_per_contest)]
+            for contest in self.contests
+        }
+        self.tasks_by_id = {task['id']: task for tasks in self.contest_tasks.values() for task in tasks}
+        self.user_tasks: Dict[str, List[Dict]] = {}
+        self.calls: Counter = Counter()
+        # последние запросы (метод, путь, тело) и ошибки, которыми нужно ответить на следующие запросы вида
+        self.requests: deque = deque(maxlen=256)
+        self.faults: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def contest(index: int, status_id: str, description_bytes: int) -> Dict:
+        contest_id = fake_id('contest', index)
+        return {
+            'id': contest_id,
+            'title': f'Конкурс {index}',
+            'description': ('Описание конкурса. ' * (description_bytes // 19 + 1))[:description_bytes],
+            'created_at': '2024-11-06T10:00:00Z',
+            'updated_at': '2024-11-07T10:00:00Z',
+            'author': None,
+            'assignee': None,
+            'process': {'id': CONTEST_PROCESS_ID},
+            'status': {'id': status_id, 'name': STATUS_NAMES[status_id]},
+            'custom_fields': {
+                'cf_deadline': '2024-12-28T21:00:00Z',
+                'cf_award': '100000',
+                'cf_brief': 'Бриф конкурса',
+                'cf_profession': 'Дизайнер',
+                'cf_konkurs_category': 'Графика',
+                'cf_projects': PROJECT_ID,
+            },
+            'attachments': [{'id': fake_id('attachment', contest_id, number), 'name': f'brief{number}.pdf',
+                             'url': f'https://files.example.com/{contest_id}/{number}', 'content_type': 'application/pdf'}
+                            for number in range(2)],
+        }
+
+    @staticmethod
+    def task(user_id: str, contest_id: str, status_id: str) -> Dict:
+        return {
+            'id': fake_id('task', user_id, contest_id),
+            'title': '',
+            'description': '',
+            'created_at': '2024-11-10T10:00:00Z',
+            'process': {'id': TASK_PROCESS_ID},
+            'status': {'id': status_id, 'name': STATUS_NAMES[status_id]},
+            'custom_fields': {'cf_konkurs_id': contest_id, 'cf_userid': user_id,
+                              'solution_link': 'https://example.com/solution'},
+        }
+
+    def participation(self, user_id: str) -> List[Dict]:
+        """ Заявки пользователя (создаются при первом обращении) """
+        with self._lock:
+            tasks = self.user_tasks.get(user_id)
+            if tasks is None:
+                tasks = self.user_tasks[user_id] = [
+                    self.task(user_id, contest['id'], TASK_STATUSES['new' if index == 0 else 'completed'])
+                    for index, contest in enumerate(self.contests[:self.participations])
+                ]
+                self.tasks_by_id.update((task['id'], task) for task in tasks)
+            return tasks
+
+    @staticmethod
+    def user_task_id(user_id: str, contest_index: int = 0) -> str:
+        """ id заявки пользователя на конкурс contest_index (из первых participations) """
+        return fake_id('task', user_id, fake_id('contest', contest_index))
+
+    def record(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+            faults = self.faults.get(kind)
+            if faults:
+                raise InjectedFault(faults.pop(0))
+
+    def fail(self, kind: str, *statuses: int):
+        """ Ответить на следующие запросы вида kind (rql, patch_task, configs...) статусами statuses по очереди """
+        with self._lock:
+            self.faults.setdefault(kind, []).extend(statuses)
+
+    def reset(self):
+        """ Сброс счетчиков, журнала запросов и заданных ошибок (заявки пользователей сохраняются) """
+        with self._lock:
+            self.calls.clear()
+            self.requests.clear()
+            self.faults.clear()
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.calls)
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def rql(self, query: Dict) -> List[Dict]:
+        rql = query.get('rql', '')
+        processes = condition(rql, 'process') or set()
+        statuses = condition(rql, 'status')
+        contests = condition(rql, 'contest')
+        users = condition(rql, 'user')
+        if CONTEST_PROCESS_ID in processes:
+            items = self.contests
+        elif users is not None:
+            items = [task for user_id in users for task in self.participation(user_id)]
+        elif contests is not None:
+            items = [task for contest_id in contests for task in self.contest_tasks.get(contest_id, [])]
+        else:
+            items = []
+        if statuses is not None:
+            items = [item for item in items if item['status']['id'] in statuses]
+        if contests is not None:
+            items = [item for item in items if item['custom_fields'].get('cf_konkurs_id') in contests]
+        return [project(item, query.get('fields') or []) for item in items]
+
+    def handle(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """ Ответ (статус, тело) на запрос приложения """
+        with self._lock:
+            self.requests.append((method, path, body))
+        try:
+            return self.route(method, path, body)
+        except InjectedFault as fault:
+            return fault.status, {'detail': f'Injected fault {fault.status}'}
+
+    def route(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, Dict]:
+        parts = [part for part in urlsplit(path).path.split('/') if part]
+        if parts[:1] == ['configs'] and method == 'GET':
+            self.record('configs')
+            types = parts[1].split(',') if len(parts) > 1 else []
+            return 200, {'data': {name: CONFIGS[name] for name in types if name in CONFIGS}}
+        if parts[:3] == ['api', 'users', 'token'] and method == 'POST':
+            self.record('token')
+            # jti делает каждый выданный токен новым, даже если он получен в ту же секунду
+            payload = {'exp': int(time.time()) + 3600, 'jti': uuid.uuid4().hex}
+            return 200, {'access_token': jwt.encode(payload, 'raida', algorithm='HS256')}
+        if parts[:3] == ['api', 'tasks', 'rql'] and method == 'POST':
+            self.record('rql')
+            return 200, {'data': self.rql(body or {})}
+        if parts[:2] == ['api', 'tasks'] and len(parts) == 4:
+            entity_id = parts[3]
+            if method == 'GET':
+                self.record('get_task')
+                item = self.contests_by_id.get(entity_id) or self.tasks_by_id.get(entity_id)
+                return (200, {'data': item}) if item else (404, {'detail': 'Not found'})
+            if method == 'POST':
+                self.record('create_task')
+                fields = (body or {}).get('custom_fields', {})
+                task = self.task(fields.get('cf_userid'), fields.get('cf_konkurs_id'), (body or {}).get('status_id'))
+                return 201, {'data': {**task, 'id': str(uuid.uuid4())}}
+            if method == 'PATCH':
+                self.record('patch_task')
+                task = self.tasks_by_id.get(entity_id)
+                if task is None:
+                    return 404, {'detail': 'Not found'}
+                status_id = (body or {}).get('status_id') or task['status']['id']
+                return 200, {'data': {**task, 'status': {'id': status_id, 'name': STATUS_NAMES.get(status_id, '')},
+                                      'custom_fields': {**task['custom_fields'], **(body or {}).get('custom_fields', {})}}}
+        if parts[:2] == ['api', 'attachments'] and len(parts) == 4:
+            if method == 'GET':
+                self.record('get_attachments')
+                return 200, {'data': [{'id': fake_id('solution', parts[3]), 'name': 'solution.zip',
+                                       'url': f'https://files.example.com/{parts[3]}', 'content_type': 'application/zip'}]}
+            if method == 'POST':
+                self.record('post_attachment')
+                return 200, {'data': {'id': str(uuid.uuid4()), 'name': 'solution.zip'}}
+        self.record('unknown')
+        return 404, {'detail': 'Not found'}
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeUpstreamServer'
+
+    def read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def respond(self):
+        raw = self.read_body()
+        body = None
+        if raw and self.headers.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(raw)
+        upstream = self.server.upstream
+        upstream.delay()
+        status, data = upstream.handle(self.command, self.path, body)
+        content = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    """ HTTP-сервер FakeUpstream в фоновом потоке (Райда и сервис конфигов по одному адресу) """
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, upstream: FakeUpstream, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), FakeUpstreamHandler)
+        self.upstream = upstream
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeUpstreamServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def environment(url: str, issuer: TokenIssuer) -> Dict[str, str]:
+    """ Переменные окружения приложения для работы с фейковыми сервисами """
+    return {
+        'BASE_URL': url,
+        'CONFIGS_SERVICE_URL': url,
+        'USER_RAIDA': 'bench',
+        'PASSWD_RAIDA': 'bench',
+        'JWT_ALGORITHM': 'RS256',
+        'ACCESS_TOKEN_PUBLIC_KEY': issuer.public_key,
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """ Параметры данных и задержки фейковых сервисов (общие с load_test.py) """
+    parser.add_argument('--contests', type=int, default=200, help="Число конкурсов в Райде")
+    parser.add_argument('--description-bytes', type=int, default=1000, help="Размер описания конкурса")
+    parser.add_argument('--tasks-per-contest', type=int, default=20, help="Число заявок на каждый конкурс")
+    parser.add_argument('--participations', type=int, default=12, help="Число заявок у каждого пользователя")
+    parser.add_argument('--latency-ms', type=float, default=20, help="Задержка ответа Райды и сервиса конфигов, мс")
+    parser.add_argument('--jitter-ms', type=float, default=5, help="Случайный разброс задержки, мс")
+
+
+def from_arguments(args: argparse.Namespace) -> FakeUpstream:
+    return FakeUpstream(
+        contests=args.contests,
+        description_bytes=args.description_bytes,
+        tasks_per_contest=args.tasks_per_contest,
+        participations=args.participations,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--key-file', required=True, help="Файл закрытого ключа для токенов (создается, если его нет)")
+    parser.add_argument('--env', action='store_true', help="Только напечатать переменные окружения приложения")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    issuer = TokenIssuer.from_file(args.key_file)
+    if args.env:
+        for name, value in environment(f'http://{args.host}:{args.port}', issuer).items():
+            print(f"export {name}='{value}'")
+        return
+    server = FakeUpstreamServer(from_arguments(args), args.host, args.port)
+    print("Переменные окружения приложения:")
+    for name, value in environment(server.url, issuer).items():
+        print(f"export {name}='{value}'")
+    print(f"Фейковые Райда и сервис конфигов: {server.url} (Ctrl+C - остановка)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Запросов: {dict(server.upstream.calls)}")
+
+
+if __name__ == '__main__':
+    main()
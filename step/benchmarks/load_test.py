@@ -0,0 +1,448 @@
+"""
+Нагрузочный тест API конкурсов с фейковыми Райдой и сервисом конфигов (benchmarks/fake_upstream.py).
+
+Для каждого маршрута из contests/urls.py есть сценарий; сценарий выполняет --requests запросов
+в --concurrency потоков (в асинхронном режиме - корутин) после --warmup запросов для прогрева кэшей
+и пулов соединений. Для сценария выводятся задержка p50/p95/p99, пропускная способность, число вызовов
+Райды и сервиса конфигов на один запрос (по счетчикам фейковых сервисов) и память процесса приложения.
+Чтение выполняется от имени --users постоянных пользователей, запись (создание заявки, отказ,
+отправка решения) - от имени новых пользователей, поэтому сценарии можно повторять.
+
+По умолчанию приложение работает в этом же процессе (django.test.Client, при ASYNC_VIEWS=1 -
+AsyncClient через ASGI), фейковые сервисы - в фоновом потоке. Запуск из каталога step с теми же
+переменными окружения, что и для manage.py (адреса сервисов и ключ токенов подменяются):
+
+    python benchmarks/load_test.py [--requests 200] [--concurrency 8] [--scenarios contest_active,my_tasks]
+
+Для нагрузки на запущенный сервер (gunicorn, uvicorn) фейковые сервисы поднимаются на --upstream-port,
+а сервер запускается с переменными из `python benchmarks/fake_upstream.py --env --key-file bench.pem`:
+
+    python benchmarks/load_test.py --target http://127.0.0.1:8000 --key-file bench.pem --server-pid <pid>
+
+Результаты сохраняются в JSON (--output); с --baseline результаты сравниваются с сохраненными ранее,
+и при ухудшении p95, пропускной способности или числа вызовов внешних сервисов больше чем
+на --max-regression процентов команда завершается с кодом 1.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'step.settings')
+
+from benchmarks.fake_upstream import (  # noqa: E402
+    PROJECT_ID, FakeUpstream, FakeUpstreamServer, TokenIssuer, add_arguments, environment, fake_id, from_arguments
+)
+
+
+class Call(NamedTuple):
+    """ Запрос к API """
+    method: str
+    path: str
+    json: Optional[dict] = None
+    form: Optional[dict] = None
+    upload: Optional[Tuple[str, str, bytes]] = None  # поле, имя файла, содержимое
+
+
+@dataclass
+class Scenario:
+    """ Сценарий нагрузки на маршрут name из contests/urls.py """
+    name: str
+    call: Callable[['Workload', int, str], Call]
+    expected: int = 200
+    # запросы от имени новых пользователей (запись)
+    fresh_users: bool = False
+
+
+class Workload:
+    """ Параметры данных фейковой Райды, нужные для построения запросов """
+
+    def __init__(self, contests: int, participations: int, upload_bytes: int):
+        self.contests = contests
+        self.participations = min(participations, contests)
+        self.upload = b'x' * upload_bytes
+
+    def contest_id(self, index: int) -> str:
+        return fake_id('contest', index % self.contests)
+
+    def free_contest_id(self, index: int) -> str:
+        """ Конкурс, на который у пользователя еще нет заявки """
+        free = max(self.contests - self.participations, 1)
+        return fake_id('contest', self.participations + index % free)
+
+
+SCENARIOS = [
+    Scenario('contest_active', lambda w, i, user: Call('GET', '/contests/active/')),
+    Scenario('contest_archive', lambda w, i, user: Call('GET', '/contests/archive/')),
+    Scenario('contest_details', lambda w, i, user: Call('GET', f'/contests/{w.contest_id(i)}/')),
+    Scenario('contest_tasks', lambda w, i, user: Call('GET', f'/contests/{w.contest_id(i)}/task/')),
+    Scenario('my_tasks', lambda w, i, user: Call('GET', '/contests/user/my/tasks/')),
+    Scenario('my_history', lambda w, i, user: Call('GET', '/contests/user/my/history/')),
+    Scenario('user_history', lambda w, i, user: Call('GET', f'/contests/user/{user}/history/')),
+    Scenario('my_task', lambda w, i, user: Call('POST', '/contests/user/my/task/',
+                                                json={'contest_id': w.free_contest_id(i)}),
+             expected=201, fresh_users=True),
+    Scenario('quit_contest', lambda w, i, user: Call('DELETE', f'/contests/user/my/task/{FakeUpstream.user_task_id(user)}/'),
+             fresh_users=True),
+    Scenario('send_solution', lambda w, i, user: Call(
+        'POST', '/contests/user/my/task/send_solution',
+        form={'task_id': FakeUpstream.user_task_id(user), 'solution_link': 'https://example.com/solution'},
+        upload=('solution_file', 'solution.zip', w.upload)),
+             fresh_users=True),
+]
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """ Перцентиль по ближайшему рангу (values отсортированы) """
+    if not values:
+        return 0.0
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def memory(pid: Optional[int]) -> Dict[str, Optional[float]]:
+    """ Текущая и пиковая резидентная память процесса pid (None - этого процесса), МБ """
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            values = dict(line.split(':', 1) for line in status if line.startswith(('VmRSS', 'VmHWM')))
+        return {'rss_mb': int(values['VmRSS'].split()[0]) / 1024, 'peak_rss_mb': int(values['VmHWM'].split()[0]) / 1024}
+    except (OSError, KeyError, ValueError):
+        if pid:
+            return {'rss_mb': None, 'peak_rss_mb': None}
+        # ru_maxrss: килобайты в Linux, байты в macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss_mb': None, 'peak_rss_mb': peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)}
+
+
+class ClientRunner:
+    """ Запросы через django.test.Client в этом процессе (клиент на поток) """
+
+    def __init__(self):
+        from django.test import Client
+        self.client_class = Client
+        self.local = threading.local()
+
+    @property
+    def client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.client_class()
+        return client
+
+    @staticmethod
+    def arguments(call: Call) -> dict:
+        if call.json is not None:
+            return {'data': json.dumps(call.json), 'content_type': 'application/json'}
+        if call.form is not None:
+            data = dict(call.form)
+            if call.upload:
+                name, file_name, content = call.upload
+                file = io.BytesIO(content)
+                file.name = file_name
+                data[name] = file
+            return {'data': data}
+        return {}
+
+    def execute(self, call: Call, headers: Dict[str, str]) -> Tuple[int, int]:
+        """ Статус и размер тела ответа """
+        response = getattr(self.client, call.method.lower())(call.path, headers=headers, **self.arguments(call))
+        if response.streaming:
+            return response.status_code, sum(len(chunk) for chunk in response.streaming_content)
+        return response.status_code, len(response.content)
+
+
+class AsyncClientRunner(ClientRunner):
+    """ Запросы через django.test.AsyncClient (ASGI) для асинхронных представлений """
+
+    def __init__(self):
+        super().__init__()
+        from django.test import AsyncClient
+        self.client_class = AsyncClient
+
+    async def aexecute(self, call: Call, headers: Dict[str, str]) -> Tuple[int, int]:
+        response = await getattr(self.client, call.method.lower())(call.path, headers=headers, **self.arguments(call))
+        if response.streaming:
+            size = 0
+            async for chunk in response.streaming_content:
+                size += len(chunk)
+            return response.status_code, size
+        return response.status_code, len(response.content)
+
+
+class HttpRunner:
+    """ Запросы по HTTP к запущенному серверу (сессия requests на поток) """
+
+    def __init__(self, target: str):
+        import requests
+        self.session_class = requests.Session
+        self.target = target.rstrip('/')
+        self.local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.session_class()
+        return session
+
+    def execute(self, call: Call, headers: Dict[str, str]) -> Tuple[int, int]:
+        files = None
+        if call.upload:
+            name, file_name, content = call.upload
+            files = {name: (file_name, content)}
+        response = self.session.request(call.method, self.target + call.path, headers=headers, json=call.json,
+                                        data=call.form, files=files)
+        return response.status_code, len(response.content)
+
+
+@dataclass
+class Result:
+    """ Результат сценария """
+    name: str
+    requests: int
+    errors: int
+    statuses: Dict[str, int]
+    seconds: float
+    latencies_ms: List[float] = field(repr=False)
+    upstream_calls: Dict[str, int]
+    response_bytes: int
+    memory: Dict[str, Optional[float]]
+    traced_peak_mb: Optional[float] = None
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies_ms)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'statuses': self.statuses,
+            'throughput_rps': self.requests / self.seconds if self.seconds else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': latencies[-1] if latencies else 0.0,
+            'upstream_calls_per_request': sum(self.upstream_calls.values()) / self.requests,
+            'upstream_calls': {kind: calls / self.requests for kind, calls in sorted(self.upstream_calls.items())},
+            'response_bytes': self.response_bytes / self.requests,
+            **self.memory,
+            'traced_peak_mb': self.traced_peak_mb,
+        }
+
+
+class LoadTest:
+    def __init__(self, runner, upstream: FakeUpstream, issuer: TokenIssuer, workload: Workload, users: int,
+                 concurrency: int, server_pid: Optional[int] = None):
+        self.runner = runner
+        self.upstream = upstream
+        self.issuer = issuer
+        self.workload = workload
+        self.concurrency = concurrency
+        self.server_pid = server_pid
+        self.readers = [str(uuid.uuid5(uuid.NAMESPACE_DNS, f'bench-user-{index}')) for index in range(users)]
+        self.reader_tokens = {user: issuer.token(user) for user in self.readers}
+
+    def calls(self, scenario: Scenario, count: int, offset: int) -> List[Tuple[Call, Dict[str, str]]]:
+        """ Запросы сценария с заголовками (токены подписываются заранее, вне замера) """
+        calls = []
+        for index in range(offset, offset + count):
+            if scenario.fresh_users:
+                user = str(uuid.uuid4())
+                token = self.issuer.token(user)
+            else:
+                user = self.readers[index % len(self.readers)]
+                token = self.reader_tokens[user]
+            headers = {'Authorization': f'Bearer {token}', 'Project-ID': PROJECT_ID}
+            calls.append((scenario.call(self.workload, index, user), headers))
+        return calls
+
+    def execute(self, calls) -> Tuple[List[Tuple[float, int, int]], float]:
+        """ Выполнение запросов в concurrency потоков: [(мс, статус, размер)], общее время в секундах """
+
+        def timed(item):
+            start = time.perf_counter()
+            status, size = self.runner.execute(*item)
+            return (time.perf_counter() - start) * 1000, status, size
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            samples = list(executor.map(timed, calls))
+        return samples, time.perf_counter() - start
+
+    async def aexecute(self, calls) -> Tuple[List[Tuple[float, int, int]], float]:
+        """ Выполнение запросов в concurrency корутин """
+        pending = iter(calls)
+        samples = []
+
+        async def worker():
+            for item in pending:
+                start = time.perf_counter()
+                status, size = await self.runner.aexecute(*item)
+                samples.append(((time.perf_counter() - start) * 1000, status, size))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return samples, time.perf_counter() - start
+
+    def run_calls(self, calls):
+        if isinstance(self.runner, AsyncClientRunner):
+            return asyncio.run(self.aexecute(calls))
+        return self.execute(calls)
+
+    def run(self, scenario: Scenario, requests: int, warmup: int, trace: bool) -> Result:
+        if warmup:
+            self.run_calls(self.calls(scenario, warmup, 0))
+        calls = self.calls(scenario, requests, warmup)
+        before = self.upstream.snapshot()
+        if trace:
+            tracemalloc.reset_peak()
+        samples, seconds = self.run_calls(calls)
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if trace else None
+        upstream_calls = self.upstream.snapshot()
+        upstream_calls.subtract(before)
+        statuses = Counter(str(status) for _, status, _ in samples)
+        return Result(
+            name=scenario.name,
+            requests=len(samples),
+            errors=sum(1 for _, status, _ in samples if status != scenario.expected),
+            statuses=dict(statuses),
+            seconds=seconds,
+            latencies_ms=[latency for latency, _, _ in samples],
+            upstream_calls={kind: calls for kind, calls in upstream_calls.items() if calls},
+            response_bytes=sum(size for _, _, size in samples),
+            memory=memory(self.server_pid),
+            traced_peak_mb=traced_peak,
+        )
+
+
+def print_report(summaries: Dict[str, dict]):
+    print(f"{'сценарий':<16}{'запросов':>9}{'ошибок':>8}{'rps':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}"
+          f"{'вызовов/запрос':>16}{'ответ КБ':>10}{'RSS МБ':>9}")
+    for name, summary in summaries.items():
+        rss = summary['rss_mb'] if summary['rss_mb'] is not None else summary['peak_rss_mb']
+        print(f"{name:<16}{summary['requests']:>9}{summary['errors']:>8}{summary['throughput_rps']:>9.1f}"
+              f"{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}"
+              f"{summary['upstream_calls_per_request']:>16.2f}{summary['response_bytes'] / 1024:>10.1f}"
+              f"{rss if rss is not None else float('nan'):>9.1f}")
+    for name, summary in summaries.items():
+        calls = ', '.join(f'{kind}={value:.2f}' for kind, value in summary['upstream_calls'].items())
+        details = f"{name}: {calls or 'без вызовов'}"
+        if summary['errors']:
+            details += f"; статусы {summary['statuses']}"
+        if summary['traced_peak_mb'] is not None:
+            details += f"; пик выделенной памяти {summary['traced_peak_mb']:.1f} МБ"
+        print(details)
+
+
+def regressions(summaries: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    """ Ухудшения относительно baseline больше чем на max_regression процентов """
+    limit = 1 + max_regression / 100
+    found = []
+    for name, summary in summaries.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if summary['errors'] > base['errors']:
+            found.append(f"{name}: ошибок {summary['errors']} (было {base['errors']})")
+        if summary['p95_ms'] > base['p95_ms'] * limit:
+            found.append(f"{name}: p95 {summary['p95_ms']:.1f} мс (было {base['p95_ms']:.1f} мс)")
+        if summary['throughput_rps'] * limit < base['throughput_rps']:
+            found.append(f"{name}: {summary['throughput_rps']:.1f} запросов/с (было {base['throughput_rps']:.1f})")
+        if summary['upstream_calls_per_request'] > base['upstream_calls_per_request'] * limit + 0.01:
+            found.append(f"{name}: {summary['upstream_calls_per_request']:.2f} вызовов внешних сервисов на запрос "
+                         f"(было {base['upstream_calls_per_request']:.2f})")
+    return found
+
+
+def setup_django(url: str, issuer: TokenIssuer):
+    """ Настройка Django в этом процессе на работу с фейковыми сервисами по адресу url """
+    os.environ.update(environment(url, issuer))
+    hosts = os.environ.get('DJANGO_ALLOWED_HOSTS', '').split()
+    os.environ['DJANGO_ALLOWED_HOSTS'] = ' '.join(hosts + ['testserver'])
+    import django
+    django.setup()
+
+
+def check_coverage(scenarios: List[Scenario]):
+    """ Предупреждение о маршрутах contests/urls.py без сценария """
+    from contests.urls import urlpatterns
+    missing = {pattern.name for pattern in urlpatterns} - {scenario.name for scenario in scenarios}
+    if missing:
+        print(f"Нет сценариев для маршрутов: {', '.join(sorted(missing))}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="Число запросов в сценарии")
+    parser.add_argument('--warmup', type=int, default=20, help="Число запросов для прогрева (не учитываются)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Число одновременных запросов")
+    parser.add_argument('--users', type=int, default=20, help="Число постоянных пользователей для чтения")
+    parser.add_argument('--upload-bytes', type=int, default=256 * 1024, help="Размер файла решения")
+    parser.add_argument('--scenarios', default='', help="Сценарии через запятую (по умолчанию все)")
+    parser.add_argument('--target', default='', help="Адрес запущенного сервера (по умолчанию - в этом процессе)")
+    parser.add_argument('--upstream-port', type=int, default=8081, help="Порт фейковых сервисов для --target")
+    parser.add_argument('--key-file', default='', help="Файл ключа токенов (обязателен для --target)")
+    parser.add_argument('--server-pid', type=int, default=None, help="pid сервера для учета памяти с --target")
+    parser.add_argument('--tracemalloc', action='store_true', help="Пик выделенной памяти Python (медленнее)")
+    parser.add_argument('--output', default='', help="Файл для результатов в JSON")
+    parser.add_argument('--baseline', default='', help="Результаты для сравнения (JSON из --output)")
+    parser.add_argument('--max-regression', type=float, default=10, help="Допустимое ухудшение, проценты")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.target and not args.key_file:
+        parser.error("для --target нужен --key-file, тот же, что при запуске сервера")
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = set(names) - {scenario.name for scenario in SCENARIOS}
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+    scenarios = [scenario for scenario in SCENARIOS if not names or scenario.name in names]
+
+    issuer = TokenIssuer.from_file(args.key_file) if args.key_file else TokenIssuer()
+    upstream = from_arguments(args)
+    server = FakeUpstreamServer(upstream, port=args.upstream_port if args.target else 0).start()
+    try:
+        if args.target:
+            runner = HttpRunner(args.target)
+        else:
+            setup_django(server.url, issuer)
+            check_coverage(SCENARIOS)
+            from django.conf import settings
+            runner = AsyncClientRunner() if settings.ASYNC_VIEWS else ClientRunner()
+        if args.tracemalloc:
+            tracemalloc.start()
+        workload = Workload(args.contests, args.participations, args.upload_bytes)
+        load_test = LoadTest(runner, upstream, issuer, workload, args.users, args.concurrency, args.server_pid)
+        print(f"{args.target or 'в процессе'}: запросов {args.requests}, одновременно {args.concurrency}, "
+              f"конкурсов {args.contests}, задержка Райды {args.latency_ms:g} мс")
+        summaries = {}
+        for scenario in scenarios:
+            summaries[scenario.name] = load_test.run(scenario, args.requests, args.warmup, args.tracemalloc).summary()
+    finally:
+        server.stop()
+
+    print_report(summaries)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(summaries, file, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            found = regressions(summaries, json.load(file), args.max_regression)
+        for message in found:
+            print(f"Ухудшение: {message}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import OrphanedAttachment
+
+
+@admin.register(OrphanedAttachment)
+class OrphanedAttachmentAdmin(admin.ModelAdmin):
+    list_display = ('attachment_id', 'task_id', 'node_id', 'status_code', 'created_at')
+    search_fields = ('attachment_id', 'task_id')
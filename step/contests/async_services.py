@@ -0,0 +1,486 @@
+"""
+Асинхронный вариант сервисного слоя для ASGI-представлений (contests.async_views).
+
+Запросы к Райде и сервису конфигов выполняются через httpx.AsyncClient, поэтому один воркер
+обслуживает много запросов, ожидающих ответа внешних сервисов. Построение RQL-запросов,
+преобразование данных и кэши общие с синхронным слоем contests.services.
+"""
+import asyncio
+from typing import Awaitable, Callable, Union, Tuple, List, Dict, Optional, BinaryIO
+
+import httpx
+
+from .cache import AsyncSingleFlight
+from .http_client import async_raida, async_configs_service
+from .jsonbackend import json_body
+from .metrics import upstream_operation
+from .timing import phase, timed_phase
+from .projections import apost_rql
+from .readmodel import aread_contest
+from .resilience import AsyncUpstreamUnavailable, idempotency_headers
+from .tokens import raida_token
+from .uploads import MultipartFile
+from .services import (base_url, configs_url, max_workers, catalogue_cache, contest_tasks_cache, configs_scope,
+                       with_message, cached_configs, store_configs, store_configs_error, task_status_result,
+                       user_task_status, new_task, created_task_response, contest_cache,
+                       contest_cache_key, normalized_contest, is_normalized_contest,
+                       participation_cache, participation_key, participation_query, participation_task,
+                       contest_participation, replace_participation_task,
+                       created_participation_task, patched_participation_task, active_user_tasks, completed_user_tasks,
+                       attachment_item, contests_query, contest_item, list_response,
+                       user_task_item, history_item, contest_tasks_query, contest_task_item)
+
+configs_flight = AsyncSingleFlight()
+
+
+def http_error(err: httpx.HTTPStatusError) -> Tuple[Dict, int]:
+    return {'code': 'HTTP_ERROR', 'message': f'Ошибка HTTP: {str(err)}'}, err.response.status_code
+
+
+def request_error(err: Exception) -> Tuple[Dict, int]:
+    if isinstance(err, AsyncUpstreamUnavailable):
+        return err.detail, err.status_code
+    return {'code': 'REQUEST_ERROR', 'message': f'Ошибка запроса: {str(err)}'}, 500
+
+
+def http_error_detail(err: httpx.HTTPStatusError) -> Tuple[Dict, int]:
+    return {
+        "detail": {
+            "code": f"HTTP_ERROR - {err.response.status_code}",
+            "message": str(err)
+        }
+    }, err.response.status_code
+
+
+def request_error_detail(err: Exception) -> Tuple[Dict, int]:
+    if isinstance(err, AsyncUpstreamUnavailable):
+        return {'detail': err.detail}, err.status_code
+    return {
+        "detail": {
+            "code": "REQUEST_ERROR",
+            "message": str(err)
+        }
+    }, 500
+
+
+@upstream_operation('get_configs')
+async def fetch_configs(project_id: str, account_id: Optional[str], auth_token: str, configs: List[str]) -> Tuple[Dict, int]:
+    """ Запрос в сервис конфигов за значениями конфигов типа configs для данных project_id и account_id """
+    configs_types = ','.join(configs)
+    url = f"{configs_url}/configs/{configs_types}"
+    headers = {'Project-ID': project_id, 'Account-ID': account_id, 'Authorization': auth_token}
+    # httpx не принимает заголовки со значением None
+    headers = {key: value for key, value in headers.items() if value is not None}
+    try:
+        response = await async_configs_service.get(url, headers=headers)
+        response.raise_for_status()
+        return json_body(response), 200
+    except httpx.HTTPStatusError as err:
+        return http_error(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error(err)
+
+
+@timed_phase('configs')
+async def get_configs(project_id: str, account_id: Optional[str], auth_token: str, configs: List[str]) -> Tuple[Dict, int]:
+    """ Получить значения конфигов типа configs для данных project_id и account_id (см. contests.services.get_configs) """
+    scope = configs_scope(project_id, account_id, auth_token)
+    data, missing, error = cached_configs(scope, configs)
+    if error:
+        return error
+    if missing:
+        result = await configs_flight.do((*scope, tuple(missing)),
+                                         lambda: fetch_configs(project_id, account_id, auth_token, missing))
+        if result[1] != 200:
+            store_configs_error(scope, missing, result)
+            return result
+        store_configs(scope, missing, result[0], data)
+    return {'data': data}, 200
+
+
+async def get_token():
+    """ Получить токен доступа к Райде (менеджер токенов общий с синхронным слоем) """
+    return await raida_token.aget()
+
+
+@upstream_operation('get_task')
+async def fetch_task(token: str, task_id: str, node_id: str) -> Tuple[Dict | list, int]:
+    """ Заявка на конкурс (задача Райды) с данным task_id, всегда из Райды """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/{node_id}/{task_id}"
+    try:
+        response = await async_raida.get(url, headers=headers)
+        response.raise_for_status()
+        return json_body(response).get('data', []), 200
+    except httpx.HTTPStatusError as err:
+        return http_error(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error(err)
+
+
+async def task_solution_status(
+        token: str,
+        task_id: str,
+        task_process_id: str,
+        node_id: str,
+        task_status_id: dict
+) -> tuple[dict, int]:
+    """ Проверяет наличие заявки на конкурс и ее статус по заявке из Райды (см. contests.services.task_solution_status) """
+    return task_status_result(await fetch_task(token, task_id, node_id), task_process_id, task_status_id)
+
+
+async def get_user_task(
+        token: str,
+        contest_id: str,
+        user_id: str,
+        task_process_id: str,
+        node_id: str,
+        task_status_id: dict,
+        fresh: bool = False
+) -> tuple[dict, int]:
+    """ Проверка статуса заявки пользователя на участие в конкурсе по индексу участия (при fresh - из Райды) """
+    try:
+        tasks = await get_participation(token, node_id, task_process_id, user_id, fresh=fresh)
+        return user_task_status(contest_participation(tasks, contest_id), task_status_id), 200
+    except httpx.HTTPStatusError as err:
+        return http_error(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error(err)
+
+
+@upstream_operation('get_participation')
+async def fetch_participation(token: str, node_id: Optional[str], task_process_id: str, user_id: str) -> List[Dict]:
+    """ Загрузка всех заявок пользователя из Райды одним RQL-запросом """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/rql/{node_id}"
+    response = await apost_rql(url, participation_query(task_process_id, user_id), headers)
+    response.raise_for_status()
+    return [participation_task(task) for task in json_body(response).get('data', [])]
+
+
+async def get_participation(token: str, node_id: Optional[str], task_process_id: str, user_id: str,
+                            fresh: bool = False) -> List[Dict]:
+    """ Индекс участия пользователя через общий кэш, при fresh - из Райды (см. contests.services.get_participation) """
+    key = participation_key(node_id, task_process_id, user_id)
+    if fresh:
+        tasks = await fetch_participation(token, node_id, task_process_id, user_id)
+        await participation_cache.aset(key, tasks)
+        return tasks
+    return await participation_cache.aget_or_load(key, lambda: fetch_participation(token, node_id, task_process_id, user_id))
+
+
+async def add_participation_task(node_id: Optional[str], task_process_id: str, user_id: str, task: Dict):
+    """ Добавить созданную заявку в индекс участия """
+    key = participation_key(node_id, task_process_id, user_id)
+    tasks = await participation_cache.aget(key)
+    if tasks is not None:
+        await participation_cache.aset(key, replace_participation_task(tasks, task))
+
+
+async def update_participation_task(node_id: Optional[str], task_process_id: str, user_id: str, task_id: str,
+                                    response_data: Dict | list):
+    """ Обновить заявку в индексе участия после ее изменения """
+    key = participation_key(node_id, task_process_id, user_id)
+    tasks = await participation_cache.aget(key)
+    if tasks is None:
+        return
+    task = patched_participation_task(tasks, task_id, response_data)
+    if task is None:
+        await participation_cache.adelete(key)
+    else:
+        await participation_cache.aset(key, replace_participation_task(tasks, task))
+
+
+@upstream_operation('get_contest')
+async def fetch_contest(token: str, contest_id: str, node_id: Optional[str]) -> Tuple[Dict | list, int]:
+    """ Получение необработанных данных конкурса (задачи в Райде) по его id """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/{node_id}/{contest_id}"
+    try:
+        response = await async_raida.get(url, headers=headers)
+        response.raise_for_status()
+        return json_body(response).get('data', []), response.status_code
+    except httpx.HTTPStatusError as err:
+        return http_error_detail(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error_detail(err)
+
+
+async def fetch_contest_local(token: str, contest_id: str, node_id: Optional[str]) -> Tuple[Dict | list, int]:
+    """ fetch_contest с чтением из локальной модели чтения (см. contests.readmodel.fetch_contest_local) """
+    contest = await aread_contest(contest_id, node_id)
+    if contest is not None:
+        return contest, 200
+    return await fetch_contest(token, contest_id, node_id)
+
+
+async def get_contest_cached(
+        token: str,
+        contest_id: str,
+        node_id: Optional[str],
+        fetch: Callable[[str, str, Optional[str]], Awaitable[Tuple[Dict | list, int]]] = fetch_contest
+) -> Tuple[Optional[Dict], int]:
+    """ Нормализованный конкурс по его id через общий кэш (см. contests.services.get_contest_cached) """
+    async def load():
+        contest = await fetch(token, contest_id, node_id)
+        if contest[1] != 200:
+            return contest
+        return normalized_contest(contest[0]), contest[1]
+
+    return await contest_cache.aget_or_load(
+        contest_cache_key(node_id, contest_id),
+        load,
+        cacheable=lambda result: result[1] == 200 and result[0] is not None
+    )
+
+
+async def contest_exists(token: str, contest_id: str, node_id: str, contest_process_id: str) -> bool:
+    """ Проверяет, существует ли конкурс с данным contest_id """
+    contest = await get_contest_cached(token, contest_id, node_id)
+    return contest[1] == 200 and is_normalized_contest(contest[0], contest_process_id)
+
+
+@upstream_operation('patch_task')
+async def patch_task(
+        token: str,
+        task_id: str,
+        node_id: str,
+        task_status: str,
+        custom_fields: dict,
+        user_id: Optional[str] = None,
+        task_process_id: Optional[str] = None
+) -> tuple[dict, int]:
+    """ Редактирование заявки на участие в конкурсе при отправке решения (с обновлением индекса участия) """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/{node_id}/{task_id}"
+    data = {"status_id": task_status}
+    if custom_fields:
+        data["custom_fields"] = custom_fields
+    try:
+        response = await async_raida.patch(url, headers=headers, json=data)
+        response.raise_for_status()
+        response_data = json_body(response).get('data', [])
+        if user_id and task_process_id:
+            await update_participation_task(node_id, task_process_id, user_id, task_id, response_data)
+        return response_data, 200
+    except httpx.HTTPStatusError as err:
+        return http_error(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error(err)
+
+
+@upstream_operation('create_task')
+async def create_task(token: str, contest_id: str, user_id: str, node_id: str, task_process_id: str, task_status_new: str) -> tuple[dict, int]:
+    """ Создание заявки на участие в конкурсе """
+    headers = {"Authorization": f'Bearer {token}', **idempotency_headers()}
+    url = f"{base_url}/api/tasks/{node_id}/{task_process_id}"
+    task = new_task(contest_id, user_id, task_status_new)
+    try:
+        response = await async_raida.post(url, json=task, headers=headers)
+        response.raise_for_status()
+        response_data = json_body(response).get('data')
+        if response_data and response_data.get('id'):
+            await add_participation_task(node_id, task_process_id, user_id,
+                                         created_participation_task(response_data, contest_id, task_process_id, task_status_new))
+        return created_task_response(response_data, contest_id, user_id), 201
+    except httpx.HTTPStatusError as err:
+        return http_error_detail(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error_detail(err)
+
+
+@upstream_operation('get_contests')
+async def get_contests(
+        token: str,
+        node_id: Optional[str],
+        process_id: str,
+        status_ids: Union[Tuple[str, ...], List[str], str, None],
+        projects_ids: Union[Tuple[str, ...], List[str], str, None],
+        message: str = "Список всех конкурсов/задач по заданному статусу или статусам"
+) -> Tuple[Dict, int]:
+    """ Получение всех конкурсов по переданным параметрам """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/rql/{node_id}"
+    try:
+        response = await apost_rql(url, contests_query(process_id, status_ids, projects_ids), headers)
+        response.raise_for_status()
+        response_data = json_body(response).get('data', [])
+        with phase('transform'):
+            result_data = [contest_item(contest) for contest in response_data]
+        return list_response(result_data, message), response.status_code
+    except httpx.HTTPStatusError as err:
+        return http_error_detail(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error_detail(err)
+
+
+async def get_contests_cached(
+        token: str,
+        node_id: Optional[str],
+        process_id: str,
+        status_ids: Union[Tuple[str, ...], List[str], str, None],
+        projects_ids: Union[Tuple[str, ...], List[str], str, None],
+        message: str = "Список всех конкурсов/задач по заданному статусу или статусам"
+) -> Tuple[Dict, int]:
+    """ Получение всех конкурсов по переданным параметрам через общий кэш ответов """
+    key = catalogue_cache.make_key(node_id, process_id, status_ids, projects_ids)
+    result = await catalogue_cache.aget_or_load(
+        key,
+        lambda: get_contests(token, node_id, process_id, status_ids, projects_ids),
+        cacheable=lambda result: result[1] == 200
+    )
+    return with_message(result, message)
+
+
+@upstream_operation('get_attachments')
+async def get_attachments(token: str, task_id: str, node_id: str) -> dict | None:
+    """ Получение загруженных данных к задаче """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/attachments/{node_id}/{task_id}"
+    try:
+        response = await async_raida.get(url, headers=headers)
+        return attachment_item(json_body(response).get('data', []))
+    except Exception:
+        return None
+
+
+@upstream_operation('post_attachments')
+async def post_attachments(token: str, task_id: str, user_id: str, node_id: str, file: BinaryIO) -> tuple[dict, int]:
+    """ Отправка решения на конкурс (файл передается потоком, см. contests.uploads.MultipartFile) """
+    body = MultipartFile('attachment', file)
+    headers = {"Authorization": f'Bearer {token}', **body.headers, **idempotency_headers()}
+    url = f"{base_url}/api/attachments/{node_id}/{task_id}?type=task"
+    try:
+        response = await async_raida.post(url, headers=headers, content=body.aiter())
+        response.raise_for_status()
+        return json_body(response).get('data'), 200
+    except httpx.HTTPStatusError as err:
+        return http_error(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error(err)
+
+
+@upstream_operation('get_tasks')
+async def get_tasks(
+        token: str,
+        node_id: str,
+        process_id: str,
+        process_task_id: str,
+        status_ids: Union[Tuple[str, ...], List[str], str, None],
+        task_status_id_rejection: str,
+        projects_ids: Union[Tuple[str, ...], List[str], str, None],
+        user_id: str,
+        message: str = "Список всех конкурсов/задач по заданному статусу или статусам"
+) -> Tuple[Dict, int]:
+    """ Получение всех конкурсов для раздела мои задачи из кэша каталога и индекса участия """
+    try:
+        # список конкурсов из кэша каталога и индекс участия пользователя получаем одновременно
+        contests, tasks = await asyncio.gather(
+            get_contests_cached(token, node_id, process_id, status_ids, projects_ids),
+            get_participation(token, node_id, process_task_id, user_id)
+        )
+        if contests[1] != 200:
+            return contests
+        user_tasks = active_user_tasks(tasks, task_status_id_rejection)
+        with phase('transform'):
+            result_data = [
+                user_task_item(item, user_tasks[item['id']])
+                for item in contests[0]['data'] if item['id'] in user_tasks
+            ]
+        return list_response(result_data, message), 200
+    except httpx.HTTPStatusError as err:
+        return http_error_detail(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error_detail(err)
+
+
+@upstream_operation('get_history')
+async def get_history(
+        token: str,
+        node_id: Optional[str],
+        process_id: str,
+        task_process_id: str,
+        status_ids: Union[Tuple[str, ...], List[str], str, None],
+        projects_ids: Union[Tuple[str, ...], List[str], str, None],
+        user_id: str,
+        message: str = "Список всех конкурсов/задач по заданному статусу или статусам"
+) -> Tuple[Dict, int]:
+    """ Получение всех конкурсов, где участвовал пользователь и загрузил решение """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/rql/{node_id}"
+    try:
+        response, tasks = await asyncio.gather(
+            apost_rql(url, contests_query(process_id, status_ids, projects_ids, fields='history'), headers),
+            get_participation(token, node_id, task_process_id, user_id)
+        )
+        user_tasks = completed_user_tasks(tasks)
+        response.raise_for_status()
+        response_data = json_body(response).get('data', [])
+        contests = [(contest, user_tasks[contest.get('id')]) for contest in response_data if contest.get('id') in user_tasks]
+
+        # ограничиваем число одновременных запросов за решениями, как и в синхронном слое
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def load_attachments(task_id):
+            async with semaphore:
+                return await get_attachments(token, task_id, node_id)
+
+        attachments = await asyncio.gather(*(load_attachments(task.get('application_id')) for contest, task in contests))
+        with phase('transform'):
+            result_data = [
+                history_item(contest, task, task_attachments)
+                for (contest, task), task_attachments in zip(contests, attachments)
+            ]
+        return list_response(result_data, message), response.status_code
+    except httpx.HTTPStatusError as err:
+        return http_error_detail(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error_detail(err)
+
+
+@upstream_operation('get_contest_tasks')
+async def get_contest_tasks(
+        token: str,
+        node_id: Optional[str],
+        process_id: str,
+        contest_id: str,
+        task_status: Union[Tuple[str, ...], List[str], str, None] = None,
+        message: str = "Список всех задач по заданному конкурсу и статусу или статусам",
+        lazy: bool = False
+) -> Tuple[Dict, int]:
+    """ Получение всех задач по переданному/ым конкурса, статусу/ам """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/rql/{node_id}"
+    try:
+        response = await apost_rql(url, contest_tasks_query(process_id, contest_id, task_status), headers)
+        response.raise_for_status()
+        response_data = json_body(response).get('data', [])
+        if lazy:
+            # элементы преобразуются при потоковой отдаче (contests.streaming), count считается там же
+            result = list_response([], message)
+            result['data'] = map(contest_task_item, response_data)
+            return result, response.status_code
+        with phase('transform'):
+            result_data = [contest_task_item(task_contest) for task_contest in response_data]
+        return list_response(result_data, message), response.status_code
+    except httpx.HTTPStatusError as err:
+        return http_error_detail(err)
+    except (httpx.RequestError, ValueError) as err:
+        return request_error_detail(err)
+
+
+async def get_contest_tasks_cached(
+        token: str,
+        node_id: Optional[str],
+        process_id: str,
+        contest_id: str,
+        task_status: Union[Tuple[str, ...], List[str], str, None] = None,
+        message: str = "Список всех задач по заданному конкурсу и статусу или статусам"
+) -> Tuple[Dict, int]:
+    """ Получение всех задач конкурса через короткий кэш ответов """
+    key = contest_tasks_cache.make_key(node_id, process_id, str(contest_id), task_status)
+    return await contest_tasks_cache.aget_or_load(
+        key,
+        lambda: get_contest_tasks(token, node_id, process_id, contest_id, task_status, message),
+        cacheable=lambda result: result[1] == 200
+    )
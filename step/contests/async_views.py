@@ -0,0 +1,221 @@
+"""
+Асинхронные (ASGI) варианты представлений из contests.views.
+
+Наследуют от синхронных представлений права доступа, парсеры, OpenAPI-описание и общие шаги обработки
+запроса (BaseContestView), а сами только выполняют запросы через асинхронный сервисный слой
+contests.async_services. Подключаются в contests.urls при ASYNC_VIEWS=1 и запуске через ASGI (step.asgi).
+"""
+import asyncio
+
+from adrf.views import APIView as AsyncAPIView
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import views
+from .submission import AsyncSubmissionWorkflow
+from .serializers import CreateTaskSerializer, SolutionSerializer
+from .async_services import (get_token, get_contests_cached, get_user_task, get_tasks, get_history, contest_exists,
+                             create_task, get_contest_tasks, get_contest_tasks_cached, get_configs, task_solution_status,
+                             patch_task, fetch_contest_local, get_contest_cached)
+from .readmodel import aread_contests
+
+
+def same_schema(view_method):
+    """ Переносит OpenAPI-описание (extend_schema) с метода синхронного представления на асинхронный метод """
+    def decorator(method):
+        method.__dict__.update(view_method.__dict__)
+        return method
+    return decorator
+
+
+class ArchiveContestsView(AsyncAPIView, views.ArchiveContestsView):
+
+    @same_schema(views.ArchiveContestsView.get)
+    async def get(self, request):
+        access_token = await get_token()
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        contests = self.contests_query(values)
+        # список из локальной модели чтения, если она включена и синхронизирована недавно, иначе из Райды
+        result_data = await aread_contests(**contests)
+        if result_data is None:
+            result_data = await get_contests_cached(token=access_token, projects_ids=None, **contests)
+        return self.page_response(result_data, page, stream, asynchronous=True)
+
+
+class ActiveContestsView(AsyncAPIView, views.ActiveContestsView):
+
+    @same_schema(views.ActiveContestsView.get)
+    async def get(self, request):
+        access_token = await get_token()
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        contests = self.contests_query(values)
+        # список из локальной модели чтения, если она включена и синхронизирована недавно, иначе из Райды
+        result_data = await aread_contests(**contests)
+        if result_data is None:
+            result_data = await get_contests_cached(token=access_token, projects_ids=None, **contests)
+        return self.page_response(result_data, page, stream, asynchronous=True)
+
+
+class ContestDetailsView(AsyncAPIView, views.ContestDetailsView):
+
+    @same_schema(views.ContestDetailsView.get)
+    async def get(self, request, contest_id):
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        access_token = await get_token()
+        user_id = request.auth.get('user_id')
+        # параллельно получаем данные конкурса и заявку пользователя на участие в нем
+        contest, result = await asyncio.gather(
+            get_contest_cached(access_token, contest_id, values['node_id'], fetch_contest_local),
+            get_user_task(access_token, contest_id, user_id, values['task_process_id'], values['node_id'],
+                          values['task_status_id'])
+        )
+        return self.details_response(contest, result, values)
+
+
+class QuitContestView(AsyncAPIView, views.QuitContestView):
+
+    @same_schema(views.QuitContestView.delete)
+    async def delete(self, request, task_id):
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        access_token = await get_token()
+        user_id = request.auth.get('user_id')
+        task_solution = await task_solution_status(access_token, task_id, values['task_process_id'], values['node_id'],
+                                                   values['task_status_id'])
+        error = self.task_solution_error(task_solution)
+        if error:
+            return error
+        response_data = await patch_task(access_token, task_id, values['node_id'], values['task_status_rejection'], {},
+                                         user_id, values['task_process_id'])
+        return self.quit_response(response_data)
+
+
+class UserTaskView(AsyncAPIView, views.UserTaskView):
+
+    @same_schema(views.UserTaskView.post)
+    async def post(self, request):
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        user_id = request.auth.get('user_id')
+        serializer = CreateTaskSerializer(data=request.data)
+        if not serializer.is_valid():
+            return self.bad_request(serializer)
+        contest_id = serializer.validated_data['contest_id']
+        access_token = await get_token()
+        if not await contest_exists(access_token, contest_id, values['node_id'], values['contest_process_id']):
+            return Response({'detail': dict(code='NOT_FOUND', message='Конкурс не найден.')},
+                            status=status.HTTP_404_NOT_FOUND)
+        task = await get_user_task(access_token, contest_id, user_id, values['task_process_id'], values['node_id'],
+                                   values['task_status_id'], fresh=True)
+        error = self.existing_task_error(task)
+        if error:
+            return error
+        new_contest = await create_task(access_token, contest_id, user_id, values['node_id'], values['task_process_id'],
+                                        values['task_status_new'])
+        return Response(new_contest[0], status=new_contest[1])
+
+
+class SolutionView(AsyncAPIView, views.SolutionView):
+
+    @same_schema(views.SolutionView.post)
+    async def post(self, request):
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        serializer = SolutionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return self.bad_request(serializer)
+        access_token = await get_token()
+        workflow = AsyncSubmissionWorkflow(access_token, **self.workflow_arguments(request, serializer, values))
+        data, status_code = await workflow.run()
+        return Response(data, status=status_code)
+
+
+class UserTasksView(AsyncAPIView, views.UserTasksView):
+
+    @same_schema(views.UserTasksView.get)
+    async def get(self, request):
+        access_token = await get_token()
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        result_data = await get_tasks(token=access_token, user_id=request.auth.get('user_id'), **self.tasks_query(values))
+        return self.page_response(result_data, page, stream, asynchronous=True)
+
+
+class UserHistoryView(AsyncAPIView, views.UserHistoryView):
+
+    @same_schema(views.UserHistoryView.get)
+    async def get(self, request, user_id=None):
+        access_token = await get_token()
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        if user_id is None and request.auth:
+            user_id = request.auth.get('user_id')
+        result_data = await get_history(token=access_token, user_id=user_id, **self.history_query(values))
+        return Response(result_data[0], status=result_data[1])
+
+
+class ContestTasksView(AsyncAPIView, views.ContestTasksView):
+
+    @same_schema(views.ContestTasksView.get)
+    async def get(self, request, contest_id):
+        access_token = await get_token()
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(await get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        tasks = self.tasks_query(request, values, contest_id)
+        if stream and page is None:
+            # без пагинации задачи преобразуются по мере потоковой отдачи, мимо кэша
+            result_data = await get_contest_tasks(token=access_token, lazy=True, **tasks)
+        else:
+            result_data = await get_contest_tasks_cached(token=access_token, **tasks)
+        return self.page_response(result_data, page, stream, asynchronous=True)
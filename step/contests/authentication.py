@@ -1,24 +1,57 @@
+import hashlib
+import time
+from functools import lru_cache
+
 import jwt
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import authentication
 from rest_framework.exceptions import AuthenticationFailed
 from jwt import ExpiredSignatureError, InvalidTokenError
+from jwt.algorithms import get_default_algorithms
+
+from .cache import TTLCache
+from .timing import timed_phase
 
 User = get_user_model()
 
+# проверенные payload токенов по sha256 токена, чтобы не проверять RSA-подпись на каждый запрос с тем же токеном
+payload_cache = TTLCache(maxsize=settings.JWT_CACHE_MAXSIZE, ttl=settings.JWT_CACHE_TTL)
+
+
+@lru_cache(maxsize=1)
+def public_key():
+    """ Публичный ключ для проверки подписи токенов, разобранный один раз на процесс """
+    pem = settings.ACCESS_TOKEN_PUBLIC_KEY.replace("\\n", "\n").encode()
+    return get_default_algorithms()[settings.JWT_ALGORITHM].prepare_key(pem)
+
+
+def decode_token(jwt_token: str) -> dict:
+    """ Проверенный payload токена: из кэша или после проверки подписи и срока действия """
+    key = hashlib.sha256(jwt_token.encode()).hexdigest()
+    payload = payload_cache.get(key)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(jwt_token, public_key(), [settings.JWT_ALGORITHM])
+    # запись в кэше не переживает срок действия токена
+    exp = payload.get('exp')
+    ttl = settings.JWT_CACHE_TTL if exp is None else min(exp - time.time(), settings.JWT_CACHE_TTL)
+    if ttl > 0:
+        payload_cache.set(key, payload, ttl=ttl)
+    return payload
+
 
 # кастомная аутентификация через JWT токены, полученные в Центре пользователей Cloveri
 class JWTAuthentication(authentication.BaseAuthentication):
+    @timed_phase('auth')
     def authenticate(self, request):
         jwt_token = request.META.get('HTTP_AUTHORIZATION')
         if jwt_token is None:
             return None
-        public_key = settings.ACCESS_TOKEN_PUBLIC_KEY.replace("\\n", "\n").encode()
         jwt_token = JWTAuthentication.get_the_token_from_header(jwt_token)
 
         try:
-            payload = jwt.decode(jwt_token, public_key, settings.JWT_ALGORITHM)
+            payload = decode_token(jwt_token)
         except ExpiredSignatureError:
             raise AuthenticationFailed({"detail": {"code": "TOKEN_EXPIRED", "message": "Токен устарел"}})
         except InvalidTokenError:
@@ -0,0 +1,285 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from django.core.cache import caches
+
+from .resilience import current_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш в памяти процесса с ограниченным размером и временем жизни записей.
+
+    При переполнении вытесняются давно не использованные записи (LRU). Время жизни можно задать
+    для каждой записи отдельно, например, короче для закэшированных ошибок.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Объединение одновременных вызовов по одному ключу.
+
+    Если несколько потоков одновременно запрашивают одни и те же данные, загрузку выполняет только
+    первый из них, остальные ждут и получают тот же результат (или то же исключение).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """ Объединение одновременных вызовов по одному ключу для корутин одного цикла событий """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        future = self._calls.get(call_key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._calls[call_key] = loop.create_future()
+        try:
+            result = await fn()
+        except BaseException as err:
+            future.set_exception(err)
+            # исключение получит вызывающий код, ожидающих может и не быть
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[call_key]
+
+
+class StaleWhileRevalidateCache:
+    """
+    Кэш ответов поверх бэкенда кэша Django (общий для всех воркеров при использовании Redis/Memcached).
+
+    Свежая запись отдается сразу. Просроченная запись в течение stale_ttl тоже отдается сразу,
+    а ее обновление запускается в фоне, причем только одно на ключ для всех воркеров.
+    При отсутствии записи данные загружаются синхронно.
+    Если задан stale_if_error, запись хранится еще столько секунд после stale_ttl и отдается, когда загрузка
+    завершилась ошибкой (исключение или значение, не прошедшее cacheable), например, при недоступной Райде.
+    """
+
+    _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+
+    def __init__(self, alias: str, prefix: str, ttl: float, stale_ttl: float, stale_if_error: float = 0):
+        self.alias = alias
+        self.prefix = prefix
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_if_error = stale_if_error
+        self._flight = SingleFlight()
+        self._aflight = AsyncSingleFlight()
+        self._tasks = set()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def make_key(self, *parts) -> str:
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        entry = self.backend.get(key)
+        if entry is not None:
+            if self.usable(entry):
+                if entry['fresh_until'] <= time.time():
+                    self._refresh_in_background(key, loader, cacheable)
+                return entry['value']
+            return self._flight.do(key, lambda: self._load_or_stale(key, loader, cacheable, entry))
+        return self._flight.do(key, lambda: self._load(key, loader, cacheable))
+
+    def usable(self, entry: dict) -> bool:
+        """ Запись свежая или устаревшая не больше чем на stale_ttl """
+        return entry['fresh_until'] + self.stale_ttl > time.time()
+
+    def _load_or_stale(self, key: str, loader: Callable[[], Any], cacheable: Callable[[Any], bool], entry: dict) -> Any:
+        # запись старше stale_ttl хранится только на случай ошибки загрузки (stale_if_error)
+        try:
+            value = loader()
+        except Exception as err:
+            logger.warning("Ошибка загрузки %s, отдается устаревшая запись кэша: %s", key, err)
+            return entry['value']
+        if cacheable(value):
+            self.set(key, value)
+            return value
+        logger.warning("Ошибка загрузки %s, отдается устаревшая запись кэша", key)
+        return entry['value']
+
+    def _load(self, key: str, loader: Callable[[], Any], cacheable: Callable[[Any], bool]) -> Any:
+        value = loader()
+        if cacheable(value):
+            self.set(key, value)
+        return value
+
+    def get(self, key: str) -> Any:
+        """ Значение из кэша без загрузки (None, если записи нет) """
+        entry = self.backend.get(key)
+        return entry['value'] if entry is not None and self.usable(entry) else None
+
+    def set(self, key: str, value: Any):
+        entry = {'value': value, 'fresh_until': time.time() + self.ttl}
+        self.backend.set(key, entry, timeout=self.ttl + self.stale_ttl + self.stale_if_error)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Any], cacheable: Callable[[Any], bool]):
+        # блокировка через add атомарна в бэкендах кэша Django: обновление запускает только один воркер
+        lock_key = f"{key}:refresh"
+        if not self.backend.add(lock_key, 1, timeout=max(self.ttl, 30)):
+            return
+
+        def refresh():
+            try:
+                self._load(key, loader, cacheable)
+            except Exception:
+                logger.exception("Ошибка фонового обновления кэша %s", key)
+            finally:
+                self.backend.delete(lock_key)
+
+        self._executor.submit(refresh)
+
+    async def aget_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                           cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """ Асинхронный вариант get_or_load: loader - корутинная функция, обновление идет отдельной задачей """
+        entry = await self.backend.aget(key)
+        if entry is not None:
+            if self.usable(entry):
+                if entry['fresh_until'] <= time.time():
+                    await self._arefresh_in_background(key, loader, cacheable)
+                return entry['value']
+            return await self._aflight.do(key, lambda: self._aload_or_stale(key, loader, cacheable, entry))
+        return await self._aflight.do(key, lambda: self._aload(key, loader, cacheable))
+
+    async def _aload(self, key: str, loader: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]) -> Any:
+        value = await loader()
+        if cacheable(value):
+            await self.aset(key, value)
+        return value
+
+    async def _aload_or_stale(self, key: str, loader: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool],
+                              entry: dict) -> Any:
+        try:
+            value = await loader()
+        except Exception as err:
+            logger.warning("Ошибка загрузки %s, отдается устаревшая запись кэша: %s", key, err)
+            return entry['value']
+        if cacheable(value):
+            await self.aset(key, value)
+            return value
+        logger.warning("Ошибка загрузки %s, отдается устаревшая запись кэша", key)
+        return entry['value']
+
+    async def aget(self, key: str) -> Any:
+        entry = await self.backend.aget(key)
+        return entry['value'] if entry is not None and self.usable(entry) else None
+
+    async def aset(self, key: str, value: Any):
+        entry = {'value': value, 'fresh_until': time.time() + self.ttl}
+        await self.backend.aset(key, entry, timeout=self.ttl + self.stale_ttl + self.stale_if_error)
+
+    async def adelete(self, key: str):
+        await self.backend.adelete(key)
+
+    async def _arefresh_in_background(self, key: str, loader: Callable[[], Awaitable[Any]],
+                                      cacheable: Callable[[Any], bool]):
+        lock_key = f"{key}:refresh"
+        if not await self.backend.aadd(lock_key, 1, timeout=max(self.ttl, 30)):
+            return
+
+        async def refresh():
+            # задача получает копию контекста запроса, но его бюджет времени к фоновому обновлению не относится
+            current_deadline.set(None)
+            try:
+                await self._aload(key, loader, cacheable)
+            except Exception:
+                logger.exception("Ошибка фонового обновления кэша %s", key)
+            finally:
+                await self.backend.adelete(lock_key)
+
+        # храним ссылку на задачу, чтобы ее не удалил сборщик мусора до завершения
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,43 @@
+"""
+Форматирование дат из Райды (created_at, cf_deadline) для ответов API.
+
+Одни и те же строки дат (сроки конкурсов, даты создания) повторяются в тысячах элементов списков,
+поэтому результат преобразования запоминается в ограниченном кэше по (строка даты, формат).
+Для форматов ответов API строка собирается из полей даты без разбора формата strftime.
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+DATE_FORMAT = '%d.%m.%Y'
+HISTORY_DATE_FORMAT = '%d %B %Y'
+
+# названия месяцев в текущей локали, как их выводит %B
+MONTH_NAMES = ('',) + tuple(datetime(2000, month, 1).strftime('%B') for month in range(1, 13))
+
+FORMATTERS: Dict[str, Callable[[datetime], str]] = {
+    DATE_FORMAT: lambda value: f"{value.day:02d}.{value.month:02d}.{value.year}",
+    HISTORY_DATE_FORMAT: lambda value: f"{value.day:02d} {MONTH_NAMES[value.month]} {value.year}",
+}
+
+
+@lru_cache(maxsize=settings.DATE_FORMAT_CACHE_MAXSIZE)
+def formatted_date(date: str, format_date: str) -> str:
+    """ Преобразование непустой строки даты в формат format_date (ValueError для некорректной даты) """
+    value = datetime.fromisoformat(date.rstrip("Z") + "+00:00")
+    formatter = FORMATTERS.get(format_date)
+    return formatter(value) if formatter is not None else value.strftime(format_date)
+
+
+def datetime_convert(date, format_date=DATE_FORMAT) -> Optional[str]:
+    """ Преобразование даты в заданный формат (None и пустая строка возвращаются как есть). """
+    if not date:
+        return date
+    return formatted_date(date, format_date)
+
+
+def history_date(date) -> Optional[str]:
+    """ Дата в формате истории участия """
+    return datetime_convert(date, HISTORY_DATE_FORMAT)
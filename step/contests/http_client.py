@@ -0,0 +1,302 @@
+import asyncio
+import atexit
+import os
+import threading
+import time
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .metrics import record_upstream_call, record_upstream_retry
+from .resilience import (AsyncBulkhead, AsyncUpstreamUnavailable, Bulkhead, RETRY_STATUSES, circuit_breaker, circuit_open,
+                         deadline_timeout, retry_policy)
+
+
+def bearer_token(headers: Optional[dict]) -> Optional[str]:
+    """ Токен из заголовка Authorization: Bearer <token> """
+    authorization = (headers or {}).get('Authorization') or ''
+    if authorization.startswith('Bearer '):
+        return authorization[len('Bearer '):]
+    return None
+
+
+def rewind_files(files):
+    """ Перемотать файлы запроса в начало перед повторной отправкой """
+    for value in (files.values() if isinstance(files, dict) else files or ()):
+        file = value[1] if isinstance(value, tuple) else value
+        if hasattr(file, 'seek'):
+            file.seek(0)
+
+
+class UpstreamClient:
+    """
+    HTTP-клиент для внешнего сервиса (Райда, сервис конфигов).
+
+    Держит одну requests.Session с пулом keep-alive соединений на хост, поэтому TCP- и TLS-соединения
+    переиспользуются между запросами, а не открываются на каждый вызов. Для всех запросов по умолчанию
+    выставляются таймауты на подключение и чтение, чтобы зависший сервис не блокировал воркер.
+    Каждый запрос учитывается в метриках (contests.metrics) с именем клиента в метке service.
+    Одновременных запросов не больше UPSTREAM_MAX_CONCURRENCY, при разомкнутом выключателе сервиса
+    запросы сразу отклоняются, идемпотентные запросы повторяются при временных ошибках, а таймауты
+    ограничиваются бюджетом времени запроса к API (contests.resilience). Запрос на чтение методом POST
+    (RQL) помечается как идемпотентный параметром idempotent=True.
+    Сессия создается лениво и пересоздается в дочернем процессе после fork (воркеры gunicorn).
+    Если задан token_manager, то запрос с сервисным токеном, отклоненный с кодом 401, один раз
+    повторяется с новым токеном.
+    """
+
+    def __init__(self, name: str, pool_size: int, connect_timeout: float, read_timeout: float):
+        self.name = name
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.token_manager = None
+        self.breaker = circuit_breaker(name)
+        self.bulkhead = Bulkhead(name, settings.UPSTREAM_MAX_CONCURRENCY, settings.UPSTREAM_BULKHEAD_WAIT)
+        self._session = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # сессия общая для всех пользователей, поэтому куки от внешних сервисов не сохраняем
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def _reset(self):
+        # соединения родительского процесса не используем в дочернем
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        limits = deadline_timeout(self.name, *self.timeout)
+        if limits is not None:
+            kwargs['timeout'] = limits
+        with self.bulkhead:
+            if not self.breaker.allow():
+                raise circuit_open(self.name)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except Exception:
+                self.breaker.record(True, time.perf_counter() - start)
+                record_upstream_call(self.name, method, 'error', time.perf_counter() - start)
+                raise
+            except BaseException:
+                # отмена запроса клиентом или остановка процесса - не ошибка внешнего сервиса
+                self.breaker.release()
+                raise
+            seconds = time.perf_counter() - start
+        self.breaker.record(response.status_code >= 500, seconds)
+        record_upstream_call(self.name, method, response.status_code, seconds, len(response.content))
+        return response
+
+    def request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        retryable = retry_policy.retryable(method, kwargs.get('headers'), idempotent)
+        attempt = 1
+        while True:
+            try:
+                response = self._authorized(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = retry_policy.backoff(attempt) if retryable else None
+                if delay is None:
+                    raise
+            else:
+                delay = retry_policy.backoff(attempt) if retryable and response.status_code in RETRY_STATUSES else None
+                if delay is None:
+                    return response
+            record_upstream_retry(self.name)
+            time.sleep(delay)
+            rewind_files(kwargs.get('files'))
+            attempt += 1
+
+    def _authorized(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = self._send(method, url, **kwargs)
+        token = bearer_token(kwargs.get('headers'))
+        if response.status_code == 401 and self.token_manager is not None and token:
+            new_token = self.token_manager.refresh(token)
+            if new_token and new_token != token:
+                kwargs['headers'] = {**kwargs['headers'], 'Authorization': f'Bearer {new_token}'}
+                rewind_files(kwargs.get('files'))
+                response = self._send(method, url, **kwargs)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        """ Закрыть все соединения пула """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class AsyncUpstreamClient:
+    """
+    Асинхронный HTTP-клиент для внешнего сервиса на основе httpx.AsyncClient.
+
+    Пул соединений httpx привязан к циклу событий, поэтому клиент создается лениво для каждого цикла
+    (в ASGI-воркере он один). Лимиты пула, таймауты и повтор запроса после 401 те же, что и у синхронного клиента.
+    """
+
+    def __init__(self, name: str, pool_size: int, connect_timeout: float, read_timeout: float):
+        self.name = name
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.timeouts = (connect_timeout, read_timeout)
+        self.token_manager = None
+        self.breaker = circuit_breaker(name)
+        self.bulkhead = AsyncBulkhead(name, settings.UPSTREAM_MAX_CONCURRENCY, settings.UPSTREAM_BULKHEAD_WAIT)
+        self._clients = weakref.WeakKeyDictionary()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            # клиент общий для всех пользователей, поэтому куки от внешних сервисов не сохраняем
+            cookies = httpx.Cookies(CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])))
+            client = self._clients[loop] = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, cookies=cookies)
+        return client
+
+    def _reset(self):
+        self._clients = weakref.WeakKeyDictionary()
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        limits = deadline_timeout(self.name, *self.timeouts, AsyncUpstreamUnavailable)
+        if limits is not None:
+            kwargs['timeout'] = httpx.Timeout(limits[1], connect=limits[0])
+        async with self.bulkhead:
+            if not self.breaker.allow():
+                raise circuit_open(self.name, AsyncUpstreamUnavailable)
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except Exception:
+                self.breaker.record(True, time.perf_counter() - start)
+                record_upstream_call(self.name, method, 'error', time.perf_counter() - start)
+                raise
+            except BaseException:
+                # отмена запроса клиентом или остановка процесса - не ошибка внешнего сервиса
+                self.breaker.release()
+                raise
+            seconds = time.perf_counter() - start
+        self.breaker.record(response.status_code >= 500, seconds)
+        record_upstream_call(self.name, method, response.status_code, seconds, len(response.content))
+        return response
+
+    async def request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> httpx.Response:
+        retryable = retry_policy.retryable(method, kwargs.get('headers'), idempotent)
+        attempt = 1
+        while True:
+            try:
+                response = await self._authorized(method, url, **kwargs)
+            except httpx.TransportError:
+                delay = retry_policy.backoff(attempt) if retryable else None
+                if delay is None:
+                    raise
+            else:
+                delay = retry_policy.backoff(attempt) if retryable and response.status_code in RETRY_STATUSES else None
+                if delay is None:
+                    return response
+            record_upstream_retry(self.name)
+            await asyncio.sleep(delay)
+            rewind_files(kwargs.get('files'))
+            attempt += 1
+
+    async def _authorized(self, method: str, url: str, **kwargs) -> httpx.Response:
+        response = await self._send(method, url, **kwargs)
+        token = bearer_token(kwargs.get('headers'))
+        if response.status_code == 401 and self.token_manager is not None and token:
+            new_token = await self.token_manager.arefresh(token)
+            if new_token and new_token != token:
+                kwargs['headers'] = {**kwargs['headers'], 'Authorization': f'Bearer {new_token}'}
+                rewind_files(kwargs.get('files'))
+                response = await self._send(method, url, **kwargs)
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('PATCH', url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('DELETE', url, **kwargs)
+
+    async def aclose(self):
+        """ Закрыть соединения клиента текущего цикла событий """
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+raida = UpstreamClient(
+    name='raida',
+    pool_size=settings.UPSTREAM_POOL_SIZE,
+    connect_timeout=settings.UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=settings.UPSTREAM_READ_TIMEOUT,
+)
+
+configs_service = UpstreamClient(
+    name='configs',
+    pool_size=settings.UPSTREAM_POOL_SIZE,
+    connect_timeout=settings.UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=settings.UPSTREAM_READ_TIMEOUT,
+)
+
+
+async_raida = AsyncUpstreamClient(
+    name='raida',
+    pool_size=settings.UPSTREAM_POOL_SIZE,
+    connect_timeout=settings.UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=settings.UPSTREAM_READ_TIMEOUT,
+)
+
+async_configs_service = AsyncUpstreamClient(
+    name='configs',
+    pool_size=settings.UPSTREAM_POOL_SIZE,
+    connect_timeout=settings.UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=settings.UPSTREAM_READ_TIMEOUT,
+)
+
+
+def close_clients():
+    """ Закрыть соединения всех клиентов (при остановке воркера) """
+    raida.close()
+    configs_service.close()
+
+
+atexit.register(close_clients)
@@ -0,0 +1,74 @@
+"""
+Кодирование и разбор JSON для ответов API и тел ответов внешних сервисов.
+
+Используется самая быстрая из установленных библиотек: orjson, затем simplejson, иначе стандартный json
+(настройка JSON_BACKEND: auto, orjson, simplejson или json). Результат кодирования совпадает с JSONRenderer
+из DRF: компактный JSON в UTF-8 без экранирования не-ASCII символов, типы, которые библиотека не кодирует
+сама (datetime, Decimal, UUID, ленивые строки и т.д.), преобразуются кодировщиком DRF.
+"""
+import json
+from importlib import import_module
+from typing import Any, Callable, Tuple
+
+import requests
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+BACKENDS = ('orjson', 'simplejson', 'json')
+
+encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+
+def orjson_backend(module) -> Tuple[Callable[[Any], bytes], Callable[[Any], Any]]:
+    # даты отдаем кодировщику DRF: orjson форматирует их иначе (микросекунды, +00:00 вместо Z)
+    options = module.OPT_NON_STR_KEYS | module.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(data: Any) -> bytes:
+        return module.dumps(data, default=encoder.default, option=options)
+
+    return dumps, module.loads
+
+
+def simplejson_backend(module) -> Tuple[Callable[[Any], bytes], Callable[[Any], Any]]:
+    def dumps(data: Any) -> bytes:
+        return module.dumps(data, default=encoder.default, ensure_ascii=False, separators=(',', ':'),
+                            allow_nan=False, use_decimal=False, namedtuple_as_object=False).encode()
+
+    return dumps, module.loads
+
+
+def json_backend(module) -> Tuple[Callable[[Any], bytes], Callable[[Any], Any]]:
+    def dumps(data: Any) -> bytes:
+        return encoder.encode(data).encode()
+
+    return dumps, module.loads
+
+
+def load_backend(name: str) -> Tuple[str, Callable[[Any], bytes], Callable[[Any], Any]]:
+    """ Функции кодирования и разбора первой установленной библиотеки из BACKENDS (или заданной name) """
+    for candidate in (BACKENDS if name == 'auto' else (name,)):
+        try:
+            module = import_module(candidate)
+        except ImportError:
+            continue
+        factory = {'orjson': orjson_backend, 'simplejson': simplejson_backend}.get(candidate, json_backend)
+        return (candidate, *factory(module))
+    return ('json', *json_backend(json))
+
+
+BACKEND, dumps, loads = load_backend(settings.JSON_BACKEND)
+
+
+def json_body(response) -> Any:
+    """
+    Разобранное тело ответа внешнего сервиса (requests.Response или httpx.Response) вместо response.json().
+
+    Ошибка разбора - requests.JSONDecodeError (RequestException) для requests и ValueError для httpx,
+    как и у response.json(), поэтому обработка ошибок в сервисном слое не меняется.
+    """
+    try:
+        return loads(response.content)
+    except ValueError as err:
+        if isinstance(response, requests.Response):
+            raise requests.JSONDecodeError(str(err), '', 0) from err
+        raise
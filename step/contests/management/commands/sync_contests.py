@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from requests.exceptions import RequestException
+
+from contests.models import SyncState
+from contests.readmodel import sync_process
+
+
+class Command(BaseCommand):
+    help = "Синхронизация каталога конкурсов из Райды в локальную модель чтения"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--node-id', help="node_id процесса конкурсов (вместе с --process-id)")
+        parser.add_argument('--process-id', help="id процесса конкурсов (вместе с --node-id)")
+        parser.add_argument('--full', action='store_true', help="Загрузить все конкурсы, а не только измененные")
+        parser.add_argument('--once', action='store_true', help="Выполнить одну синхронизацию и завершиться")
+        parser.add_argument('--interval', type=float, default=settings.CONTESTS_SYNC_INTERVAL,
+                            help="Интервал между синхронизациями, в секундах")
+
+    def handle(self, *args, **options):
+        if bool(options['node_id']) != bool(options['process_id']):
+            self.stderr.write("--node-id и --process-id передаются вместе")
+            return
+        full = options['full']
+        while True:
+            # между синхронизациями соединение с БД могло устареть или быть закрыто сервером
+            close_old_connections()
+            self.sync_all(options['node_id'], options['process_id'], full)
+            if options['once']:
+                break
+            full = False
+            time.sleep(options['interval'])
+
+    def sync_all(self, node_id, process_id, full):
+        targets = set(SyncState.objects.values_list('node_id', 'process_id')) | set(settings.CONTESTS_SYNC_TARGETS)
+        if node_id:
+            targets.add((node_id, process_id))
+        for target_node_id, target_process_id in sorted(targets):
+            try:
+                saved, deleted = sync_process(target_node_id, target_process_id, full=full)
+            except (RequestException, ValueError) as err:
+                # ошибка одного процесса не останавливает синхронизацию остальных
+                self.stderr.write(f"{target_node_id}/{target_process_id}: ошибка синхронизации: {err}")
+                continue
+            self.stdout.write(f"{target_node_id}/{target_process_id}: сохранено {saved}, удалено {deleted}")
@@ -0,0 +1,318 @@
+"""
+Метрики вызовов внешних сервисов (Райда, сервис конфигов) в текстовом формате Prometheus.
+
+Каждый запрос клиентов из contests.http_client учитывается по сервису и логической операции
+(get_configs, get_participation, get_attachments, create_task и т.д.): время ответа, код ответа и размер тела.
+Операция задается декоратором upstream_operation на функциях сервисного слоя и передается
+в клиент через contextvars, поэтому сигнатуры функций не меняются.
+
+Для каждого запроса к API (UpstreamMetricsMiddleware) считаются число вызовов внешних сервисов
+и суммарное время ожидания их ответов, по имени маршрута. Отношение
+step_view_upstream_calls_total к step_view_requests_total показывает, сколько вызовов каждой операции
+приходится на один запрос (N+1), step_upstream_request_duration_seconds - медленные операции.
+
+Метрики хранятся в памяти процесса: при нескольких воркерах gunicorn каждый воркер отдает свои.
+Эндпоинт /metrics подключается только при METRICS_ENABLED=1, доступ ограничивается токеном METRICS_TOKEN
+и/или списком адресов METRICS_ALLOWED_IPS.
+"""
+import asyncio
+import contextvars
+import hmac
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# границы корзин гистограмм: время в секундах и число вызовов внешних сервисов на запрос
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALLS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """ Метрика с набором меток; значения хранятся по кортежу значений меток """
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def labels_text(self, values: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = tuple(zip(self.labelnames, values)) + extra
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{self.labels_text(labels)} {format_value(value)}'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = (), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # для каждого набора меток: число наблюдений по корзинам (не накопительное), сумма
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = (('le', format_value(bound)),)
+                yield f'{self.name}_bucket{self.labels_text(labels, le)} {cumulative}'
+            yield f'{self.name}_sum{self.labels_text(labels)} {format_value(total)}'
+            yield f'{self.name}_count{self.labels_text(labels)} {cumulative}'
+
+
+class Registry:
+    """ Набор метрик процесса """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Labels = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Labels = (), buckets=DURATION_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+registry = Registry()
+
+upstream_duration = registry.histogram(
+    'step_upstream_request_duration_seconds', 'Время ответа внешнего сервиса', ('service', 'operation', 'method'))
+upstream_requests = registry.counter(
+    'step_upstream_requests_total', 'Число запросов к внешним сервисам по коду ответа',
+    ('service', 'operation', 'method', 'status'))
+upstream_response_bytes = registry.counter(
+    'step_upstream_response_bytes_total', 'Размер тел ответов внешних сервисов, байт', ('service', 'operation'))
+upstream_rejected = registry.counter(
+    'step_upstream_rejected_total', 'Число вызовов внешних сервисов, отклоненных без обращения к ним',
+    ('service', 'reason'))
+upstream_retries = registry.counter(
+    'step_upstream_retries_total', 'Число повторов запросов к внешним сервисам после временной ошибки',
+    ('service', 'operation'))
+view_requests = registry.counter(
+    'step_view_requests_total', 'Число запросов к API', ('view', 'status'))
+view_upstream_calls = registry.counter(
+    'step_view_upstream_calls_total', 'Число вызовов внешних сервисов из запросов к API',
+    ('view', 'service', 'operation'))
+request_upstream_calls = registry.histogram(
+    'step_request_upstream_calls', 'Число вызовов внешних сервисов за один запрос к API', ('view',), CALLS_BUCKETS)
+request_upstream_seconds = registry.histogram(
+    'step_request_upstream_seconds', 'Суммарное время ожидания внешних сервисов за один запрос к API', ('view',))
+
+
+class RequestStats:
+    """ Вызовы внешних сервисов в рамках одного запроса к API (обновляется и из потоков пула) """
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.operations: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, service: str, operation: str, seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+            self.operations[(service, operation)] += 1
+
+
+current_operation: contextvars.ContextVar[str] = contextvars.ContextVar('upstream_operation', default='other')
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    'upstream_request_stats', default=None)
+
+
+def upstream_operation(name: str) -> Callable:
+    """ Декоратор функции сервисного слоя: вызовы внешних сервисов внутри нее учитываются как операция name """
+
+    def decorator(function: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(function):
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                token = current_operation.set(name)
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    current_operation.reset(token)
+            return async_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            token = current_operation.set(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                current_operation.reset(token)
+        return wrapper
+
+    return decorator
+
+
+def in_request_context(function: Callable) -> Callable:
+    """
+    function для выполнения в потоке ThreadPoolExecutor с контекстом текущего запроса,
+    чтобы вызовы внешних сервисов из пула учитывались в статистике запроса
+    """
+    context = contextvars.copy_context()
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        # один контекст нельзя выполнять одновременно в нескольких потоках, поэтому копия на каждый вызов
+        return context.copy().run(function, *args, **kwargs)
+
+    return wrapper
+
+
+def record_upstream_call(service: str, method: str, status, seconds: float, size: int = 0):
+    """ Учет одного запроса к внешнему сервису (status - код ответа или 'error', если ответа нет) """
+    operation = current_operation.get()
+    upstream_duration.observe(seconds, service, operation, method)
+    upstream_requests.inc(service, operation, method, str(status))
+    if size:
+        upstream_response_bytes.inc(service, operation, amount=size)
+    stats = current_request.get()
+    if stats is not None:
+        stats.add(service, operation, seconds)
+
+
+def record_upstream_rejected(service: str, reason: str):
+    """ Учет вызова, отклоненного выключателем (circuit_open) или ограничителем (bulkhead_full) """
+    upstream_rejected.inc(service, reason)
+
+
+def record_upstream_retry(service: str):
+    upstream_retries.inc(service, current_operation.get())
+
+
+def record_request(view: str, status: int, stats: RequestStats):
+    view_requests.inc(view, str(status))
+    request_upstream_calls.observe(stats.calls, view)
+    request_upstream_seconds.observe(stats.seconds, view)
+    for (service, operation), calls in list(stats.operations.items()):
+        view_upstream_calls.inc(view, service, operation, amount=calls)
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name or match.view_name) if match else 'unmatched'
+
+
+class UpstreamMetricsMiddleware:
+    """ Учет вызовов внешних сервисов за каждый запрос к API (синхронный и асинхронный режим) """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        record_request(view_name(request), response.status_code, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        record_request(view_name(request), response.status_code, stats)
+        return response
+
+
+def metrics_allowed(request) -> bool:
+    """ Проверка доступа к метрикам: адрес клиента из METRICS_ALLOWED_IPS и токен METRICS_TOKEN, если заданы """
+    if settings.METRICS_ALLOWED_IPS and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return False
+    if settings.METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        return hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
+    return True
+
+
+def metrics_view(request):
+    """ Метрики процесса в текстовом формате Prometheus """
+    if not metrics_allowed(request):
+        return JsonResponse({'detail': {'code': 'FORBIDDEN', 'message': 'Доступ к метрикам запрещен.'}},
+                            status=403, json_dumps_params={'ensure_ascii': False})
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContestSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.CharField(max_length=64)),
+                ('process_id', models.CharField(max_length=64)),
+                ('contest_id', models.CharField(max_length=64)),
+                ('status_id', models.CharField(max_length=64, null=True)),
+                ('item', models.JSONField()),
+                ('raw', models.JSONField()),
+                ('created_at', models.CharField(max_length=64, null=True)),
+                ('updated_at', models.CharField(max_length=64, null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.CharField(max_length=64)),
+                ('process_id', models.CharField(max_length=64)),
+                ('watermark', models.CharField(max_length=64, null=True)),
+                ('last_synced_at', models.DateTimeField(null=True)),
+                ('last_full_sync_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='syncstate',
+            constraint=models.UniqueConstraint(fields=('node_id', 'process_id'), name='sync_state_node_process'),
+        ),
+        migrations.AddIndex(
+            model_name='contestsnapshot',
+            index=models.Index(fields=['node_id', 'process_id', 'status_id'], name='contest_snapshot_status'),
+        ),
+        migrations.AddConstraint(
+            model_name='contestsnapshot',
+            constraint=models.UniqueConstraint(fields=('node_id', 'contest_id'), name='contest_snapshot_node_contest'),
+        ),
+    ]
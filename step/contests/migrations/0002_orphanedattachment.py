@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrphanedAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.CharField(max_length=64)),
+                ('task_id', models.CharField(max_length=64)),
+                ('attachment_id', models.CharField(max_length=64, null=True)),
+                ('status_code', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0002_orphanedattachment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestsnapshot',
+            name='position',
+            field=models.IntegerField(default=0),
+        ),
+    ]
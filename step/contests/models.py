@@ -1,3 +1,53 @@
 from django.db import models
 
-# Create your models here.
+
+class ContestSnapshot(models.Model):
+    """ Конкурс из Райды в локальной модели чтения (заполняется командой sync_contests) """
+    node_id = models.CharField(max_length=64)
+    process_id = models.CharField(max_length=64)
+    contest_id = models.CharField(max_length=64)
+    status_id = models.CharField(max_length=64, null=True)
+    # конкурс в формате элемента списка (contest_item) и в исходном виде для страницы конкурса
+    item = models.JSONField()
+    raw = models.JSONField()
+    created_at = models.CharField(max_length=64, null=True)
+    updated_at = models.CharField(max_length=64, null=True)
+    # место конкурса в ответе Райды на RQL-запрос процесса: списки отдаются в том же порядке, что и из Райды
+    position = models.IntegerField(default=0)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['node_id', 'contest_id'], name='contest_snapshot_node_contest'),
+        ]
+        indexes = [
+            models.Index(fields=['node_id', 'process_id', 'status_id'], name='contest_snapshot_status'),
+        ]
+
+
+class SyncState(models.Model):
+    """ Состояние синхронизации конкурсов одного процесса Райды """
+    node_id = models.CharField(max_length=64)
+    process_id = models.CharField(max_length=64)
+    # наибольшие updated_at/created_at среди загруженных конкурсов, с них начинается следующая синхронизация
+    watermark = models.CharField(max_length=64, null=True)
+    last_synced_at = models.DateTimeField(null=True)
+    last_full_sync_at = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['node_id', 'process_id'], name='sync_state_node_process'),
+        ]
+
+
+class OrphanedAttachment(models.Model):
+    """
+    Файл решения, загруженный в Райду, когда заявка не была изменена (Райда отклонила изменение заявки
+    или ее прежний статус был возвращен компенсацией). Удаляется из Райды вручную, по записям в админке.
+    """
+    node_id = models.CharField(max_length=64)
+    task_id = models.CharField(max_length=64)
+    attachment_id = models.CharField(max_length=64, null=True)
+    # статус ответа Райды на изменение заявки
+    status_code = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
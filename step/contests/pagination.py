@@ -0,0 +1,87 @@
+"""
+Постраничная выдача списков конкурсов и задач.
+
+Страница задается параметрами limit/offset или непрозрачным курсором cursor из ответа (info.next, info.prev).
+Без этих параметров список отдается целиком, как и раньше. Страница вырезается из результата сервисного слоя:
+каталог конкурсов и мои задачи берутся из общего кэша каталога (мои задачи - вместе с индексом участия),
+задачи конкурса - из короткого кэша CONTEST_TASKS_CACHE_TTL, поэтому следующие страницы не запрашивают Райду заново.
+История участия собирается на каждый запрос целиком.
+"""
+import base64
+import json
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from rest_framework import serializers
+
+
+def encode_cursor(offset: int, limit: int) -> str:
+    data = json.dumps({'o': offset, 'l': limit}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        offset, limit = int(data['o']), int(data['l'])
+    except (ValueError, TypeError, KeyError):
+        raise serializers.ValidationError('Некорректный курсор')
+    if offset < 0 or not 0 < limit <= settings.PAGINATION_MAX_LIMIT:
+        raise serializers.ValidationError('Некорректный курсор')
+    return offset, limit
+
+
+class PaginationSerializer(serializers.Serializer):
+    """ Сериализатор для валидации параметров пагинации limit, offset и cursor """
+    limit = serializers.IntegerField(min_value=1, required=False)
+    offset = serializers.IntegerField(min_value=0, required=False)
+    cursor = serializers.CharField(required=False)
+
+    def validate_limit(self, value):
+        return min(value, settings.PAGINATION_MAX_LIMIT)
+
+    def validate_cursor(self, value):
+        return decode_cursor(value)
+
+    def validate(self, attrs):
+        if 'cursor' in attrs:
+            offset, limit = attrs['cursor']
+        elif 'limit' in attrs or 'offset' in attrs:
+            offset, limit = attrs.get('offset', 0), attrs.get('limit', settings.PAGINATION_DEFAULT_LIMIT)
+        else:
+            return {}
+        return {'offset': offset, 'limit': limit}
+
+
+def get_page(query_params) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Параметры страницы из query-параметров запроса.
+
+    Возвращает ({'offset', 'limit'} или None, если пагинация не запрошена; ответ с ошибкой 400 или None).
+    """
+    serializer = PaginationSerializer(data={key: query_params.get(key) for key in ('limit', 'offset', 'cursor')
+                                            if query_params.get(key) is not None})
+    if not serializer.is_valid():
+        return None, {'detail': {"code": "BAD_REQUEST", "message": serializer.errors}}
+    return serializer.validated_data or None, None
+
+
+def paginate(result: Tuple[Dict, int], page: Optional[Dict]) -> Tuple[Dict, int]:
+    """ Страница списка из ответа сервисного слоя (data, status) с курсорами соседних страниц в info """
+    response_data, status = result
+    if page is None or status != 200:
+        return result
+    offset, limit = page['offset'], page['limit']
+    items = response_data['data']
+    total = len(items)
+    data = items[offset:offset + limit]
+    info = {
+        **response_data['info'],
+        "count": len(data),
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next": encode_cursor(offset + limit, limit) if offset + limit < total else None,
+        "prev": encode_cursor(max(offset - limit, 0), limit) if offset > 0 else None,
+    }
+    return {**response_data, "data": data, "info": info}, status
@@ -0,0 +1,109 @@
+"""
+Проекции RQL-запросов к Райде: для каждого списка запрашиваются только те поля задач, которые
+использует преобразование ответа (contest_item, user_task_item, history_item и т.д.).
+
+Если Райда отклоняет запрос с проекцией, а тот же запрос без нее выполняется, проекция отключается
+для процесса и дальше задачи запрашиваются целиком. После первого успешного запроса с проекцией
+поддержка считается подтвержденной, и ошибки 400/422 возвращаются без повтора.
+"""
+import logging
+from typing import Dict, List
+
+from django.conf import settings
+
+from .http_client import raida, async_raida
+
+logger = logging.getLogger(__name__)
+
+# поля задач Райды, используемые каждым списком
+RQL_FIELDS = {
+    # contest_item, user_task_item: списки конкурсов, раздел мои задания
+    'contests': (
+        'id',
+        'title',
+        'description',
+        'status.id',
+        'status.name',
+        'custom_fields.cf_deadline',
+        'custom_fields.cf_award',
+        'custom_fields.cf_brief',
+        'custom_fields.cf_konkurs_category',
+        'custom_fields.cf_projects',
+        'custom_fields.cf_profession',
+    ),
+    # history_item: история участия
+    'history': (
+        'id',
+        'title',
+        'created_at',
+        'custom_fields.cf_deadline',
+    ),
+    # contest_task_item: задачи конкурса
+    'contest_tasks': (
+        'id',
+        'title',
+        'description',
+        'status.id',
+        'status.name',
+        'custom_fields.cf_deadline',
+        'custom_fields.cf_award',
+        'custom_fields.cf_brief',
+        'custom_fields.cf_projects',
+        'custom_fields.cf_konkurs_category',
+    ),
+    # participation_task: все заявки пользователя (индекс участия)
+    'participation': (
+        'id',
+        'process.id',
+        'status.id',
+        'status.name',
+        'custom_fields.cf_konkurs_id',
+        'custom_fields.solution_link',
+        'custom_fields.comments',
+    ),
+}
+
+# статусы ответа Райды, при которых запрос повторяется без проекции
+REJECTED_STATUSES = (400, 422)
+
+# confirmed - Райда уже выполнила запрос с проекцией, отказ с ней не связан
+projection = {'enabled': settings.RQL_FIELD_PROJECTION, 'confirmed': False}
+
+
+def rql_fields(name: str) -> List[str]:
+    """ Список полей для RQL-запроса списка name (пустой, если проекция отключена) """
+    return list(RQL_FIELDS[name]) if projection['enabled'] else []
+
+
+def retry_without_projection(query: Dict, status_code: int) -> bool:
+    """ Нужно ли повторить запрос без проекции; успешный ответ на запрос с проекцией подтверждает ее поддержку """
+    if not query.get('fields'):
+        return False
+    if status_code < 400:
+        projection['confirmed'] = True
+    return status_code in REJECTED_STATUSES and not projection['confirmed']
+
+
+def projection_rejected(fallback_status: int):
+    """ Отключить проекцию, если Райда приняла запрос без нее """
+    if fallback_status < 400:
+        logger.warning("Райда не поддерживает проекцию полей в RQL-запросах, задачи запрашиваются целиком")
+        projection['enabled'] = False
+
+
+def post_rql(url: str, query: Dict, headers: Dict):
+    """ RQL-запрос в Райду с повтором без проекции, если Райда отклонила запрос с ней """
+    response = raida.post(url, json=query, headers=headers, idempotent=True)
+    if retry_without_projection(query, response.status_code):
+        response = raida.post(url, json={**query, 'fields': []}, headers=headers, idempotent=True)
+        projection_rejected(response.status_code)
+    return response
+
+
+async def apost_rql(url: str, query: Dict, headers: Dict):
+    """ Асинхронный вариант post_rql """
+    response = await async_raida.post(url, json=query, headers=headers, idempotent=True)
+    if retry_without_projection(query, response.status_code):
+        response = await async_raida.post(url, json={**query, 'fields': []}, headers=headers, idempotent=True)
+        projection_rejected(response.status_code)
+    return response
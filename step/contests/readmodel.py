@@ -0,0 +1,209 @@
+"""
+Локальная модель чтения каталога конкурсов (ContestSnapshot, SyncState).
+
+Команда sync_contests периодически загружает из Райды конкурсы, измененные после последней синхронизации
+(по updated_at/created_at), преобразует их так же, как get_contests (contest_item), и сохраняет в БД.
+Списки активных и архивных конкурсов и страница конкурса отдаются из БД, если синхронизация процесса
+была не раньше CONTESTS_READ_MODEL_MAX_AGE секунд назад, иначе - как раньше, запросом в Райду.
+Процессы для синхронизации задаются настройкой CONTESTS_SYNC_TARGETS или передаются команде явно,
+запросы к спискам в БД не пишут. Списки отдаются в порядке, в котором конкурсы приходят из Райды.
+"""
+import functools
+import logging
+from itertools import count
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from requests.exceptions import HTTPError
+
+from .http_client import raida
+from .jsonbackend import json_body
+from .metrics import upstream_operation
+from .models import ContestSnapshot, SyncState
+from .services import base_url, contest_item, list_response, fetch_contest, get_token, invalidate_contest
+
+logger = logging.getLogger(__name__)
+
+
+def contests_delta_query(process_id: str, watermark: Optional[str]) -> Dict:
+    """ RQL-запрос конкурсов процесса, измененных начиная с watermark (всех, если watermark не задан) """
+    condition = f" AND updated_at >= '{watermark}'" if watermark else ''
+    return {
+        "rql": f"process.id = '{process_id}'{condition}",
+        # для страницы конкурса нужны все поля, поэтому задачи запрашиваются целиком
+        "fields": []
+    }
+
+
+@upstream_operation('sync_contests')
+def fetch_changed_contests(token: str, node_id: str, process_id: str, watermark: Optional[str]) -> List[Dict]:
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/rql/{node_id}"
+    response = raida.post(url, json=contests_delta_query(process_id, watermark), headers=headers,
+                          idempotent=True)
+    response.raise_for_status()
+    return json_body(response).get('data', [])
+
+
+def contest_version(contest: Dict) -> Optional[str]:
+    return contest.get('updated_at') or contest.get('created_at')
+
+
+def snapshot(node_id: str, process_id: str, contest: Dict, position: int) -> ContestSnapshot:
+    return ContestSnapshot(
+        node_id=node_id,
+        process_id=process_id,
+        contest_id=contest['id'],
+        status_id=(contest.get('status') or {}).get('id'),
+        item=contest_item(contest),
+        raw=contest,
+        created_at=contest.get('created_at'),
+        updated_at=contest_version(contest),
+        position=position,
+    )
+
+
+def sync_process(node_id: str, process_id: str, full: bool = False) -> Tuple[int, int]:
+    """
+    Синхронизация конкурсов процесса process_id с Райдой.
+
+    При полной синхронизации (full или раз в CONTESTS_SYNC_FULL_INTERVAL секунд) загружаются все конкурсы
+    процесса, а удаленные из Райды удаляются и из БД. Возвращает (число сохраненных, число удаленных).
+    Место конкурса в списке берется из ответа Райды при полной синхронизации; новые конкурсы из частичной
+    синхронизации добавляются в конец списка, как их добавляет Райда, а измененные сохраняют свое место.
+    """
+    state, _ = SyncState.objects.get_or_create(node_id=node_id, process_id=process_id)
+    now = timezone.now()
+    full_interval = timedelta(seconds=settings.CONTESTS_SYNC_FULL_INTERVAL)
+    full = full or state.watermark is None or state.last_full_sync_at is None \
+        or state.last_full_sync_at <= now - full_interval
+
+    token = get_token()
+    try:
+        contests = fetch_changed_contests(token, node_id, process_id, None if full else state.watermark)
+    except HTTPError as err:
+        if full or err.response.status_code != 400:
+            raise
+        # Райда не поддерживает отбор по updated_at: загружаем все конкурсы
+        logger.warning("Отбор конкурсов по updated_at не поддерживается, выполняется полная синхронизация")
+        full = True
+        contests = fetch_changed_contests(token, node_id, process_id, None)
+
+    contests = [contest for contest in contests if contest.get('id')]
+    versions = [contest_version(contest) for contest in contests if contest_version(contest)]
+    process_snapshots = ContestSnapshot.objects.filter(node_id=node_id, process_id=process_id)
+    stored = dict(process_snapshots.values_list('contest_id', 'updated_at'))
+    update_fields = ['process_id', 'status_id', 'item', 'raw', 'created_at', 'updated_at', 'synced_at']
+    if full:
+        positions = count()
+        update_fields.append('position')
+    else:
+        positions = count((process_snapshots.aggregate(last=Max('position'))['last'] or 0) + 1)
+    with transaction.atomic():
+        ContestSnapshot.objects.bulk_create(
+            [snapshot(node_id, process_id, contest, next(positions)) for contest in contests],
+            update_conflicts=True,
+            unique_fields=['node_id', 'contest_id'],
+            update_fields=update_fields,
+        )
+        deleted = 0
+        if full:
+            deleted, _ = ContestSnapshot.objects.filter(node_id=node_id, process_id=process_id) \
+                .exclude(contest_id__in=[contest['id'] for contest in contests]).delete()
+            state.last_full_sync_at = now
+        if versions:
+            state.watermark = max(versions) if full else max(state.watermark, *versions)
+        state.last_synced_at = now
+        state.save()
+    # измененные и удаленные конкурсы убираем из кэша страницы конкурса
+    changed = {contest['id'] for contest in contests if stored.get(contest['id']) != contest_version(contest)}
+    if full:
+        changed |= set(stored) - {contest['id'] for contest in contests}
+    for contest_id in changed:
+        invalidate_contest(node_id, contest_id)
+    return len(contests), deleted
+
+
+def is_fresh(state: Optional[SyncState]) -> bool:
+    max_age = timedelta(seconds=settings.CONTESTS_READ_MODEL_MAX_AGE)
+    return state is not None and state.last_synced_at is not None and state.last_synced_at > timezone.now() - max_age
+
+
+def status_list(status_ids: Union[Tuple[str, ...], List[str], str, None]) -> Optional[Iterable[str]]:
+    if status_ids is None:
+        return None
+    return (status_ids,) if isinstance(status_ids, str) else status_ids
+
+
+def read_contests(
+        node_id: Optional[str],
+        process_id: str,
+        status_ids: Union[Tuple[str, ...], List[str], str, None],
+        message: str
+) -> Optional[Tuple[Dict, int]]:
+    """
+    Список конкурсов процесса по статусам из модели чтения в формате get_contests.
+
+    Возвращает None, если модель чтения выключена или данные процесса устарели (тогда список запрашивается в Райде).
+    """
+    if not settings.CONTESTS_READ_MODEL:
+        return None
+    state = SyncState.objects.filter(node_id=node_id, process_id=process_id).first()
+    if not is_fresh(state):
+        return None
+    snapshots = ContestSnapshot.objects.filter(node_id=node_id, process_id=process_id)
+    statuses = status_list(status_ids)
+    if statuses is not None:
+        snapshots = snapshots.filter(status_id__in=statuses)
+    result_data = list(snapshots.order_by('position', 'contest_id').values_list('item', flat=True))
+    return list_response(result_data, message), 200
+
+
+def read_contest(contest_id: str, node_id: Optional[str]) -> Optional[Dict]:
+    """ Конкурс в исходном виде из модели чтения, если данные его процесса не устарели """
+    if not settings.CONTESTS_READ_MODEL:
+        return None
+    contest = ContestSnapshot.objects.filter(node_id=node_id, contest_id=str(contest_id)).first()
+    if contest is None:
+        return None
+    state = SyncState.objects.filter(node_id=node_id, process_id=contest.process_id).first()
+    return contest.raw if is_fresh(state) else None
+
+
+def closing_connections(func):
+    """
+    Закрытие соединения с БД модели чтения, если его открыл func. Для функций, которые выполняются в рабочих
+    потоках (пул потоков запроса, фоновое обновление кэша): Django закрывает соединения только потока запроса.
+    Соединение, открытое до вызова (например, в потоке запроса), и соединения других баз не закрываются.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        connection = connections[router.db_for_read(ContestSnapshot)]
+        opened = connection.connection is None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if opened:
+                connection.close()
+    return wrapper
+
+
+@closing_connections
+def fetch_contest_local(token: str, contest_id: str, node_id: Optional[str]) -> Tuple[Dict | list, int]:
+    """
+    fetch_contest с чтением из модели чтения: конкурса нет в свежих данных - запрос в Райду.
+    Выполняется в потоке пула ContestDetailsView или фонового обновления кэша, поэтому закрывает соединение с БД.
+    """
+    contest = read_contest(contest_id, node_id)
+    if contest is not None:
+        return contest, 200
+    return fetch_contest(token, contest_id, node_id)
+
+
+aread_contests = sync_to_async(read_contests)
+aread_contest = sync_to_async(read_contest)
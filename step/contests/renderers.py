@@ -0,0 +1,28 @@
+from rest_framework import renderers
+
+from .jsonbackend import dumps
+from .timing import timed_phase
+
+
+def escape_separators(content: bytes) -> bytes:
+    # как и JSONRenderer из DRF, экранируем U+2028 и U+2029, чтобы ответ оставался корректным JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer, кодирующий ответ через contests.jsonbackend (orjson, если установлен).
+
+    Ответ совпадает с ответом JSONRenderer из DRF. Запросы с отступами (Accept: application/json; indent=4)
+    рендерятся стандартным способом.
+    """
+
+    @timed_phase('render')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return escape_separators(dumps(data))
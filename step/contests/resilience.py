@@ -0,0 +1,314 @@
+"""
+Защита от медленного или недоступного внешнего сервиса (Райда, сервис конфигов).
+
+Автоматический выключатель (CircuitBreaker, один на сервис в процессе) размыкается, если среди последних
+CIRCUIT_BREAKER_WINDOW вызовов доля ошибок (нет ответа или ответ 5xx) или медленных вызовов превышает
+порог. В разомкнутом состоянии вызовы сразу отклоняются, через CIRCUIT_BREAKER_OPEN_TIMEOUT секунд
+пропускается несколько пробных вызовов: если они успешны, выключатель замыкается, иначе снова размыкается.
+
+Ограничитель одновременных вызовов (Bulkhead) не дает одному сервису занять все потоки воркера:
+вызов, не дождавшийся свободного места за UPSTREAM_BULKHEAD_WAIT секунд, отклоняется.
+
+Отклоненный вызов завершается исключением UpstreamUnavailable (AsyncUpstreamUnavailable для httpx),
+которое сервисный слой превращает в ответ 503 в общем формате ошибок API, а кэши конкурсов в это время
+отдают устаревшие данные (CACHE_STALE_IF_ERROR).
+
+Идемпотентные запросы (GET, DELETE, RQL-запросы на чтение и запросы с заголовком Idempotency-Key)
+при ошибке соединения или ответе 502/503/504 повторяются (RetryPolicy) с экспоненциально растущей
+случайной паузой. Каждый запрос к API получает бюджет времени REQUEST_DEADLINE (RequestDeadlineMiddleware),
+который через contextvars виден всем вложенным вызовам: таймауты вызовов ограничиваются оставшимся
+временем, повтор не выполняется, если после паузы времени не останется, а вызов после истечения
+бюджета сразу завершается ответом 504.
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+import httpx
+import requests
+from django.conf import settings
+
+from .metrics import record_upstream_rejected
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAMES = {'raida': 'Райда', 'configs': 'Сервис конфигов'}
+
+# коды ответов, при которых идемпотентный запрос повторяется
+RETRY_STATUSES = frozenset({502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'DELETE'})
+# повтор не начинается, если после паузы до конца бюджета запроса остается меньше, в секундах
+MIN_ATTEMPT_TIME = 0.5
+
+
+class UnavailableMixin:
+    """ Вызов внешнего сервиса отклонен без обращения к нему """
+    def __init__(self, service: str, code: str, message: str, status_code: int = 503):
+        super().__init__(message)
+        self.service = service
+        self.status_code = status_code
+        self.detail = {'code': code, 'message': message}
+
+
+class UpstreamUnavailable(UnavailableMixin, requests.RequestException):
+    pass
+
+
+class AsyncUpstreamUnavailable(UnavailableMixin, httpx.RequestError):
+    pass
+
+
+def circuit_open(service: str, error_class=UpstreamUnavailable) -> UnavailableMixin:
+    record_upstream_rejected(service, 'circuit_open')
+    return error_class(service, 'SERVICE_UNAVAILABLE',
+                       f'Внешний сервис временно недоступен ({SERVICE_NAMES.get(service, service)}), повторите запрос позже')
+
+
+def bulkhead_full(service: str, error_class=UpstreamUnavailable) -> UnavailableMixin:
+    record_upstream_rejected(service, 'bulkhead_full')
+    return error_class(service, 'SERVICE_BUSY',
+                       f'Внешний сервис перегружен ({SERVICE_NAMES.get(service, service)}), повторите запрос позже')
+
+
+def deadline_exceeded(service: str, error_class=UpstreamUnavailable) -> UnavailableMixin:
+    record_upstream_rejected(service, 'deadline')
+    return error_class(service, 'DEADLINE_EXCEEDED', 'Время обработки запроса истекло, повторите запрос позже', 504)
+
+
+current_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('request_deadline', default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """ Остаток бюджета времени текущего запроса к API в секундах (None - без ограничения) """
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_timeout(service: str, connect: float, read: float,
+                     error_class=UpstreamUnavailable) -> Optional[Tuple[float, float]]:
+    """ Таймауты подключения и чтения, ограниченные остатком бюджета (None, если бюджета нет) """
+    remaining = remaining_time()
+    if remaining is None:
+        return None
+    if remaining <= 0:
+        raise deadline_exceeded(service, error_class)
+    return min(connect, remaining), min(read, remaining)
+
+
+def idempotency_headers() -> Dict[str, str]:
+    """ Заголовок Idempotency-Key для изменяющего запроса (если Райда их поддерживает, RAIDA_IDEMPOTENCY_KEYS) """
+    return {'Idempotency-Key': uuid.uuid4().hex} if settings.RAIDA_IDEMPOTENCY_KEYS else {}
+
+
+class RetryPolicy:
+    """ Повтор идемпотентных запросов с экспоненциальной паузой со случайным разбросом (full jitter) """
+
+    def __init__(self, attempts: int, base_delay: float, max_delay: float):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def retryable(method: str, headers: Optional[dict], idempotent: Optional[bool]) -> bool:
+        if idempotent is not None:
+            return idempotent
+        return method in IDEMPOTENT_METHODS or 'Idempotency-Key' in (headers or {})
+
+    def backoff(self, attempt: int) -> Optional[float]:
+        """ Пауза перед повтором после попытки attempt (с 1) или None, если попытки или бюджет исчерпаны """
+        if attempt >= self.attempts:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        remaining = remaining_time()
+        if remaining is not None and remaining - delay < MIN_ATTEMPT_TIME:
+            return None
+        return delay
+
+
+class RequestDeadlineMiddleware:
+    """ Бюджет времени REQUEST_DEADLINE секунд на запрос к API для всех вложенных вызовов внешних сервисов """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def deadline() -> Optional[float]:
+        return time.monotonic() + settings.REQUEST_DEADLINE if settings.REQUEST_DEADLINE > 0 else None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = current_deadline.set(self.deadline())
+        try:
+            return self.get_response(request)
+        finally:
+            current_deadline.reset(token)
+
+    async def __acall__(self, request):
+        token = current_deadline.set(self.deadline())
+        try:
+            return await self.get_response(request)
+        finally:
+            current_deadline.reset(token)
+
+
+class CircuitBreaker:
+    """ Автоматический выключатель для внешнего сервиса (общий для синхронного и асинхронного клиента) """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, window: int, min_calls: int, error_rate: float, slow_rate: float,
+                 slow_call: float, open_timeout: float, half_open_calls: int):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_call = slow_call
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        # последние вызовы: (ошибка, медленный)
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """ Можно ли выполнить вызов (в полуоткрытом состоянии - не больше half_open_calls пробных) """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes = self._probe_successes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    return False
+                self._probes += 1
+            return True
+
+    def release(self):
+        """ Вызов, разрешенный allow(), отменен до результата: он не учитывается, пробный вызов освобождается """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > self._probe_successes:
+                self._probes -= 1
+
+    def record(self, failed: bool, seconds: float):
+        """ Учет результата вызова, разрешенного allow() """
+        slow = seconds >= self.slow_call
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_calls:
+                        self.state = self.CLOSED
+                        self._outcomes.clear()
+                        logger.info("Выключатель %s замкнут", self.name)
+                return
+            if self.state == self.OPEN:
+                # вызов начался до размыкания
+                return
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            errors = sum(1 for failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow)
+            if errors / calls >= self.error_rate or slow_calls / calls >= self.slow_rate:
+                self._open()
+
+    def _open(self):
+        logger.warning("Выключатель %s разомкнут на %s с", self.name, self.open_timeout)
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class Bulkhead:
+    """ Ограничение одновременных вызовов сервиса из потоков процесса """
+
+    def __init__(self, name: str, max_concurrency: int, max_wait: float):
+        self.name = name
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def __enter__(self):
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            raise bulkhead_full(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._semaphore.release()
+
+
+class AsyncBulkhead:
+    """ Ограничение одновременных вызовов сервиса из корутин (семафор на каждый цикл событий) """
+
+    def __init__(self, name: str, max_concurrency: int, max_wait: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def __aenter__(self):
+        semaphore = self.semaphore
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            raise bulkhead_full(self.name, AsyncUpstreamUnavailable) from None
+        return semaphore
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str) -> CircuitBreaker:
+    """ Выключатель сервиса name (создается при первом обращении с параметрами из настроек) """
+    with breakers_lock:
+        breaker = breakers.get(name)
+        if breaker is None:
+            breaker = breakers[name] = CircuitBreaker(
+                name,
+                window=settings.CIRCUIT_BREAKER_WINDOW,
+                min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+                error_rate=settings.CIRCUIT_BREAKER_ERROR_RATE,
+                slow_rate=settings.CIRCUIT_BREAKER_SLOW_RATE,
+                slow_call=settings.CIRCUIT_BREAKER_SLOW_CALL,
+                open_timeout=settings.CIRCUIT_BREAKER_OPEN_TIMEOUT,
+                half_open_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+            )
+        return breaker
+
+
+retry_policy = RetryPolicy(
+    attempts=settings.UPSTREAM_RETRY_ATTEMPTS,
+    base_delay=settings.UPSTREAM_RETRY_BASE_DELAY,
+    max_delay=settings.UPSTREAM_RETRY_MAX_DELAY,
+)
@@ -1,15 +1,8 @@
 from rest_framework import serializers
 from dataclasses import dataclass
-from datetime import datetime
 
-
-def datetime_convert(date, format_date='%d.%m.%Y'):
-    """ Преобразование даты в заданный формат. """
-    if date is not None:
-        result = datetime.fromisoformat(date.rstrip("Z") + "+00:00").strftime(format_date)
-    else:
-        result = date
-    return result
+from .dates import datetime_convert
+from .timing import timed_phase
 
 
 class HeadersSerializer(serializers.Serializer):
@@ -17,6 +10,10 @@ class HeadersSerializer(serializers.Serializer):
     project_id = serializers.UUIDField()
     account_id = serializers.UUIDField(allow_null=True)
 
+    @timed_phase('headers')
+    def is_valid(self, *, raise_exception=False):
+        return super().is_valid(raise_exception=raise_exception)
+
 
 class CreateTaskSerializer(serializers.Serializer):
     """ Сериализатор для создания задачи на участие в конкурсе """
@@ -57,6 +54,12 @@ class DetailSerializer(serializers.Serializer):
 class InfoSerializer(serializers.Serializer):
     api_version = serializers.CharField(required=True)
     count = serializers.IntegerField()
+    # только при постраничном запросе (limit, offset или cursor)
+    total = serializers.IntegerField(required=False)
+    limit = serializers.IntegerField(required=False)
+    offset = serializers.IntegerField(required=False)
+    next = serializers.CharField(required=False, allow_null=True)
+    prev = serializers.CharField(required=False, allow_null=True)
     # compression_algorithm = serializers.CharField()
 
 
@@ -1,159 +1,371 @@
-import time
-from datetime import datetime
-from typing import Union, Tuple, List, Dict, Optional, BinaryIO
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Union, Tuple, List, Dict, Optional, BinaryIO
 
-import requests
 from django.conf import settings
 from requests.exceptions import RequestException, HTTPError
-from .serializers import ContestsSerializer
 
-token_cache = {'access_token': None, 'last_update': 0}
+from .cache import TTLCache, SingleFlight, StaleWhileRevalidateCache
+from .http_client import raida, configs_service
+from .jsonbackend import json_body
+from .metrics import in_request_context, upstream_operation
+from .timing import phase, timed_phase
+from .projections import rql_fields, post_rql
+from .resilience import UpstreamUnavailable, idempotency_headers
+from .tokens import raida_token
+from .transform import contest_item, contest_task_item, contest_details, history_contest
+from .uploads import MultipartFile
 
 base_url = settings.BASE_URL
-username = settings.USERNAME
-password = settings.PASSWORD
 configs_url = settings.CONFIGS_SERVICE_URL
+max_workers = settings.UPSTREAM_MAX_WORKERS
 
-def get_configs(project_id: str, account_id: Optional[str], auth_token: str, configs: List[str]) -> Tuple[Dict, int]:
-    """ Получить из сервиса конфигов значения конфигов типа configs для данных project_id и account_id """
+configs_cache = TTLCache(maxsize=settings.CONFIGS_CACHE_MAXSIZE, ttl=settings.CONFIGS_CACHE_TTL)
+configs_flight = SingleFlight()
+
+
+@upstream_operation('get_configs')
+def fetch_configs(project_id: str, account_id: Optional[str], auth_token: str, configs: List[str]) -> Tuple[Dict, int]:
+    """ Запрос в сервис конфигов за значениями конфигов типа configs для данных project_id и account_id """
     configs_types = ','.join(configs)
     url = f"{configs_url}/configs/{configs_types}"
     headers = {'Project-ID': project_id, 'Account-ID': account_id, 'Authorization': auth_token}
     try:
         # делаем запрос к сервису конфигов для получения конфигов определенных типов
-        response = requests.get(url, headers=headers)
+        response = configs_service.get(url, headers=headers)
         response.raise_for_status()
-        response_data = response.json()
+        response_data = json_body(response)
         return response_data, 200
     except HTTPError as err:
         return {'code': 'HTTP_ERROR', 'message': f'Ошибка HTTP: {str(err)}'}, err.response.status_code
+    except UpstreamUnavailable as err:
+        return err.detail, err.status_code
     except RequestException as err:
         return {'code': 'REQUEST_ERROR', 'message': f'Ошибка запроса: {str(err)}'}, err.response.status_code if err.response else 500
 
 
-def get_token():
+@timed_phase('configs')
+def get_configs(project_id: str, account_id: Optional[str], auth_token: str, configs: List[str]) -> Tuple[Dict, int]:
     """
-    Получить или обновить токен доступа для аутентификации пользователя.
+    Получить значения конфигов типа configs для данных project_id и account_id.
 
-    Эта функция использует кэш для хранения токена доступа и времени его последнего обновления.
-    Если токен отсутствует или срок его действия истек (более 1 часа с последнего обновления),
-    функция выполняет запрос на получение нового токена. В противном случае возвращает
-    текущий токен из кэша.
+    Значения кэшируются по ключу (project_id, account_id, хэш токена пользователя, тип конфига): сервис конфигов
+    проверяет доступ пользователя к проекту, поэтому значения, полученные с токеном одного пользователя,
+    другому не отдаются. В сервис конфигов одним запросом запрашиваются только отсутствующие в кэше типы,
+    одновременные запросы одних и тех же конфигов с одним токеном объединяются в один.
+    Ошибки сервиса конфигов (5xx) кэшируются на короткое время.
     """
-    current_time = time.time()
+    scope = configs_scope(project_id, account_id, auth_token)
+    data, missing, error = cached_configs(scope, configs)
+    if error:
+        return error
+    if missing:
+        result = configs_flight.do((*scope, tuple(missing)),
+                                   lambda: fetch_configs(project_id, account_id, auth_token, missing))
+        if result[1] != 200:
+            store_configs_error(scope, missing, result)
+            return result
+        store_configs(scope, missing, result[0], data)
+    return {'data': data}, 200
+
+
+def configs_scope(project_id: str, account_id: Optional[str], auth_token: Optional[str]) -> Tuple[str, Optional[str], str]:
+    """ Часть ключа кэша конфигов: проект, аккаунт и хэш токена, с которым конфиги запрошены """
+    return project_id, account_id, hashlib.sha256((auth_token or '').encode()).hexdigest()
+
+
+def cached_configs(scope: Tuple, configs: List[str]) -> Tuple[Dict, List[str], Optional[Tuple[Dict, int]]]:
+    """ Значения конфигов из кэша, список отсутствующих в кэше типов и закэшированная ошибка, если она есть """
+    data = {}
+    missing = []
+    for config_type in configs:
+        cached = configs_cache.get((*scope, config_type))
+        if cached is None:
+            missing.append(config_type)
+        elif cached[1] != 200:
+            return data, missing, cached
+        else:
+            data[config_type] = cached[0]
+    return data, missing, None
 
-    if (token_cache['access_token'] is None or
-            current_time - token_cache['last_update'] > 3600):
 
-        url = f"{base_url}/api/users/token/"
-        data = {'username': username, 'password': password}
+def store_configs(scope: Tuple, configs: List[str], response_data: Dict, data: Dict):
+    """ Сохранение полученных из сервиса конфигов значений в кэш и в словарь data """
+    fetched = (response_data or {}).get('data') or {}
+    for config_type in configs:
+        if config_type in fetched:
+            configs_cache.set((*scope, config_type), (fetched[config_type], 200))
+            data[config_type] = fetched[config_type]
 
-        response = requests.post(url, data=data)
 
-        if response.status_code == 200:
-            token_cache['access_token'] = response.json().get('access_token')
-            token_cache['last_update'] = current_time
-            return token_cache['access_token']
-        else:
-            return None
+def store_configs_error(scope: Tuple, configs: List[str], result: Tuple[Dict, int]):
+    """ Кэширование ошибки сервиса конфигов на короткое время """
+    # ошибки авторизации (4xx) не кэшируем: пользователь может получить доступ к проекту
+    if result[1] >= 500:
+        for config_type in configs:
+            configs_cache.set((*scope, config_type), result, ttl=settings.CONFIGS_CACHE_ERROR_TTL)
 
-    else:
-        return token_cache['access_token']
 
+def get_token():
+    """
+    Получить токен доступа для аутентификации в Райде.
+
+    Токен хранится в менеджере токенов (contests.tokens): он общий для всех запросов и воркеров,
+    обновляется в фоне до истечения срока действия и запрашивается заново после ответа 401.
+    Возвращает None, если токен получить не удалось.
+    """
+    return raida_token.get()
 
-def task_solution_status(token: str, task_id: str, task_process_id: str, node_id: str, task_status_id: dict) -> tuple[dict, int]:
-    """ Проверяет наличие заявки на конкурс и ее статус """
+
+@upstream_operation('get_task')
+def fetch_task(token: str, task_id: str, node_id: str) -> Tuple[Dict | list, int]:
+    """ Заявка на конкурс (задача Райды) с данным task_id, всегда из Райды """
     access_token = token
     headers = {"Authorization": f'Bearer {access_token}'}
     url = f"{base_url}/api/tasks/{node_id}/{task_id}"
     try:
         # делаем запрос в Райду для получения задачи с данным task_id
-        response = requests.get(url, headers=headers)
+        response = raida.get(url, headers=headers)
         response.raise_for_status()
-        response_data = response.json().get('data', [])
-        # если задача существует и относится к заявкам на конкурсы
-        if response_data and response_data.get('process').get('id') == task_process_id:
-            status_new = task_status_id.get('new')
-            status_approved = task_status_id.get('approved')
-            status_completed = task_status_id.get('completed')
-            status = response_data.get('status').get('id')
-            # проверяем статус заявки
-            if status == status_completed:
-                task_status = {'code': 'TASK_COMPLETED', 'message': 'Решение уже отправлено'}
-            elif status in (status_new, status_approved):
-                task_status = {'code': 'TASK_UNCOMPLETED', 'message': 'Решение не отправлено'}
-            else:
-                task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Заявка не найдена'}
-        else:
-            task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Заявка не найдена'}
-        return task_status, 200
+        return json_body(response).get('data', []), 200
     except HTTPError as err:
         return {'code': 'HTTP_ERROR', 'message': f'Ошибка HTTP: {str(err)}'}, err.response.status_code
+    except UpstreamUnavailable as err:
+        return err.detail, err.status_code
     except RequestException as err:
         return {'code': 'REQUEST_ERROR', 'message': f'Ошибка запроса: {str(err)}'}, err.response.status_code if err.response else 500
 
 
+def task_solution_status(
+        token: str,
+        task_id: str,
+        task_process_id: str,
+        node_id: str,
+        task_status_id: dict
+) -> tuple[dict, int]:
+    """
+    Проверяет наличие заявки на конкурс и ее статус.
+
+    Заявка всегда запрашивается из Райды, а не из индекса участия: по результату проверки заявка изменяется
+    (отказ от участия, отправка решения), а индекс, обновленный другим воркером, может отставать.
+    """
+    return task_status_result(fetch_task(token, task_id, node_id), task_process_id, task_status_id)
+
+
+def task_status_result(task: Tuple[Dict | list, int], task_process_id: str, task_status_id: dict) -> tuple[dict, int]:
+    """ Результат проверки заявки по результату fetch_task: статус заявки или ошибка запроса в Райду """
+    if task[1] != 200:
+        return task
+    return solution_status(task[0], task_process_id, task_status_id), 200
+
+
+def solution_status(response_data: Dict | list, task_process_id: str, task_status_id: dict) -> dict:
+    """ Статус заявки на конкурс по данным задачи из Райды """
+    # если задача существует и относится к заявкам на конкурсы
+    if response_data and response_data.get('process').get('id') == task_process_id:
+        status_new = task_status_id.get('new')
+        status_approved = task_status_id.get('approved')
+        status_completed = task_status_id.get('completed')
+        status = response_data.get('status').get('id')
+        # проверяем статус заявки
+        if status == status_completed:
+            task_status = {'code': 'TASK_COMPLETED', 'message': 'Решение уже отправлено'}
+        elif status in (status_new, status_approved):
+            task_status = {'code': 'TASK_UNCOMPLETED', 'message': 'Решение не отправлено'}
+        else:
+            task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Заявка не найдена'}
+    else:
+        task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Заявка не найдена'}
+    return task_status
+
+
 def get_user_task(
         token: str,
         contest_id: str,
         user_id: str,
         task_process_id: str,
         node_id: str,
-        task_status_id: dict
+        task_status_id: dict,
+        fresh: bool = False
 ) -> tuple[dict, int]:
     """
     Проверка статуса заявки пользователя на участие в конкурсе.
-    Эта функция отправляет POST-запрос к API для получения статуса заявки пользователя на участие в указанном конкурсе.
-    Она проверяет наличие заявки и ее статус, возвращая соответствующий код и сообщение.
+    Заявки пользователя берутся из индекса участия (один RQL-запрос на все заявки пользователя, см. get_participation),
+    при fresh - прямо из Райды (проверка перед созданием заявки).
+    Функция проверяет наличие заявки и ее статус, возвращая соответствующий код и сообщение.
     """
-    access_token = token
-    headers = {"Authorization": f'Bearer {access_token}'}
-    url = f"{base_url}/api/tasks/rql/{node_id}"
     try:
-        # делаем запрос в Райду с фильтрацией заявок на конкурсы по id конкурса и id пользователя
-        response = requests.post(url, headers=headers, json={
-            "rql": f"process.id = '{task_process_id}' AND cf_konkurs_id = '{contest_id}' AND cf_userid = '{user_id}'",
-            "fields": []})
-        response.raise_for_status()
-        response_data = response.json().get('data', [])
-        if response_data:
-            # так как можем получить несколько заявок, то ищем первую, у которой статус не равен "Отказ", и возвращаем ее id и статус
-            for response in response_data:
-                status_new = task_status_id.get('new')
-                status_approved = task_status_id.get('approved')
-                status_completed = task_status_id.get('completed')
-                status = response.get('status').get('id')
-                if status == status_completed:
-                    task_status = {'code': 'TASK_COMPLETED', 'message': 'Решение отправлено'}
-                    user_task = response.get('id', None)
-                    break
-                elif status in (status_new, status_approved):
-                    task_status = {'code': 'TASK_UNCOMPLETED', 'message': 'Решение не отправлено'}
-                    user_task = response.get('id', None)
-                    break
-            else:
-                user_task = None
-                task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Нет заявки на участие'}
-        else:
-            user_task = None
-            task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Нет заявки на участие'}
-        return {
-            'user_task': user_task,
-            'task_status': task_status
-        }, 200
+        tasks = get_participation(token, node_id, task_process_id, user_id, fresh=fresh)
+        return user_task_status(contest_participation(tasks, contest_id), task_status_id), 200
     except HTTPError as err:
         return {'code': 'HTTP_ERROR', 'message': f'Ошибка HTTP: {str(err)}'}, err.response.status_code
+    except UpstreamUnavailable as err:
+        return err.detail, err.status_code
     except RequestException as err:
         return {'code': 'REQUEST_ERROR', 'message': f'Ошибка запроса: {str(err)}'}, err.response.status_code if err.response else 500
 
 
-def datetime_convert(date, format_date='%d.%m.%Y') -> Optional[str]:
-    """ Преобразование даты в заданный формат. """
-    if date is None or not date:
-        result = date
+def user_task_status(response_data: list, task_status_id: dict) -> dict:
+    """ id и статус заявки пользователя на участие в конкурсе по списку его заявок из Райды """
+    if response_data:
+        # так как можем получить несколько заявок, то ищем первую, у которой статус не равен "Отказ", и возвращаем ее id и статус
+        for response in response_data:
+            status_new = task_status_id.get('new')
+            status_approved = task_status_id.get('approved')
+            status_completed = task_status_id.get('completed')
+            status = response.get('status').get('id')
+            if status == status_completed:
+                task_status = {'code': 'TASK_COMPLETED', 'message': 'Решение отправлено'}
+                user_task = response.get('id', None)
+                break
+            elif status in (status_new, status_approved):
+                task_status = {'code': 'TASK_UNCOMPLETED', 'message': 'Решение не отправлено'}
+                user_task = response.get('id', None)
+                break
+        else:
+            user_task = None
+            task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Нет заявки на участие'}
     else:
-        result = datetime.fromisoformat(date.rstrip("Z") + "+00:00").strftime(format_date)
-    return result
+        user_task = None
+        task_status = {'code': 'TASK_DOES_NOT_EXIST', 'message': 'Нет заявки на участие'}
+    return {
+        'user_task': user_task,
+        'task_status': task_status
+    }
+
+
+participation_cache = StaleWhileRevalidateCache(
+    alias=settings.CONTESTS_CACHE_ALIAS,
+    prefix='participation',
+    ttl=settings.PARTICIPATION_CACHE_TTL,
+    stale_ttl=settings.PARTICIPATION_CACHE_STALE_TTL,
+)
+
+
+def participation_key(node_id: Optional[str], task_process_id: str, user_id: str) -> str:
+    return participation_cache.make_key(node_id, task_process_id, str(user_id))
+
+
+def participation_query(task_process_id: str, user_id: str) -> Dict:
+    """ RQL-запрос всех заявок пользователя (без отбора по статусу) """
+    return {
+        "rql": f"process.id = '{task_process_id}' AND cf_userid = '{user_id}'",
+        "fields": rql_fields('participation')
+    }
+
+
+def participation_task(task: Dict) -> Dict:
+    """ Заявка пользователя в индексе участия: только поля, нужные для проверок статуса и списков """
+    status = task.get('status') or {}
+    custom_fields = task.get('custom_fields') or {}
+    return {
+        'id': task.get('id'),
+        'process': {'id': (task.get('process') or {}).get('id')},
+        'status': {'id': status.get('id'), 'name': status.get('name')},
+        'custom_fields': {
+            'cf_konkurs_id': custom_fields.get('cf_konkurs_id'),
+            'solution_link': custom_fields.get('solution_link'),
+            'comments': custom_fields.get('comments'),
+        },
+    }
+
+
+@upstream_operation('get_participation')
+def fetch_participation(token: str, node_id: Optional[str], task_process_id: str, user_id: str) -> List[Dict]:
+    """ Загрузка всех заявок пользователя из Райды одним RQL-запросом """
+    headers = {"Authorization": f'Bearer {token}'}
+    url = f"{base_url}/api/tasks/rql/{node_id}"
+    response = post_rql(url, participation_query(task_process_id, user_id), headers)
+    response.raise_for_status()
+    return [participation_task(task) for task in json_body(response).get('data', [])]
+
+
+def get_participation(token: str, node_id: Optional[str], task_process_id: str, user_id: str,
+                      fresh: bool = False) -> List[Dict]:
+    """
+    Индекс участия: все заявки пользователя в порядке выдачи Райды.
+
+    Страница конкурса, разделы "мои задачи" и "история" строятся по индексу, а не отдельными запросами в Райду.
+    Индекс хранится в кэше CONTESTS_CACHE_ALIAS по (node_id, процесс заявок, user_id) и обновляется сразу после
+    создания и изменения заявки этим сервисом (add_participation_task, update_participation_task).
+    Ошибки Райды (RequestException) не кэшируются и пробрасываются вызывающему.
+
+    Проверки перед изменением заявок передают fresh=True: заявки загружаются из Райды в обход индекса
+    (с локальным кэшем воркера или после изменения в Райде напрямую индекс может отставать до
+    PARTICIPATION_CACHE_TTL), а загруженный список заменяет индекс.
+    """
+    key = participation_key(node_id, task_process_id, user_id)
+    if fresh:
+        tasks = fetch_participation(token, node_id, task_process_id, user_id)
+        participation_cache.set(key, tasks)
+        return tasks
+    return participation_cache.get_or_load(key, lambda: fetch_participation(token, node_id, task_process_id, user_id))
+
+
+def contest_participation(tasks: List[Dict], contest_id: str) -> List[Dict]:
+    """ Заявки пользователя на участие в конкурсе contest_id """
+    return [task for task in tasks if task['custom_fields'].get('cf_konkurs_id') == str(contest_id)]
+
+
+def find_participation_task(tasks: List[Dict], task_id: str) -> Optional[Dict]:
+    return next((task for task in tasks if task['id'] == str(task_id)), None)
+
+
+def replace_participation_task(tasks: List[Dict], task: Dict) -> List[Dict]:
+    """ Список заявок с замененной (или добавленной в конец) заявкой task """
+    if find_participation_task(tasks, task['id']) is None:
+        return [*tasks, task]
+    return [task if item['id'] == task['id'] else item for item in tasks]
+
+
+def created_participation_task(response_data: Dict, contest_id: str, task_process_id: str, task_status_new: str) -> Dict:
+    """ Созданная заявка для индекса участия (недостающие в ответе Райды поля - из данных запроса) """
+    custom_fields = response_data.get('custom_fields') or {}
+    return participation_task({
+        **response_data,
+        'process': response_data.get('process') or {'id': task_process_id},
+        'status': response_data.get('status') or {'id': task_status_new},
+        'custom_fields': {**custom_fields, 'cf_konkurs_id': custom_fields.get('cf_konkurs_id') or str(contest_id)},
+    })
+
+
+def patched_participation_task(tasks: List[Dict], task_id: str, response_data: Dict | list) -> Optional[Dict]:
+    """
+    Измененная заявка для индекса участия по ответу Райды на PATCH.
+
+    Возвращает None, если ответ не содержит статуса заявки или заявки нет в индексе: тогда индекс сбрасывается.
+    """
+    task = find_participation_task(tasks, task_id)
+    if task is None or not isinstance(response_data, dict) or not (response_data.get('status') or {}).get('id'):
+        return None
+    custom_fields = response_data.get('custom_fields') or {}
+    return participation_task({
+        **task,
+        'status': response_data['status'],
+        'custom_fields': {**task['custom_fields'], **custom_fields},
+    })
+
+
+def add_participation_task(node_id: Optional[str], task_process_id: str, user_id: str, task: Dict):
+    """ Добавить созданную заявку в индекс участия (если индекс еще не загружен, он загрузится при чтении) """
+    key = participation_key(node_id, task_process_id, user_id)
+    tasks = participation_cache.get(key)
+    if tasks is not None:
+        participation_cache.set(key, replace_participation_task(tasks, task))
+
+
+def update_participation_task(node_id: Optional[str], task_process_id: str, user_id: str, task_id: str,
+                              response_data: Dict | list):
+    """ Обновить заявку в индексе участия после ее изменения """
+    key = participation_key(node_id, task_process_id, user_id)
+    tasks = participation_cache.get(key)
+    if tasks is None:
+        return
+    task = patched_participation_task(tasks, task_id, response_data)
+    if task is None:
+        participation_cache.delete(key)
+    else:
+        participation_cache.set(key, replace_participation_task(tasks, task))
 
 
 def get_condition(parameters_ids: Union[Tuple[str, ...], List[str], str, None], construction: str) -> str:
@@ -167,34 +379,17 @@ def get_condition(parameters_ids: Union[Tuple[str, ...], List[str], str, None],
     return parameter_condition
 
 
-def get_contest(token: str, contest_id: str, node_id: Optional[str]) -> Tuple[Dict, int] | list:
-    """ Получение данных одного конкурса по его id. """
+@upstream_operation('get_contest')
+def fetch_contest(token: str, contest_id: str, node_id: Optional[str]) -> Tuple[Dict | list, int]:
+    """ Получение необработанных данных конкурса (задачи в Райде) по его id. """
     access_token = token
     headers = {"Authorization": f'Bearer {access_token}'}
     url = f"{base_url}/api/tasks/{node_id}/{contest_id}"
     try:
         # делаем запрос в Райду для получения конкурса с данным contest_id
-        response = requests.get(url, headers=headers)
+        response = raida.get(url, headers=headers)
         response.raise_for_status()
-        response_data = response.json().get('data', [])
-        if not response_data:
-            return []
-        # с помощью датакласса и сериализатора преобразуем полученные данные в нужный формат
-        contest_serializer = ContestsSerializer(data=response_data)
-        contest_serializer.is_valid()
-        contest = contest_serializer.save()
-        result_data = contest.__dict__
-        result_data = {
-            "detail": {
-                "code": "OK",
-                "message": "Данные конкурса"
-            },
-            "data": result_data,
-            "info": {
-                "api_version": "0.0.1",
-            }
-        }
-        return result_data, response.status_code
+        return json_body(response).get('data', []), response.status_code
     except HTTPError as http_err:
         result_data = {
             "detail": {
@@ -203,6 +398,8 @@ def get_contest(token: str, contest_id: str, node_id: Optional[str]) -> Tuple[Di
             }
         }
         return result_data, http_err.response.status_code
+    except UpstreamUnavailable as err:
+        return {'detail': err.detail}, err.status_code
     except RequestException as err:
         result_data = {
             "detail": {
@@ -213,8 +410,108 @@ def get_contest(token: str, contest_id: str, node_id: Optional[str]) -> Tuple[Di
         return result_data, err.response.status_code if err.response else 500
 
 
-def patch_task(token: str, task_id: str, node_id: str, task_status: str, custom_fields: dict) -> tuple[dict, int]:
-    """ Редактирование заявки на участие в конкурсе при отправке решения. """
+def is_contest(response_data: Dict | list, contest_process_id: str) -> bool:
+    """ Проверяет, что полученная из Райды задача существует и относится к конкурсам """
+    return bool(response_data) and (response_data.get('process') or {}).get('id') == contest_process_id
+
+
+@timed_phase('transform')
+def contest_data(response_data: Dict) -> Dict:
+    """
+    Преобразование данных конкурса, полученных из Райды, в данные конкурса ответа API.
+    Данные проверяются (contests.transform.contest_details), при ошибке формата - TransformError.
+    """
+    return contest_details(response_data)
+
+
+def contest_details_response(result_data: Dict) -> Dict:
+    """ Формат ответа API для данных конкурса """
+    return {
+        "detail": {
+            "code": "OK",
+            "message": "Данные конкурса"
+        },
+        "data": result_data,
+        "info": {
+            "api_version": "0.0.1",
+        }
+    }
+
+
+contest_cache = StaleWhileRevalidateCache(
+    alias=settings.CONTESTS_CACHE_ALIAS,
+    prefix='contest',
+    ttl=settings.CONTEST_CACHE_TTL,
+    stale_ttl=settings.CONTEST_CACHE_STALE_TTL,
+    stale_if_error=settings.CACHE_STALE_IF_ERROR,
+)
+
+
+def contest_cache_key(node_id: Optional[str], contest_id: str) -> str:
+    return contest_cache.make_key(node_id, str(contest_id))
+
+
+def normalized_contest(response_data: Dict | list) -> Optional[Dict]:
+    """ Конкурс для кэша: id процесса задачи (для проверки, что это конкурс) и данные в формате ответа API """
+    if not response_data:
+        return None
+    return {
+        'process_id': (response_data.get('process') or {}).get('id'),
+        'data': contest_data(response_data),
+    }
+
+
+def is_normalized_contest(contest: Optional[Dict], contest_process_id: str) -> bool:
+    """ is_contest для конкурса из get_contest_cached """
+    return contest is not None and contest['process_id'] == contest_process_id
+
+
+def get_contest_cached(
+        token: str,
+        contest_id: str,
+        node_id: Optional[str],
+        fetch: Callable[[str, str, Optional[str]], Tuple[Dict | list, int]] = fetch_contest
+) -> Tuple[Optional[Dict], int]:
+    """
+    Нормализованный конкурс (normalized_contest) по его id через общий кэш по node_id и contest_id.
+
+    Данные конкурса не зависят от пользователя, поэтому страница конкурса и проверки существования конкурса
+    при создании заявки и отправке решения используют одну запись кэша. Заявки пользователя хранятся
+    отдельно, в индексе участия (get_participation).
+    Возвращает (конкурс или None, если задачи нет, 200) или (ошибку, статус) как fetch_contest.
+    """
+    def load():
+        contest = fetch(token, contest_id, node_id)
+        if contest[1] != 200:
+            return contest
+        return normalized_contest(contest[0]), contest[1]
+
+    return contest_cache.get_or_load(
+        contest_cache_key(node_id, contest_id),
+        load,
+        cacheable=lambda result: result[1] == 200 and result[0] is not None
+    )
+
+
+def invalidate_contest(node_id: Optional[str], contest_id: str):
+    """ Удалить конкурс из кэша (после изменения конкурса) """
+    contest_cache.delete(contest_cache_key(node_id, contest_id))
+
+
+@upstream_operation('patch_task')
+def patch_task(
+        token: str,
+        task_id: str,
+        node_id: str,
+        task_status: str,
+        custom_fields: dict,
+        user_id: Optional[str] = None,
+        task_process_id: Optional[str] = None
+) -> tuple[dict, int]:
+    """
+    Редактирование заявки на участие в конкурсе при отправке решения.
+    Если переданы user_id и task_process_id, заявка обновляется и в индексе участия пользователя.
+    """
     access_token = token
     headers = {"Authorization": f'Bearer {access_token}'}
     url = f"{base_url}/api/tasks/{node_id}/{task_id}"
@@ -225,38 +522,31 @@ def patch_task(token: str, task_id: str, node_id: str, task_status: str, custom_
         data["custom_fields"] = custom_fields
     try:
         # делаем запрос в Райду для обновления данных заявки на участие в конкурсе
-        response = requests.patch(url, headers=headers, json=data)
+        response = raida.patch(url, headers=headers, json=data)
         response.raise_for_status()
-        return response.json().get('data', []), 200
+        response_data = json_body(response).get('data', [])
+        if user_id and task_process_id:
+            update_participation_task(node_id, task_process_id, user_id, task_id, response_data)
+        return response_data, 200
     except HTTPError as err:
         return {'code': 'HTTP_ERROR', 'message': f'Ошибка HTTP: {str(err)}'}, err.response.status_code
+    except UpstreamUnavailable as err:
+        return err.detail, err.status_code
     except RequestException as err:
         return {'code': 'REQUEST_ERROR', 'message': f'Ошибка запроса: {str(err)}'}, err.response.status_code if err.response else 500
 
 
 def contest_exists(token: str, contest_id: str, node_id: str, contest_process_id: str) -> bool:
     """ Проверяет, существует ли конкурс с данным contest_id """
-    access_token = token
-    headers = {"Authorization": f'Bearer {access_token}'}
-    url = f"{base_url}/api/tasks/{node_id}/{contest_id}"
-    try:
-        # делаем запрос в Райду для получения задачи с данным contest_id
-        response = requests.get(url, headers=headers)
-        response_data = response.json().get('data', [])
-        # если задача существует и относится к конкурсам
-        if response_data and response_data.get('process').get('id') == contest_process_id:
-            return True
-        return False
-    except:
-        return False
+    # получаем задачу с данным contest_id из кэша или из Райды
+    contest = get_contest_cached(token, contest_id, node_id)
+    # если задача существует и относится к конкурсам
+    return contest[1] == 200 and is_normalized_contest(contest[0], contest_process_id)
 
 
-def create_task(token: str, contest_id: str, user_id: str, node_id: str, task_process_id: str, task_status_new: str) -> tuple[dict, int]:
-    access_token = token
-    headers = {"Authorization": f'Bearer {access_token}'}
-    url = f"{base_url}/api/tasks/{node_id}/{task_process_id}"
-    # данные для создания новой заявки на участие в конкурсе
-    task = {
+def new_task(contest_id: str, user_id: str, task_status_new: str) -> Dict:
+    """ Данные для создания новой заявки на участие в конкурсе """
+    return {
         "title": "",
         "description": "",
         "author": None,
@@ -272,27 +562,44 @@ def create_task(token: str, contest_id: str, user_id: str, node_id: str, task_pr
             "cf_userid": user_id
         }
     }
+
+
+def created_task_response(response_data: Dict, contest_id: str, user_id: str) -> Dict:
+    """ Формат ответа API для созданной заявки на участие в конкурсе """
+    result_data = {
+        "task_id": response_data.get('id', None),
+        "status": "Новая",
+        "contest_id": contest_id,
+        "user_id": user_id
+    }
+    return {
+        "detail": {
+            "code": "OK",
+            "message": "Заявка на конкурс создана"
+        },
+        "data": result_data,
+        "info": {
+            "api_version": "0.0.1",
+        }
+    }
+
+
+@upstream_operation('create_task')
+def create_task(token: str, contest_id: str, user_id: str, node_id: str, task_process_id: str, task_status_new: str) -> tuple[dict, int]:
+    access_token = token
+    headers = {"Authorization": f'Bearer {access_token}', **idempotency_headers()}
+    url = f"{base_url}/api/tasks/{node_id}/{task_process_id}"
+    # данные для создания новой заявки на участие в конкурсе
+    task = new_task(contest_id, user_id, task_status_new)
     try:
         # делаем запрос в Райду для создания новой задачи (заявка на участие в конкурсе)
-        response = requests.post(url, json=task, headers=headers)
+        response = raida.post(url, json=task, headers=headers)
         response.raise_for_status()
-        response_data = response.json().get('data')
-        result_data = {
-            "task_id": response_data.get('id', None),
-            "status": "Новая",
-            "contest_id": contest_id,
-            "user_id": user_id
-        }
-        return {
-            "detail": {
-                "code": "OK",
-                "message": "Заявка на конкурс создана"
-            },
-            "data": result_data,
-            "info": {
-                "api_version": "0.0.1",
-            }
-        }, 201
+        response_data = json_body(response).get('data')
+        if response_data and response_data.get('id'):
+            add_participation_task(node_id, task_process_id, user_id,
+                                   created_participation_task(response_data, contest_id, task_process_id, task_status_new))
+        return created_task_response(response_data, contest_id, user_id), 201
     except HTTPError as http_err:
         result_data = {
             "detail": {
@@ -301,6 +608,8 @@ def create_task(token: str, contest_id: str, user_id: str, node_id: str, task_pr
             }
         }
         return result_data, http_err.response.status_code
+    except UpstreamUnavailable as err:
+        return {'detail': err.detail}, err.status_code
     except RequestException as err:
         result_data = {
             "detail": {
@@ -311,6 +620,46 @@ def create_task(token: str, contest_id: str, user_id: str, node_id: str, task_pr
         return result_data, err.response.status_code if err.response else 500
 
 
+def contests_query(
+        process_id: str,
+        status_ids: Union[Tuple[str, ...], List[str], str, None],
+        projects_ids: Union[Tuple[str, ...], List[str], str, None],
+        fields: str = 'contests'
+) -> Dict:
+    """ RQL-запрос конкурсов по процессу, статусам и проектам с проекцией полей fields (см. RQL_FIELDS) """
+    status_condition = get_condition(
+        parameters_ids=status_ids,
+        construction='AND status.id'
+    )
+
+    project_condition = get_condition(
+        parameters_ids=projects_ids,
+        construction='AND cf_projects'
+    )
+
+    return {
+        "rql": f"process.id = '{process_id}'{status_condition}{project_condition}",
+        "fields": rql_fields(fields)
+    }
+
+
+def list_response(result_data: List[Dict], message: str) -> Dict:
+    """ Формат ответа API для списков """
+    return {
+        "detail": {
+            "code": "OK",
+            "message": message
+        },
+        "data": result_data,
+        "info": {
+            "api_version": "0.0.1",
+            "count": len(result_data),
+            # "compression_algorithm": "lossy"
+        }
+    }
+
+
+@upstream_operation('get_contests')
 def get_contests(
         token: str,
         node_id: Optional[str],
@@ -326,80 +675,16 @@ def get_contests(
 
     try:
 
-        status_condition = get_condition(
-            parameters_ids=status_ids,
-            construction='AND status.id'
-        )
-
-        project_condition = get_condition(
-            parameters_ids=projects_ids,
-            construction='AND cf_projects'
-        )
-
-        completed_contests = {
-            "rql": f"process.id = '{process_id}'{status_condition}{project_condition}",
-            "fields": [
-                # "id",
-                # "title",
-                # "description",
-                # "status.id",
-                # "status.name",
-                # "custom_fields.cf_deadline",
-                # "custom_fields.cf_award",
-                # "custom_fields.cf_brief",
-                # "custom_fields.cf_konkurs_category",
-                # "custom_fields.cf_projects",
-                # "custom_fields.cf_profession",
-            ]
-        }
+        completed_contests = contests_query(process_id, status_ids, projects_ids)
 
-        response = requests.post(url, json=completed_contests, headers=headers)
+        response = post_rql(url, completed_contests, headers)
         response.raise_for_status()
 
-        response_data = response.json().get('data', [])
-        result_data = []
-        for contest in response_data:
-            status_name = contest['status'].get('name', None) if contest.get('status', None) is not None else None
-            status_id = contest['status'].get('id', None) if contest.get('status', None) is not None else None
-
-            custom_fields = contest.get('custom_fields', {})
-            cf_deadline = custom_fields.get('cf_deadline')
-            cf_award = custom_fields.get('cf_award')
-            cf_brief = custom_fields.get('cf_brief')
-            cf_profession = custom_fields.get('cf_profession')
-            cf_projects = custom_fields.get('cf_projects')
-            cf_konkurs_category = custom_fields.get('cf_konkurs_category')
-
-            result_data.append(
-                {
-                    'id': contest.get('id', None),
-                    'title': contest.get('title', None),
-                    'description': contest.get('description', None),
-                    'status_id': status_id,
-                    'status_name': status_name,
-                    'deadline': datetime_convert(cf_deadline),
-                    'award': cf_award,
-                    'brief': cf_brief,
-                    'profession': cf_profession,
-                    'projects': cf_projects,
-                    'konkurs_category': cf_konkurs_category,
-
-                }
-            )
+        response_data = json_body(response).get('data', [])
+        with phase('transform'):
+            result_data = [contest_item(contest) for contest in response_data]
 
-        result_data = {
-            "detail": {
-                "code": "OK",
-                "message": message
-            },
-            "data": result_data,
-            "info": {
-                "api_version": "0.0.1",
-                "count": len(result_data),
-                # "compression_algorithm": "lossy"
-            }
-        }
-        return result_data, response.status_code
+        return list_response(result_data, message), response.status_code
 
     except HTTPError as http_err:
         result_data = {
@@ -410,49 +695,102 @@ def get_contests(
         }
         return result_data, response.status_code
 
+    except UpstreamUnavailable as err:
+        return {'detail': err.detail}, err.status_code
     except RequestException as err:
         result_data = {
             "detail": {
-                "code": f"REQUEST_ERROR - {response.status_code}",
+                "code": "REQUEST_ERROR",
                 "message": str(err)
             }
         }
 
-        return result_data, response.status_code
+        return result_data, err.response.status_code if err.response is not None else 500
 
 
-def check_task(
-        url: str,
+catalogue_cache = StaleWhileRevalidateCache(
+    alias=settings.CONTESTS_CACHE_ALIAS,
+    prefix='contests',
+    ttl=settings.CONTESTS_CACHE_TTL,
+    stale_ttl=settings.CONTESTS_CACHE_STALE_TTL,
+    stale_if_error=settings.CACHE_STALE_IF_ERROR,
+)
+
+
+def get_contests_cached(
+        token: str,
+        node_id: Optional[str],
         process_id: str,
-        contest_id: str,
-        user_id: str,
-        status_condition: str,
-        headers: Dict
-) -> Optional[Dict]:
-    """Функция для проверки есть ли у данного конкурса задача с текущим пользователем или нет."""
-    tasks = {
-        "rql": f"process.id = '{process_id}' AND cf_konkurs_id = '{contest_id}' "
-               f"AND cf_userid = '{user_id}' {status_condition}"
+        status_ids: Union[Tuple[str, ...], List[str], str, None],
+        projects_ids: Union[Tuple[str, ...], List[str], str, None],
+        message: str = "Список всех конкурсов/задач по заданному статусу или статусам"
+) -> Tuple[Dict, int]:
+    """
+    Получение всех конкурсов по переданным параметрам через общий кэш ответов.
+
+    Список конкурсов не зависит от пользователя, поэтому кэшируется по node_id, процессу, статусам и проектам.
+    Просроченная запись отдается сразу, а обновляется в фоне.
+    Сообщение в ключ не входит и подставляется в ответ уже после чтения из кэша.
+    """
+    key = catalogue_cache.make_key(node_id, process_id, status_ids, projects_ids)
+    result = catalogue_cache.get_or_load(
+        key,
+        lambda: get_contests(token, node_id, process_id, status_ids, projects_ids),
+        cacheable=lambda result: result[1] == 200
+    )
+    return with_message(result, message)
+
+
+def with_message(result: Tuple[Dict, int], message: str) -> Tuple[Dict, int]:
+    """ Подстановка сообщения вызывающей стороны в успешный ответ со списком из кэша """
+    data, status = result
+    if status != 200:
+        return result
+    return {**data, 'detail': {**data['detail'], 'message': message}}, status
+
+
+def task_summary(task: Dict) -> Dict:
+    """Преобразование задачи (заявки на участие) из Райды в формат статуса заявки пользователя."""
+    status = task.get('status').get('name', None)
+    application_id = task.get('id', None)
+    solution_link = task.get('custom_fields').get('solution_link')
+    if status == 'Задание выполнено':
+        application_status = {'code': 'TASK_COMPLETED', 'message': 'Решение отправлено'}
+    else:
+        application_status = {'code': 'TASK_UNCOMPLETED', 'message': 'Решение не отправлено'}
+    return {
+        'application_id': application_id,
+        'application_status': application_status,
+        'solution_link': solution_link
     }
-    response = requests.post(url, json=tasks, headers=headers)
-    result = response.json().get('data', [])
-    if result:
-        status = result[0].get('status').get('name', None)
-        application_id = result[0].get('id', None)
-        solution_link = result[0].get('custom_fields').get('solution_link')
-        if status == 'Задание выполнено':
-            application_status = {'code': 'TASK_COMPLETED', 'message': 'Решение отправлено'}
-        else:
-            application_status = {'code': 'TASK_UNCOMPLETED', 'message': 'Решение не отправлено'}
-        return {
-            'application_id': application_id,
-            'application_status': application_status,
-            'solution_link': solution_link
-        }
 
-    return None
 
+def index_user_tasks(response_data: list) -> Dict[str, Dict]:
+    """ Словарь {id конкурса: статус заявки} по списку заявок пользователя из Райды """
+    index = {}
+    for task in response_data:
+        contest_id = (task.get('custom_fields') or {}).get('cf_konkurs_id')
+        # для каждого конкурса берем первую найденную заявку
+        if contest_id and contest_id not in index:
+            index[contest_id] = task_summary(task)
+    return index
+
+
+# статус заявки с отправленным решением (история участия)
+HISTORY_TASK_STATUS_NAME = 'Задание выполнено'
+
+
+def active_user_tasks(tasks: List[Dict], task_status_id_rejection: str) -> Dict[str, Dict]:
+    """ Словарь {id конкурса: статус заявки} по заявкам пользователя без отклоненных """
+    return index_user_tasks([task for task in tasks if task['status'].get('id') != task_status_id_rejection])
 
+
+def completed_user_tasks(tasks: List[Dict]) -> Dict[str, Dict]:
+    """ Словарь {id конкурса: статус заявки} по заявкам пользователя с отправленным решением """
+    return index_user_tasks([task for task in tasks if task['status'].get('name') == HISTORY_TASK_STATUS_NAME])
+
+
+@upstream_operation('get_attachments')
 def get_attachments(token: str, task_id: str, node_id: str) -> dict | None:
     """ Функция для получения загруженных данных к задаче. """
     access_token = token
@@ -460,37 +798,54 @@ def get_attachments(token: str, task_id: str, node_id: str) -> dict | None:
     url = f"{base_url}/api/attachments/{node_id}/{task_id}"
     try:
         # делаем запрос в Райду для получения приложенного решения на конкурс
-        response = requests.get(url, headers=headers)
-        response_data = response.json().get('data', [])
-        if response_data:
-            return {
-                "id": response_data[0].get('id'),
-                "name": response_data[0].get('name'),
-                "url": response_data[0].get('url'),
-                "content_type": response_data[0].get('content_type'),
-            }
-        return None
+        response = raida.get(url, headers=headers)
+        response_data = json_body(response).get('data', [])
+        return attachment_item(response_data)
     except:
         return None
 
 
+def attachment_item(response_data: list) -> dict | None:
+    """ Данные первого приложенного к задаче файла """
+    if response_data:
+        return {
+            "id": response_data[0].get('id'),
+            "name": response_data[0].get('name'),
+            "url": response_data[0].get('url'),
+            "content_type": response_data[0].get('content_type'),
+        }
+    return None
+
+
+@upstream_operation('post_attachments')
 def post_attachments(token: str, task_id: str, user_id: str, node_id: str, file: BinaryIO) -> tuple[dict, int]:
-    """ Функция для отправки решения на конкурс. """
+    """
+    Функция для отправки решения на конкурс.
+    Файл передается в Райду потоком, частями по UPLOAD_CHUNK_SIZE (см. contests.uploads.MultipartFile).
+    """
     access_token = token
-    headers = {"Authorization": f'Bearer {access_token}'}
-    files = {'attachment': file}
+    body = MultipartFile('attachment', file)
+    headers = {"Authorization": f'Bearer {access_token}', **body.headers, **idempotency_headers()}
     url = f"{base_url}/api/attachments/{node_id}/{task_id}?type=task"
     try:
         # делаем запрос в Райду и передаем полученный файл, прикрепляя его к заявке на конкурс
-        response = requests.post(url, headers=headers, files=files)
+        response = raida.post(url, headers=headers, data=body)
         response.raise_for_status()
-        return response.json().get('data'), 200
+        return json_body(response).get('data'), 200
     except HTTPError as err:
         return {'code': 'HTTP_ERROR', 'message': f'Ошибка HTTP: {str(err)}'}, err.response.status_code
+    except UpstreamUnavailable as err:
+        return err.detail, err.status_code
     except RequestException as err:
         return {'code': 'REQUEST_ERROR', 'message': f'Ошибка запроса: {str(err)}'}, err.response.status_code if err.response else 500
 
 
+def user_task_item(item: Dict, task: Dict) -> Dict:
+    """ Элемент каталога конкурсов и заявка пользователя в элемент списка заданий пользователя """
+    return {**item, 'application_status': task.get('application_status')}
+
+
+@upstream_operation('get_tasks')
 def get_tasks(
         token: str,
         node_id: str,
@@ -502,122 +857,60 @@ def get_tasks(
         user_id: str,
         message: str = "Список всех конкурсов/задач по заданному статусу или статусам"
 ) -> Tuple[Dict, int]:
-    """Получение всех конкурсов по переданным параметрам для раздела мои задачи."""
-    access_token = token
-    headers = {"Authorization": f'Bearer {access_token}'}
-    url = f"{base_url}/api/tasks/rql/{node_id}"
+    """
+    Получение всех конкурсов по переданным параметрам для раздела мои задачи.
 
-    try:
+    Конкурсы берутся из общего кэша каталога, заявки пользователя - из индекса участия, поэтому следующие
+    страницы списка не повторяют RQL-запрос к Райде.
+    """
+    contests = get_contests_cached(token, node_id, process_id, status_ids, projects_ids)
+    if contests[1] != 200:
+        return contests
 
-        status_condition = get_condition(
-            parameters_ids=status_ids,
-            construction='AND status.id'
-        )
-
-        project_condition = get_condition(
-            parameters_ids=projects_ids,
-            construction='AND cf_projects'
-        )
-
-        completed_contests = {
-            "rql": f"process.id = '{process_id}'{status_condition}{project_condition}",
-            "fields": [
-                # "id",
-                # "title",
-                # "description",
-                # "status.id",
-                # "status.name",
-                # "custom_fields.cf_deadline",
-                # "custom_fields.cf_award",
-                # "custom_fields.cf_brief",
-                # "custom_fields.cf_konkurs_category",
-                # "custom_fields.cf_projects",
-                # "custom_fields.cf_profession",
-            ]
-        }
+    try:
 
-        response = requests.post(url, json=completed_contests, headers=headers)
-        response.raise_for_status()  # Это вызовет исключение для статусов 4xx и 5xx
+        # заявки пользователя берем из индекса участия вместо запроса на каждый конкурс
+        user_tasks = active_user_tasks(get_participation(token, node_id, process_task_id, user_id), task_status_id_rejection)
 
-        response_data = response.json().get('data', [])
-        result_data = []
-        for contest in response_data:
-
-            task = check_task(
-                url=url,
-                process_id=process_task_id,
-                contest_id=contest.get('id'),
-                user_id=user_id,
-                status_condition=f"AND status.id != '{task_status_id_rejection}'",
-                headers=headers
-            )
-
-            if task:
-                status_name = contest['status'].get('name', None) if contest.get('status', None) is not None else None
-                status_id = contest['status'].get('id', None) if contest.get('status', None) is not None else None
-
-                custom_fields = contest.get('custom_fields', {})
-                cf_deadline = custom_fields.get('cf_deadline')
-                cf_award = custom_fields.get('cf_award')
-                cf_brief = custom_fields.get('cf_brief')
-                cf_profession = custom_fields.get('cf_profession')
-                cf_projects = custom_fields.get('cf_projects')
-                cf_konkurs_category = custom_fields.get('cf_konkurs_category')
-
-                result_data.append(
-                    {
-                        'id': contest.get('id', None),
-                        'title': contest.get('title', None),
-                        'description': contest.get('description', None),  # под вопросом
-                        'status_id': status_id,  # под вопросом
-                        'status_name': status_name,
-                        'deadline': datetime_convert(cf_deadline),  # под вопросом
-                        'award': cf_award,
-                        'brief': cf_brief,
-                        'profession': cf_profession,
-                        'projects': cf_projects,
-                        'konkurs_category': cf_konkurs_category,
-                        'application_status': task.get('application_status'),
-
-                    }
-                )
-            else:
-                continue
+        with phase('transform'):
+            result_data = [
+                user_task_item(item, user_tasks[item['id']])
+                for item in contests[0]['data'] if item['id'] in user_tasks
+            ]
 
-        result_data = {
-            "detail": {
-                "code": "OK",
-                "message": message
-            },
-            "data": result_data,
-            "info": {
-                "api_version": "0.0.1",
-                "count": len(result_data),
-                # "compression_algorithm": "lossy"
-            }
-        }
-        return result_data, response.status_code
+        return list_response(result_data, message), 200
 
     except HTTPError as http_err:
         result_data = {
             "detail": {
-                "code": f"HTTP_ERROR - {response.status_code}",
+                "code": f"HTTP_ERROR - {http_err.response.status_code}",
                 "message": str(http_err)
             }
         }
-        return result_data, response.status_code
+        return result_data, http_err.response.status_code
 
+    except UpstreamUnavailable as err:
+        return {'detail': err.detail}, err.status_code
     except RequestException as err:
         result_data = {
             "detail": {
-                "code": f"REQUEST_ERROR - {response.status_code}",
+                "code": "REQUEST_ERROR",
                 "message": str(err)
             }
         }
 
-        return result_data, response.status_code
+        return result_data, err.response.status_code if err.response is not None else 500
+
 
+def history_item(contest: Dict, task: Dict, attachments: Optional[Dict]) -> Dict:
+    """ Преобразование конкурса из Райды, заявки пользователя и решения в элемент истории участия """
+    item = history_contest(contest)
+    item['solution_link'] = task.get('solution_link')
+    item['attachments'] = attachments
+    return item
 
+
+@upstream_operation('get_history')
 def get_history(
         token: str,
         node_id: Optional[str],
@@ -635,103 +928,79 @@ def get_history(
 
     try:
 
-        status_condition = get_condition(
-            parameters_ids=status_ids,
-            construction='AND status.id'
-        )
-
-        project_condition = get_condition(
-            parameters_ids=projects_ids,
-            construction='AND cf_projects'
-        )
-
-        completed_contests = {
-            "rql": f"process.id = '{process_id}'{status_condition}{project_condition}",
-            "fields": [
-                # "id",
-                # "title",
-                # "custom_fields.cf_deadline",
-            ]
-        }
+        completed_contests = contests_query(process_id, status_ids, projects_ids, fields='history')
 
-        response = requests.post(url, json=completed_contests, headers=headers)
+        response = post_rql(url, completed_contests, headers)
         response.raise_for_status()  # Это вызовет исключение для статусов 4xx и 5xx
 
-        response_data = response.json().get('data', [])
-        result_data = []
-
-        for contest in response_data:
-
-            task = check_task(
-                url=url,
-                process_id=task_process_id,
-                contest_id=contest.get('id'),
-                user_id=user_id,
-                status_condition=f"AND status.name = 'Задание выполнено'",
-                headers=headers
-            )
-
-            if task:
-
-                custom_fields = contest.get('custom_fields', {})
-                cf_deadline = custom_fields.get('cf_deadline')
-                application_id = task.get('application_id')
-                attachments = get_attachments(token, application_id, node_id)
-
-                result_data.append(
-                    {
-                        'id': contest.get('id', None),
-                        'title': contest.get('title', None),
-                        'created_at': datetime_convert(contest.get('created_at', None), format_date='%d %B %Y'),
-                        'deadline': datetime_convert(cf_deadline, format_date='%d %B %Y'),
-                        'solution_link': task.get('solution_link'),
-                        'attachments': attachments,
-                    }
-                )
-            else:
-                continue
+        response_data = json_body(response).get('data', [])
 
-        result_data = {
-            "detail": {
-                "code": "OK",
-                "message": message
-            },
-            "data": result_data,
-            "info": {
-                "api_version": "0.0.1",
-                "count": len(result_data),
-                # "compression_algorithm": "lossy"
-            }
-        }
-        return result_data, response.status_code
+        # завершенные заявки пользователя берем из индекса участия вместо запроса на каждый конкурс
+        user_tasks = completed_user_tasks(get_participation(token, node_id, task_process_id, user_id))
+        contests = [(contest, user_tasks[contest.get('id')]) for contest in response_data if contest.get('id') in user_tasks]
+
+        # загружаем приложенные решения параллельно, соединяем с конкурсами в памяти
+        application_ids = [task.get('application_id') for contest, task in contests]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(application_ids), max_workers))) as executor:
+            attachments = list(executor.map(in_request_context(lambda task_id: get_attachments(token, task_id, node_id)),
+                                            application_ids))
+
+        with phase('transform'):
+            result_data = [
+                history_item(contest, task, task_attachments)
+                for (contest, task), task_attachments in zip(contests, attachments)
+            ]
+
+        return list_response(result_data, message), response.status_code
 
     except HTTPError as http_err:
         result_data = {
             "detail": {
-                "code": f"HTTP_ERROR - {response.status_code}",
+                "code": f"HTTP_ERROR - {http_err.response.status_code}",
                 "message": str(http_err)
             }
         }
-        return result_data, response.status_code
+        return result_data, http_err.response.status_code
 
+    except UpstreamUnavailable as err:
+        return {'detail': err.detail}, err.status_code
     except RequestException as err:
         result_data = {
             "detail": {
-                "code": f"REQUEST_ERROR - {response.status_code}",
+                "code": "REQUEST_ERROR",
                 "message": str(err)
             }
         }
 
-        return result_data, response.status_code
+        return result_data, err.response.status_code if err.response is not None else 500
+
+
+def contest_tasks_query(
+        process_id: str,
+        contest_id: str,
+        task_status: Union[Tuple[str, ...], List[str], str, None]
+) -> Dict:
+    """ RQL-запрос задач конкурса по статусам """
+    status_condition = get_condition(
+        parameters_ids=task_status,
+        construction='AND status.id'
+    )
+
+    return {
+        "rql": f"process.id = '{process_id}' AND cf_konkurs_id = '{contest_id}'{status_condition}",
+        "fields": rql_fields('contest_tasks')
+    }
 
 
+@upstream_operation('get_contest_tasks')
 def get_contest_tasks(
         token: str,
         node_id: Optional[str],
         process_id: str,
         contest_id: str,
         task_status: Union[Tuple[str, ...], List[str], str, None] = None,
-        message: str = "Список всех задач по заданному конкурсу и статусу или статусам"
+        message: str = "Список всех задач по заданному конкурсу и статусу или статусам",
+        lazy: bool = False
 ) -> Tuple[Dict, int]:
     """Получение всех задач по переданному/ым конкурса, статусу/ам."""
     access_token = token
@@ -740,72 +1009,23 @@ def get_contest_tasks(
 
     try:
 
-        status_condition = get_condition(
-            parameters_ids=task_status,
-            construction='AND status.id'
-        )
-
-        tasks = {
-            "rql": f"process.id = '{process_id}' AND cf_konkurs_id = '{contest_id}'{status_condition}",
-            "fields": [
-                # "id",
-                # "title",
-                # "description",
-                # "status.id",
-                # "status.name",
-                # "custom_fields.cf_deadline",
-                # "custom_fields.cf_award",
-                # "custom_fields.cf_brief",
-                # "custom_fields.cf_projects",
-                # "custom_fields.cf_konkurs_category",
-            ]
-        }
+        tasks = contest_tasks_query(process_id, contest_id, task_status)
 
-        response = requests.post(url, json=tasks, headers=headers)
+        response = post_rql(url, tasks, headers)
         response.raise_for_status()
 
-        response_data = response.json().get('data', [])
-        result_data = []
-        for task_contest in response_data:
-            status_name = task_contest['status'].get('name', None) if task_contest.get('status',
-                                                                                       None) is not None else None
-            status_id = task_contest['status'].get('id', None) if task_contest.get('status', None) is not None else None
-
-            custom_fields = task_contest.get('custom_fields', {})
-            cf_deadline = custom_fields.get('cf_deadline')
-            cf_award = custom_fields.get('cf_award')
-            cf_brief = custom_fields.get('cf_brief')
-            cf_projects = custom_fields.get('cf_projects')
-            cf_konkurs_category = custom_fields.get('cf_konkurs_category')
-
-            result_data.append(
-                {
-                    'id': task_contest.get('id', None),
-                    'title': task_contest.get('title', None),
-                    'description': task_contest.get('description', None),
-                    'status_id': status_id,
-                    'status_name': status_name,
-                    'deadline': datetime_convert(cf_deadline),
-                    'award': cf_award,
-                    'brief': cf_brief,
-                    'projects': cf_projects,
-                    'konkurs_category': cf_konkurs_category,
-                }
-            )
+        response_data = json_body(response).get('data', [])
 
-        result_data = {
-            "detail": {
-                "code": "OK",
-                "message": message
-            },
-            "data": result_data,
-            "info": {
-                "api_version": "0.0.1",
-                "count": len(result_data),
-                # "compression_algorithm": "lossy"
-            }
-        }
-        return result_data, response.status_code
+        if lazy:
+            # элементы преобразуются при потоковой отдаче (contests.streaming), count считается там же
+            result = list_response([], message)
+            result['data'] = map(contest_task_item, response_data)
+            return result, response.status_code
+
+        with phase('transform'):
+            result_data = [contest_task_item(task_contest) for task_contest in response_data]
+
+        return list_response(result_data, message), response.status_code
 
     except HTTPError as http_err:
         result_data = {
@@ -816,12 +1036,44 @@ def get_contest_tasks(
         }
         return result_data, response.status_code
 
+    except UpstreamUnavailable as err:
+        return {'detail': err.detail}, err.status_code
     except RequestException as err:
         result_data = {
             "detail": {
-                "code": f"REQUEST_ERROR - {response.status_code}",
+                "code": "REQUEST_ERROR",
                 "message": str(err)
             }
         }
 
-        return result_data, response.status_code
+        return result_data, err.response.status_code if err.response is not None else 500
+
+
+contest_tasks_cache = StaleWhileRevalidateCache(
+    alias=settings.CONTESTS_CACHE_ALIAS,
+    prefix='contest_tasks',
+    ttl=settings.CONTEST_TASKS_CACHE_TTL,
+    stale_ttl=0,
+)
+
+
+def get_contest_tasks_cached(
+        token: str,
+        node_id: Optional[str],
+        process_id: str,
+        contest_id: str,
+        task_status: Union[Tuple[str, ...], List[str], str, None] = None,
+        message: str = "Список всех задач по заданному конкурсу и статусу или статусам"
+) -> Tuple[Dict, int]:
+    """
+    Получение всех задач конкурса через короткий кэш ответов.
+
+    Список задач не зависит от пользователя, поэтому кэшируется по конкурсу и статусам на
+    CONTEST_TASKS_CACHE_TTL секунд: страницы одного списка берутся из одной записи.
+    """
+    key = contest_tasks_cache.make_key(node_id, process_id, str(contest_id), task_status)
+    return contest_tasks_cache.get_or_load(
+        key,
+        lambda: get_contest_tasks(token, node_id, process_id, contest_id, task_status, message),
+        cacheable=lambda result: result[1] == 200
+    )
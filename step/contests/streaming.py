@@ -0,0 +1,85 @@
+"""
+Потоковая отдача списка задач конкурса (StreamingHttpResponse) для больших ответов.
+
+Включается параметром ?stream=1 (тот же JSON, что и без него, но info идет после data)
+или ?stream=ndjson / заголовком Accept: application/x-ndjson (по одному элементу списка на строку).
+Без пагинации задачи конкурса запрашиваются мимо кэша и преобразуются лениво (get_contest_tasks(lazy=True)),
+элементы сериализуются и отдаются пачками по мере обхода, поэтому первые байты ответа уходят клиенту
+до того, как обработана последняя задача, а весь ответ целиком в памяти не собирается.
+
+Поддерживается только в ContestTasksView (BaseContestView.STREAMING). Архив, активные конкурсы и задачи
+пользователя берутся из кэшей и модели чтения готовыми списками, потоковая отдача не сократила бы для них
+ни время до первого байта, ни память, поэтому параметр stream там не принимается и не описан в схеме.
+"""
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .jsonbackend import dumps
+from .renderers import JSONRenderer, escape_separators
+
+STREAM_JSON = 'json'
+STREAM_NDJSON = 'ndjson'
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+class NDJSONRenderer(JSONRenderer):
+    """
+    Рендерер для согласования формата по заголовку Accept: application/x-ndjson.
+
+    Списки в этом формате отдает streaming_response, а через рендерер проходят только ответы
+    с ошибками, которые отдаются обычным JSON.
+    """
+    media_type = NDJSON_CONTENT_TYPE
+    format = STREAM_NDJSON
+
+
+def stream_format(request) -> Optional[str]:
+    """ Формат потоковой отдачи, запрошенный клиентом, или None для обычного ответа """
+    stream = request.query_params.get('stream')
+    if stream == STREAM_NDJSON or NDJSON_CONTENT_TYPE in request.META.get('HTTP_ACCEPT', ''):
+        return STREAM_NDJSON
+    if stream in ('1', 'true', STREAM_JSON):
+        return STREAM_JSON
+    return None
+
+
+def iter_chunks(response_data: Dict, stream: str) -> Iterator[bytes]:
+    """ Ответ списка по частям: элементы response_data['data'] (список или генератор) обходятся один раз """
+    chunk_size = settings.STREAM_CHUNK_ITEMS
+    buffer = []
+    count = 0
+    if stream == STREAM_JSON:
+        buffer.append(b'{"detail":' + dumps(response_data["detail"]) + b',"data":[')
+    for item in response_data['data']:
+        if stream == STREAM_JSON:
+            buffer.append(dumps(item) if count == 0 else b',' + dumps(item))
+        else:
+            buffer.append(dumps(item) + b'\n')
+        count += 1
+        if len(buffer) >= chunk_size:
+            yield escape_separators(b''.join(buffer))
+            buffer = []
+    if stream == STREAM_JSON:
+        # количество элементов известно только после обхода списка
+        buffer.append(b'],"info":' + dumps({**response_data["info"], "count": count}) + b'}')
+    if buffer:
+        yield escape_separators(b''.join(buffer))
+
+
+async def aiter_chunks(response_data: Dict, stream: str) -> AsyncIterator[bytes]:
+    """ Асинхронный вариант iter_chunks для ASGI (Django отдает асинхронный итератор без потока) """
+    for chunk in iter_chunks(response_data, stream):
+        yield chunk
+
+
+def streaming_response(result: Tuple[Dict, int], stream: str, asynchronous: bool = False) -> Optional[StreamingHttpResponse]:
+    """ Потоковый ответ для успешного результата сервисного слоя (data, status), иначе None """
+    response_data, status = result
+    if status != 200:
+        return None
+    chunks: Iterable = aiter_chunks(response_data, stream) if asynchronous else iter_chunks(response_data, stream)
+    content_type = NDJSON_CONTENT_TYPE if stream == STREAM_NDJSON else 'application/json'
+    return StreamingHttpResponse(chunks, status=status, content_type=content_type)
@@ -0,0 +1,175 @@
+"""
+Отправка решения на конкурс как последовательность шагов с замером времени каждого шага.
+
+1. check - проверка заявки: заявка запрашивается из Райды (индекс участия может отставать),
+   ее статус и кастомные поля запоминаются для компенсации;
+2. upload - загрузка файла решения; при ошибке заявка не изменяется, решение можно отправить повторно;
+3. patch - изменение статуса заявки с кастомными полями;
+4. compensate - если результат patch неизвестен (ответ 5xx или нет ответа), заявке возвращаются статус
+   и значения измененных кастомных полей из шага check, чтобы решение можно было отправить повторно.
+
+Загрузка и изменение заявки выполняются друг за другом, а не одновременно: при одновременном выполнении
+ошибку загрузки пришлось бы компенсировать откатом уже измененной заявки, а ошибку изменения заявки -
+удалением файла, для которого в API Райды нет подтвержденного способа. Так ошибка загрузки не требует
+компенсации вовсе. Файл, загруженный к неизмененной заявке, записывается в OrphanedAttachment
+для удаления из Райды вручную.
+
+Время шагов пишется в лог (logger contests.submission) и доступно в SubmissionWorkflow.timings.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+
+from . import async_services, services
+from .models import OrphanedAttachment
+
+logger = logging.getLogger(__name__)
+
+SOLUTION_SENT = {'code': 'OK', 'message': 'Решение успешно отправлено'}
+
+
+def attachment_id(response_data) -> Optional[str]:
+    """ id загруженного файла по ответу Райды: объект или список, как в ответе GET того же пути """
+    if isinstance(response_data, list):
+        response_data = response_data[0] if response_data else None
+    return response_data.get('id') if isinstance(response_data, dict) else None
+
+
+class SubmissionWorkflow:
+    """ Отправка решения на конкурс: проверка заявки, загрузка файла и изменение заявки, компенсация ошибок """
+
+    def __init__(
+            self,
+            token: str,
+            node_id: str,
+            task_process_id: str,
+            task_status_id: dict,
+            user_id: str,
+            task_id: str,
+            file: BinaryIO,
+            custom_fields: dict
+    ):
+        self.token = token
+        self.node_id = node_id
+        self.task_process_id = task_process_id
+        self.task_status_id = task_status_id
+        self.user_id = user_id
+        self.task_id = task_id
+        self.file = file
+        self.custom_fields = custom_fields
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def step(self, name: str):
+        """ Замер времени шага name, в миллисекундах """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+
+    def check_result(self, task: Tuple[Dict | list, int]) -> Optional[Tuple[Dict, int]]:
+        """ Ответ с ошибкой, если решение по заявке отправить нельзя, иначе None """
+        task_status = services.task_status_result(task, self.task_process_id, self.task_status_id)
+        if task_status[1] > 200:
+            return {'detail': task_status[0]}, task_status[1]
+        if task_status[0].get('code') != 'TASK_UNCOMPLETED':
+            return {'detail': task_status[0]}, 400
+        return None
+
+    def previous_state(self, task: Dict) -> Tuple[str, dict]:
+        """ Статус заявки и значения изменяемых кастомных полей до отправки решения (для компенсации) """
+        previous = task.get('custom_fields') or {}
+        # пустая строка - незаполненное кастомное поле, как при создании заявки (services.new_task)
+        return task['status']['id'], {name: previous.get(name) or '' for name in self.custom_fields}
+
+    def log(self, result: Tuple[Dict, int]):
+        timings = ', '.join(f'{name}={duration:.1f}ms' for name, duration in self.timings.items())
+        logger.info("Отправка решения по заявке %s: статус %s, %s", self.task_id, result[1], timings)
+
+    def run(self) -> Tuple[Dict, int]:
+        """ Выполнение отправки решения, возвращает (тело ответа API, статус) """
+        with self.step('check'):
+            task = services.fetch_task(self.token, self.task_id, self.node_id)
+        error = self.check_result(task)
+        if error:
+            self.log(error)
+            return error
+        previous_status, previous_fields = self.previous_state(task[0])
+
+        with self.step('upload'):
+            upload = services.post_attachments(self.token, self.task_id, self.user_id, self.node_id, self.file)
+        if upload[1] > 200:
+            return self.finish(upload)
+        with self.step('patch'):
+            patch = services.patch_task(self.token, self.task_id, self.node_id, self.task_status_id.get('completed'),
+                                        self.custom_fields, self.user_id, self.task_process_id)
+        if patch[1] > 200:
+            if self.outcome_unknown(patch):
+                with self.step('compensate'):
+                    self.report_compensation(services.patch_task(
+                        self.token, self.task_id, self.node_id, previous_status, previous_fields,
+                        self.user_id, self.task_process_id))
+            self.report_orphan(upload, patch)
+        return self.finish(patch)
+
+    def finish(self, result: Tuple[Dict, int]) -> Tuple[Dict, int]:
+        """ Ответ API по результату последнего шага """
+        response = ({'detail': result[0]}, result[1]) if result[1] > 200 else ({'detail': SOLUTION_SENT}, 200)
+        self.log(response)
+        return response
+
+    @staticmethod
+    def outcome_unknown(patch: Tuple[Dict, int]) -> bool:
+        """ Изменение заявки могло быть применено Райдой: ответ 5xx или ответа нет """
+        return patch[1] >= 500
+
+    def report_orphan(self, upload: Tuple[Dict, int], patch: Tuple[Dict, int]):
+        """ Запись файла, загруженного к неизмененной заявке, для удаления из Райды """
+        file_id = attachment_id(upload[0])
+        logger.error("Отправка решения по заявке %s: файл %s загружен, но заявка не изменена", self.task_id, file_id)
+        try:
+            OrphanedAttachment.objects.create(node_id=self.node_id, task_id=self.task_id, attachment_id=file_id,
+                                              status_code=patch[1])
+        except DatabaseError as err:
+            logger.error("Отправка решения по заявке %s: не удалось записать файл %s: %s", self.task_id, file_id, err)
+
+    def report_compensation(self, result: Tuple[Dict, int]):
+        if result[1] > 200:
+            logger.error("Отправка решения по заявке %s: не удалось вернуть прежний статус заявки: %s",
+                         self.task_id, result[0])
+
+
+class AsyncSubmissionWorkflow(SubmissionWorkflow):
+    """ SubmissionWorkflow для асинхронных представлений: шаги выполняются через contests.async_services """
+
+    async def run(self) -> Tuple[Dict, int]:
+        with self.step('check'):
+            task = await async_services.fetch_task(self.token, self.task_id, self.node_id)
+        error = self.check_result(task)
+        if error:
+            self.log(error)
+            return error
+        previous_status, previous_fields = self.previous_state(task[0])
+
+        with self.step('upload'):
+            upload = await async_services.post_attachments(self.token, self.task_id, self.user_id, self.node_id,
+                                                           self.file)
+        if upload[1] > 200:
+            return self.finish(upload)
+        with self.step('patch'):
+            patch = await async_services.patch_task(self.token, self.task_id, self.node_id,
+                                                    self.task_status_id.get('completed'), self.custom_fields,
+                                                    self.user_id, self.task_process_id)
+        if patch[1] > 200:
+            if self.outcome_unknown(patch):
+                with self.step('compensate'):
+                    self.report_compensation(await async_services.patch_task(
+                        self.token, self.task_id, self.node_id, previous_status, previous_fields,
+                        self.user_id, self.task_process_id))
+            await sync_to_async(self.report_orphan)(upload, patch)
+        return self.finish(patch)
@@ -0,0 +1,73 @@
+"""
+Общие фикстуры тестов, которые работают с фейковыми Райдой и сервисом конфигов (benchmarks.fake_upstream).
+
+Фейковые сервисы запускаются в этом процессе до настройки Django, поэтому запросы приложения проходят через
+настоящие HTTP-клиенты (contests.http_client) с повторами, выключателями и бюджетом времени.
+Тесты асинхронных представлений - тот же запуск с ASYNC_VIEWS=1.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+STEP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if STEP_DIR not in sys.path:
+    sys.path.insert(0, STEP_DIR)
+
+from benchmarks.fake_upstream import PROJECT_ID, FakeUpstream, FakeUpstreamServer, TokenIssuer, environment  # noqa: E402
+
+issuer = TokenIssuer()
+server = FakeUpstreamServer(FakeUpstream(contests=30, tasks_per_contest=5, latency_ms=0, jitter_ms=0)).start()
+
+os.environ.update(environment(server.url, issuer))
+os.environ['DJANGO_ALLOWED_HOSTS'] = ' '.join(os.environ.get('DJANGO_ALLOWED_HOSTS', '').split() + ['testserver'])
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'step.settings')
+os.environ.setdefault('SECRET_KEY', 'tests')
+os.environ.setdefault('TIME_ZONE', 'Europe/Moscow')
+os.environ.setdefault('LANGUAGE_CODE', 'ru')
+# ошибки, которые тесты задают нарочно, не размыкают выключатели; паузы между повторами короткие
+os.environ.setdefault('CIRCUIT_BREAKER_MIN_CALLS', '1000000')
+os.environ.setdefault('UPSTREAM_RETRY_BASE_DELAY', '0.01')
+os.environ.setdefault('UPSTREAM_RETRY_MAX_DELAY', '0.02')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+# тестовая база данных в памяти с примененными миграциями вместо db.sqlite3
+database_name = connection.settings_dict['NAME']
+connection.creation.create_test_db(verbosity=0)
+
+
+def pytest_unconfigure(config):
+    connection.creation.destroy_test_db(database_name, verbosity=0)
+    server.stop()
+
+
+@pytest.fixture
+def upstream() -> FakeUpstream:
+    """ Фейковые сервисы без накопленных счетчиков и ошибок; кэши приложения очищаются """
+    from django.core.cache import caches
+    from contests.services import configs_cache
+    caches['default'].clear()
+    configs_cache.clear()
+    server.upstream.reset()
+    yield server.upstream
+    server.upstream.reset()
+
+
+@pytest.fixture
+def user_id(upstream) -> str:
+    """ Новый пользователь с заявками на первые конкурсы фейковой Райды """
+    user_id = str(uuid.uuid4())
+    upstream.participation(user_id)
+    return user_id
+
+
+@pytest.fixture
+def client(user_id):
+    from django.test import Client
+    return Client(HTTP_AUTHORIZATION=f'Bearer {issuer.token(user_id)}', HTTP_PROJECT_ID=PROJECT_ID)
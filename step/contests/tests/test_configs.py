@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_upstream import CONTEST_PROCESS_ID, CONTEST_STATUSES, NODE_ID, PROJECT_ID
+from contests import async_services, services
+
+CONFIGS = ['node_id', 'task_process_id']
+
+clients = pytest.mark.parametrize("asynchronous", [False, True], ids=['sync', 'async'])
+
+
+def get_configs(asynchronous: bool, auth_token: str):
+    """ Конфиги проекта через синхронный или асинхронный сервисный слой """
+    if asynchronous:
+        return asyncio.run(async_services.get_configs(PROJECT_ID, None, auth_token, CONFIGS))
+    return services.get_configs(PROJECT_ID, None, auth_token, CONFIGS)
+
+
+@clients
+def test_configs_cached_per_token(upstream, asynchronous):
+    """ Конфиги, полученные с токеном одного пользователя, другому из кэша не отдаются """
+    first = get_configs(asynchronous, 'Bearer first')
+    cached = get_configs(asynchronous, 'Bearer first')
+    other = get_configs(asynchronous, 'Bearer other')
+
+    assert first == cached == other
+    assert first[1] == 200
+    assert upstream.calls['configs'] == 2
+
+
+@clients
+def test_auth_error_not_shared(upstream, asynchronous):
+    """ Отказ сервиса конфигов одному пользователю не кэшируется и не отдается другому """
+    upstream.fail('configs', 403)
+
+    assert get_configs(asynchronous, 'Bearer denied')[1] == 403
+    assert get_configs(asynchronous, 'Bearer allowed')[1] == 200
+    assert get_configs(asynchronous, 'Bearer denied')[1] == 200
+    assert upstream.calls['configs'] == 3
+
+
+def get_contests(asynchronous: bool, message: str):
+    """ Список конкурсов в приеме работ через кэш каталога синхронного или асинхронного сервисного слоя """
+    args = ('token', NODE_ID, CONTEST_PROCESS_ID, (CONTEST_STATUSES['acceptance_works'],), None, message)
+    if asynchronous:
+        return asyncio.run(async_services.get_contests_cached(*args))
+    return services.get_contests_cached(*args)
+
+
+@clients
+def test_contests_cache_keeps_caller_message(upstream, asynchronous):
+    """ Вызовы с разными сообщениями делят один список из кэша, но каждый получает свое сообщение """
+    first = get_contests(asynchronous, 'Первое')
+    second = get_contests(asynchronous, 'Второе')
+
+    assert first[0]['detail']['message'] == 'Первое'
+    assert second[0]['detail']['message'] == 'Второе'
+    assert first[0]['data'] == second[0]['data']
+    assert upstream.calls['rql'] == 1
@@ -0,0 +1,59 @@
+import pytest
+from django.conf import settings
+from rest_framework.serializers import ValidationError
+
+from contests.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(40, 20)) == (40, 20)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",  # не base64/JSON
+    encode_cursor(-1, 10),  # отрицательное смещение
+    encode_cursor(0, 0),  # пустая страница
+    encode_cursor(0, 10 ** 6),  # больше PAGINATION_MAX_LIMIT
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValidationError):
+        decode_cursor(cursor)
+
+
+def test_pages_follow_cursors(client, upstream):
+    """ Страницы по курсору info.next складываются в начало полного списка, info.prev ведет назад """
+    full = client.get('/contests/active/').json()
+    first = client.get('/contests/active/?limit=2').json()
+    second = client.get(f"/contests/active/?cursor={first['info']['next']}").json()
+
+    assert [item['id'] for item in first['data'] + second['data']] == [item['id'] for item in full['data'][:4]]
+    assert first['info']['prev'] is None
+    assert decode_cursor(second['info']['prev']) == (0, 2)
+    assert second['info']['total'] == len(full['data'])
+    # все страницы взяты из кэша каталога
+    assert upstream.calls['rql'] == 1
+
+
+def test_limit_clamped_to_max(client, upstream):
+    response = client.get(f'/contests/active/?limit={settings.PAGINATION_MAX_LIMIT * 10}')
+
+    assert response.status_code == 200
+    assert response.json()['info']['limit'] == settings.PAGINATION_MAX_LIMIT
+
+
+@pytest.mark.parametrize("query", ["limit=0", "offset=-1", "cursor=not-a-cursor"])
+def test_invalid_page_parameters(client, upstream, query):
+    response = client.get(f'/contests/active/?{query}')
+
+    assert response.status_code == 400
+    assert response.json()['detail']['code'] == 'BAD_REQUEST'
+
+
+def test_stream_only_for_contest_tasks(client, upstream):
+    """ Потоковая отдача есть только у списка задач конкурса, остальные списки отдаются обычным ответом """
+    contest_id = upstream.contests[0]['id']
+    active = client.get('/contests/active/?stream=1')
+    tasks = client.get(f'/contests/{contest_id}/task/?stream=1')
+
+    assert not active.streaming and active.status_code == 200
+    assert tasks.streaming and tasks.status_code == 200
@@ -0,0 +1,87 @@
+from benchmarks.fake_upstream import CONTEST_STATUSES, TASK_STATUSES, FakeUpstream
+
+# статусы конкурсов раздела мои задания (UserTasksView)
+MY_TASKS_STATUSES = {CONTEST_STATUSES[name] for name in
+                     ('acceptance_works', 'acceptance_works_done', 'voting', 'sum_results', 'done')}
+
+
+def participated(upstream, statuses):
+    """ id конкурсов с заявками пользователя (первые participations конкурсов) в статусах statuses """
+    return [contest['id'] for contest in upstream.contests[:upstream.participations]
+            if contest['status']['id'] in statuses]
+
+
+def test_my_tasks_joins_participation_index(client, upstream):
+    """ Мои задания: конкурсы соединяются с заявками пользователя в памяти, без запроса на каждый конкурс """
+    response = client.get('/contests/user/my/tasks/')
+
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert [item['id'] for item in data] == participated(upstream, MY_TASKS_STATUSES)
+    # первая заявка пользователя без решения, остальные - с отправленным решением
+    assert data[0]['application_status']['code'] == 'TASK_UNCOMPLETED'
+    assert {item['application_status']['code'] for item in data[1:]} == {'TASK_COMPLETED'}
+    # список конкурсов и индекс участия
+    assert upstream.calls['rql'] == 2
+    assert upstream.calls['get_task'] == 0
+
+
+def test_my_tasks_excludes_rejected_task(client, upstream, user_id):
+    """ После отказа от участия конкурс пропадает из моих заданий (индекс участия обновляется сразу) """
+    contest_id = upstream.contests[0]['id']
+    assert contest_id in [item['id'] for item in client.get('/contests/user/my/tasks/').json()['data']]
+
+    response = client.delete(f'/contests/user/my/task/{FakeUpstream.user_task_id(user_id)}/')
+
+    assert response.status_code == 200
+    assert contest_id not in [item['id'] for item in client.get('/contests/user/my/tasks/').json()['data']]
+
+
+def test_history_joins_participation_and_attachments(client, upstream):
+    """ История участия: завершенные конкурсы с отправленными решениями и приложенными файлами """
+    response = client.get('/contests/user/my/history/')
+
+    assert response.status_code == 200
+    data = response.json()['data']
+    # у первой заявки решение не отправлено, она в историю не попадает
+    expected = [contest_id for contest_id in participated(upstream, {CONTEST_STATUSES['done']})
+                if contest_id != upstream.contests[0]['id']]
+    assert [item['id'] for item in data] == expected
+    assert all(item['solution_link'] and item['attachments'] for item in data)
+    # список конкурсов, индекс участия и по запросу решений на каждую заявку из истории
+    assert upstream.calls['rql'] == 2
+    assert upstream.calls['get_attachments'] == len(expected)
+
+
+def test_user_history_by_id(client, upstream, user_id):
+    """ История участия другого пользователя совпадает с его собственной """
+    other = client.get(f'/contests/user/{user_id}/history/')
+    own = client.get('/contests/user/my/history/')
+
+    assert other.status_code == own.status_code == 200
+    assert other.json()['data'] == own.json()['data']
+
+
+def test_application_checked_in_raida_not_index(client, upstream, user_id):
+    """ Заявка, созданная мимо индекса этого воркера (другим воркером или в Райде), не позволяет создать вторую """
+    contest_id = upstream.contests[upstream.participations]['id']
+    client.get('/contests/user/my/tasks/')
+    upstream.participation(user_id).append(FakeUpstream.task(user_id, contest_id, TASK_STATUSES['new']))
+
+    response = client.post('/contests/user/my/task/', {'contest_id': contest_id}, content_type='application/json')
+
+    assert response.status_code == 409
+    assert response.json()['detail']['code'] == 'ENTITY_EXISTS'
+    assert upstream.calls['create_task'] == 0
+
+
+def test_task_status_checked_in_raida_before_quit(client, upstream, user_id):
+    """ Отказ от участия проверяет текущий статус заявки в Райде, а не в индексе участия """
+    client.get('/contests/user/my/tasks/')
+    task = upstream.participation(user_id)[0]
+    task['status'] = {'id': TASK_STATUSES['rejection'], 'name': ''}
+
+    response = client.delete(f"/contests/user/my/task/{task['id']}/")
+
+    assert response.status_code == 404
+    assert upstream.calls['patch_task'] == 0
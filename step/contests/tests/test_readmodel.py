@@ -0,0 +1,48 @@
+import pytest
+from django.test import override_settings
+
+from benchmarks.fake_upstream import CONTEST_PROCESS_ID, CONTEST_STATUSES, NODE_ID
+from contests import services
+from contests.models import ContestSnapshot, SyncState
+from contests.readmodel import fetch_contest_local, read_contests, sync_process
+
+STATUSES = (CONTEST_STATUSES['acceptance_works'],)
+
+
+@pytest.fixture
+def read_model(upstream):
+    """ Включенная модель чтения без синхронизированных процессов """
+    ContestSnapshot.objects.all().delete()
+    SyncState.objects.all().delete()
+    with override_settings(CONTESTS_READ_MODEL=True):
+        yield
+    ContestSnapshot.objects.all().delete()
+    SyncState.objects.all().delete()
+
+
+def test_list_request_does_not_register_process(read_model):
+    """ Запрос к списку несинхронизированного процесса в БД не пишет """
+    assert read_contests(NODE_ID, CONTEST_PROCESS_ID, STATUSES, 'Конкурсы') is None
+    assert not SyncState.objects.exists()
+
+
+def test_read_model_keeps_raida_order(read_model, upstream):
+    """ Список из модели чтения совпадает со списком из Райды, включая порядок """
+    sync_process(NODE_ID, CONTEST_PROCESS_ID)
+
+    local = read_contests(NODE_ID, CONTEST_PROCESS_ID, STATUSES, 'Конкурсы')
+    remote = services.get_contests('token', NODE_ID, CONTEST_PROCESS_ID, STATUSES, None, 'Конкурсы')
+
+    assert local == remote
+
+
+def test_contest_from_read_model_keeps_outer_connection(read_model):
+    """ Чтение конкурса не закрывает соединение с БД, открытое до вызова """
+    from django.db import connection
+
+    sync_process(NODE_ID, CONTEST_PROCESS_ID)
+    contest = ContestSnapshot.objects.first()
+    outer = connection.connection
+
+    assert fetch_contest_local('token', contest.contest_id, NODE_ID) == (contest.raw, 200)
+    assert connection.connection is outer is not None
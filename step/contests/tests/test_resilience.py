@@ -0,0 +1,338 @@
+import asyncio
+import time
+
+import pytest
+from django.conf import settings
+
+from benchmarks.fake_upstream import NODE_ID, TASK_PROCESS_ID, TASK_STATUSES, fake_id
+from contests.http_client import async_raida, raida
+from contests.projections import apost_rql, post_rql, projection
+from contests.resilience import AsyncUpstreamUnavailable, CircuitBreaker, UpstreamUnavailable, current_deadline
+from contests.tokens import TokenManager, raida_token
+
+
+def make_breaker(**options) -> CircuitBreaker:
+    parameters = dict(window=10, min_calls=4, error_rate=0.5, slow_rate=1.0, slow_call=10, open_timeout=0.05,
+                      half_open_calls=2)
+    parameters.update(options)
+    return CircuitBreaker('test', **parameters)
+
+
+def call(breaker: CircuitBreaker, failed: bool = False, seconds: float = 0.01):
+    assert breaker.allow()
+    breaker.record(failed, seconds)
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = make_breaker()
+    for failed in (False, True, False):
+        call(breaker, failed)
+    # меньше min_calls вызовов - выключатель замкнут при любой доле ошибок
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    call(breaker, failed=True)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = make_breaker(slow_rate=0.5, slow_call=1)
+    for _ in range(4):
+        call(breaker, seconds=2)
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_closes_after_successful_probes():
+    breaker = make_breaker(min_calls=1)
+    call(breaker, failed=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    # после open_timeout пропускается не больше half_open_calls пробных вызовов
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(False, 0.01)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(False, 0.01)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_reopens_on_failed_probe():
+    breaker = make_breaker(min_calls=1)
+    call(breaker, failed=True)
+    time.sleep(0.06)
+
+    call(breaker, failed=True)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_releases_cancelled_probe():
+    breaker = make_breaker(min_calls=1, half_open_calls=1)
+    call(breaker, failed=True)
+    time.sleep(0.06)
+
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    call(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_request_not_recorded_as_failure(upstream, monkeypatch):
+    """ Отмененный запрос (клиент закрыл соединение с ASGI-сервером) не считается ошибкой Райды """
+    breaker = make_breaker(min_calls=1)
+    monkeypatch.setattr(async_raida, 'breaker', breaker)
+    monkeypatch.setattr(upstream, 'latency', 0.2)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(async_raida.get(task_url()), 0.02))
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert not breaker._outcomes
+
+
+def test_open_breaker_rejects_without_calling_service(upstream, monkeypatch):
+    breaker = make_breaker(min_calls=1, open_timeout=60)
+    call(breaker, failed=True)
+    monkeypatch.setattr(raida, 'breaker', breaker)
+
+    with pytest.raises((UpstreamUnavailable, AsyncUpstreamUnavailable)) as error:
+        raida.get(task_url())
+
+    assert error.value.status_code == 503
+    assert error.value.detail['code'] == 'SERVICE_UNAVAILABLE'
+    assert upstream.calls['get_task'] == 0
+
+
+def task_url(task_id: str = fake_id('contest', 0)) -> str:
+    return f"{settings.BASE_URL}/api/tasks/{NODE_ID}/{task_id}"
+
+
+def rql_url() -> str:
+    return f"{settings.BASE_URL}/api/tasks/rql/{NODE_ID}"
+
+
+def send(asynchronous: bool, method: str, url: str, **kwargs):
+    """ Запрос через синхронный или асинхронный клиент Райды """
+    if asynchronous:
+        return asyncio.run(async_raida.request(method, url, **kwargs))
+    return raida.request(method, url, **kwargs)
+
+
+# тело создания заявки, как в services.new_task
+NEW_TASK = {'status_id': TASK_STATUSES['new'], 'custom_fields': {'cf_konkurs_id': fake_id('contest', 0), 'cf_userid': 'user'}}
+
+clients = pytest.mark.parametrize("asynchronous", [False, True], ids=['sync', 'async'])
+
+
+@clients
+def test_idempotent_request_retried(upstream, asynchronous):
+    upstream.fail('get_task', 503, 502)
+
+    response = send(asynchronous, 'GET', task_url())
+
+    assert response.status_code == 200
+    assert upstream.calls['get_task'] == 3
+
+
+@clients
+def test_rql_retried_when_marked_idempotent(upstream, asynchronous):
+    upstream.fail('rql', 504)
+
+    response = send(asynchronous, 'POST', rql_url(), json={'rql': f"process.id = '{TASK_PROCESS_ID}'"},
+                    idempotent=True)
+
+    assert response.status_code == 200
+    assert upstream.calls['rql'] == 2
+
+
+@clients
+def test_retries_limited_by_attempts(upstream, asynchronous):
+    upstream.fail('get_task', *[503] * (settings.UPSTREAM_RETRY_ATTEMPTS + 1))
+
+    response = send(asynchronous, 'GET', task_url())
+
+    assert response.status_code == 503
+    assert upstream.calls['get_task'] == settings.UPSTREAM_RETRY_ATTEMPTS
+
+
+@clients
+@pytest.mark.parametrize("method, kind", [('PATCH', 'patch_task'), ('POST', 'create_task')])
+def test_non_idempotent_request_not_retried(upstream, asynchronous, method, kind):
+    upstream.fail(kind, 503)
+
+    response = send(asynchronous, method, task_url(), json=NEW_TASK)
+
+    assert response.status_code == 503
+    assert upstream.calls[kind] == 1
+
+
+@clients
+def test_request_with_idempotency_key_retried(upstream, asynchronous):
+    upstream.fail('create_task', 503)
+
+    response = send(asynchronous, 'POST', task_url(), json=NEW_TASK, headers={'Idempotency-Key': 'key'})
+
+    assert response.status_code == 201
+    assert upstream.calls['create_task'] == 2
+
+
+@pytest.fixture
+def deadline():
+    """ Установка бюджета времени запроса к API (как RequestDeadlineMiddleware) на время теста """
+    tokens = []
+
+    def set_deadline(seconds: float):
+        tokens.append(current_deadline.set(time.monotonic() + seconds))
+
+    yield set_deadline
+    for token in reversed(tokens):
+        current_deadline.reset(token)
+
+
+@clients
+def test_expired_deadline_rejects_without_calling_service(upstream, deadline, asynchronous):
+    deadline(-1)
+
+    with pytest.raises((UpstreamUnavailable, AsyncUpstreamUnavailable)) as error:
+        send(asynchronous, 'GET', task_url())
+
+    assert error.value.status_code == 504
+    assert upstream.calls['get_task'] == 0
+
+
+@clients
+def test_no_retry_without_time_for_next_attempt(upstream, deadline, asynchronous):
+    # остатка бюджета не хватает на еще одну попытку (MIN_ATTEMPT_TIME)
+    deadline(0.3)
+    upstream.fail('get_task', 503)
+
+    response = send(asynchronous, 'GET', task_url())
+
+    assert response.status_code == 503
+    assert upstream.calls['get_task'] == 1
+
+
+def test_token_refresh_replaces_rejected_token(upstream):
+    token = raida_token.get()
+    upstream.reset()
+
+    new_token = raida_token.refresh(token)
+
+    assert new_token and new_token != token
+    assert raida_token.get() == new_token
+    # токен уже обновлен: повторный отказ старого токена не приводит к новому входу
+    assert raida_token.refresh(token) == new_token
+    assert upstream.calls['token'] == 1
+
+
+def rql_with_token(asynchronous: bool):
+    token = raida_token.get()
+    return token, send(asynchronous, 'POST', rql_url(), json={'rql': f"process.id = '{TASK_PROCESS_ID}'"},
+                       headers={'Authorization': f'Bearer {token}'}, idempotent=True)
+
+
+@clients
+def test_unauthorized_request_retried_once_with_new_token(upstream, asynchronous):
+    raida_token.get()
+    upstream.reset()
+    upstream.fail('rql', 401)
+
+    token, response = rql_with_token(asynchronous)
+
+    assert response.status_code == 200
+    assert upstream.calls['token'] == 1
+    assert upstream.calls['rql'] == 2
+    assert raida_token.get() != token
+
+
+@clients
+def test_second_unauthorized_response_returned(upstream, asynchronous):
+    raida_token.get()
+    upstream.reset()
+    upstream.fail('rql', 401, 401)
+
+    _, response = rql_with_token(asynchronous)
+
+    assert response.status_code == 401
+    assert upstream.calls['token'] == 1
+    assert upstream.calls['rql'] == 2
+
+
+def projected_rql(asynchronous: bool):
+    """ RQL-запрос с проекцией полей через post_rql или apost_rql """
+    query = {'rql': f"process.id = '{TASK_PROCESS_ID}'", 'fields': ['id', 'title']}
+    if asynchronous:
+        return asyncio.run(apost_rql(rql_url(), query, {}))
+    return post_rql(rql_url(), query, {})
+
+
+@clients
+def test_rejected_projection_disabled(upstream, asynchronous, monkeypatch):
+    monkeypatch.setitem(projection, 'enabled', True)
+    monkeypatch.setitem(projection, 'confirmed', False)
+    upstream.fail('rql', 400)
+
+    response = projected_rql(asynchronous)
+
+    assert response.status_code == 200
+    assert upstream.calls['rql'] == 2
+    assert upstream.requests[-1][2]['fields'] == []
+    assert not projection['enabled']
+
+
+@clients
+def test_bad_request_not_repeated_after_projection_confirmed(upstream, asynchronous, monkeypatch):
+    monkeypatch.setitem(projection, 'enabled', True)
+    monkeypatch.setitem(projection, 'confirmed', False)
+    projected_rql(asynchronous)
+    upstream.fail('rql', 400)
+
+    response = projected_rql(asynchronous)
+
+    assert response.status_code == 400
+    assert upstream.calls['rql'] == 2
+    assert projection['enabled']
+
+
+def token_manager(**options) -> TokenManager:
+    """ Менеджер токенов с теми же учетными данными, что и raida_token, и коротким ожиданием блокировки """
+    parameters = dict(url=raida_token.url, username=raida_token.username, password=raida_token.password,
+                      cache_alias=raida_token.cache_alias, cache_key='test:access_token', refresh_margin=0,
+                      default_ttl=60, lock_wait=0.2)
+    parameters.update(options)
+    return TokenManager(**parameters)
+
+
+@clients
+def test_no_login_while_other_worker_holds_lock(upstream, asynchronous):
+    """ Не дождавшись токена от воркера с блокировкой, менеджер не входит сам и не снимает чужую блокировку """
+    manager = token_manager()
+    manager.backend.set(manager.lock_key, 'other', timeout=60)
+
+    token = asyncio.run(manager.aget()) if asynchronous else manager.get()
+
+    assert token is None
+    assert upstream.calls['token'] == 0
+    assert manager.backend.get(manager.lock_key) == 'other'
+
+
+@clients
+def test_response_without_token_is_login_failure(upstream, asynchronous):
+    """ Ответ на вход без access_token не кэшируется как токен """
+    manager = token_manager()
+    upstream.fail('token', 200)
+
+    token = asyncio.run(manager.aget()) if asynchronous else manager.get()
+
+    assert token is None
+    assert manager.backend.get(manager.cache_key) is None
+    assert manager.backend.get(manager.lock_key) is None
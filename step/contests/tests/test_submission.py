@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from benchmarks.fake_upstream import TASK_STATUSES, FakeUpstream
+from contests.models import OrphanedAttachment
+from contests.submission import attachment_id
+from contests.uploads import UploadSizeLimitMiddleware
+
+URL = '/contests/user/my/task/send_solution'
+
+
+def send_solution(client, user_id, content=b'solution', **fields):
+    """ Отправка решения по первой заявке пользователя (решение по ней еще не отправлено) """
+    data = {'task_id': FakeUpstream.user_task_id(user_id), 'solution_file': SimpleUploadedFile('solution.zip', content),
+            **fields}
+    return client.post(URL, data)
+
+
+def patches(upstream):
+    return [body for method, path, body in upstream.requests if method == 'PATCH']
+
+
+def test_solution_sent(client, upstream, user_id):
+    response = send_solution(client, user_id, solution_link='https://example.com/new')
+
+    assert response.status_code == 200
+    assert response.json()['detail']['code'] == 'OK'
+    assert upstream.calls['post_attachment'] == 1
+    assert patches(upstream) == [{'status_id': TASK_STATUSES['completed'],
+                                  'custom_fields': {'solution_link': 'https://example.com/new'}}]
+
+
+@override_settings(UPLOAD_MAX_FILE_SIZE=1024)
+def test_too_large_file_rejected(client, upstream, user_id):
+    """ Файл больше UPLOAD_MAX_FILE_SIZE отклоняется при приеме (UploadSizeLimitHandler), в Райду ничего не уходит """
+    response = send_solution(client, user_id, content=b'x' * 4096)
+
+    assert response.status_code == 413
+    assert response.json()['detail']['code'] == 'FILE_TOO_LARGE'
+    assert upstream.calls['post_attachment'] == 0
+    assert upstream.calls['patch_task'] == 0
+
+
+def test_upload_failure_leaves_task_unchanged(client, upstream, user_id):
+    upstream.fail('post_attachment', 500)
+
+    response = send_solution(client, user_id)
+
+    assert response.status_code == 500
+    assert upstream.calls['patch_task'] == 0
+
+
+def test_rejected_patch_not_compensated(client, upstream, user_id, caplog):
+    """ Райда отклонила изменение заявки (4xx): заявка не изменилась, компенсация не нужна, файл пишется в лог """
+    upstream.fail('patch_task', 400)
+
+    with caplog.at_level(logging.ERROR, logger='contests.submission'):
+        response = send_solution(client, user_id)
+
+    assert response.status_code == 400
+    assert upstream.calls['patch_task'] == 1
+    assert 'файл' in caplog.text and 'загружен, но заявка не изменена' in caplog.text
+    orphan = OrphanedAttachment.objects.get(task_id=FakeUpstream.user_task_id(user_id))
+    assert orphan.attachment_id and orphan.status_code == 400
+
+
+def test_unknown_patch_outcome_compensated(client, upstream, user_id):
+    """ Результат изменения заявки неизвестен (5xx): прежние статус и значения измененных полей возвращаются """
+    upstream.fail('patch_task', 502)
+
+    response = send_solution(client, user_id, solution_link='https://example.com/new', comments='Комментарий')
+
+    assert response.status_code == 502
+    forward, compensation = patches(upstream)
+    assert forward['custom_fields'] == {'solution_link': 'https://example.com/new', 'comments': 'Комментарий'}
+    # прежние статус и значение solution_link из заявки в Райде, незаполненный комментарий - пустая строка
+    assert compensation == {'status_id': TASK_STATUSES['new'],
+                            'custom_fields': {'solution_link': 'https://example.com/solution', 'comments': ''}}
+    assert OrphanedAttachment.objects.filter(task_id=FakeUpstream.user_task_id(user_id), status_code=502).exists()
+
+
+def test_compensation_restores_status_from_raida(client, upstream, user_id):
+    """ Прежний статус для компенсации берется из заявки в Райде, а не из индекса участия """
+    client.get('/contests/user/my/tasks/')
+    task = upstream.participation(user_id)[0]
+    task['status'] = {'id': TASK_STATUSES['approved'], 'name': ''}
+    upstream.fail('patch_task', 502)
+
+    response = send_solution(client, user_id)
+
+    assert response.status_code == 502
+    assert patches(upstream)[-1]['status_id'] == TASK_STATUSES['approved']
+
+
+def test_failed_compensation_logged(client, upstream, user_id, caplog):
+    upstream.fail('patch_task', 502, 500)
+
+    with caplog.at_level(logging.ERROR, logger='contests.submission'):
+        response = send_solution(client, user_id)
+
+    assert response.status_code == 502
+    assert upstream.calls['patch_task'] == 2
+    assert 'не удалось вернуть прежний статус заявки' in caplog.text
+
+
+@pytest.mark.parametrize("response_data, expected", [
+    ({'id': 'a1', 'name': 'solution.zip'}, 'a1'),
+    ([{'id': 'a2', 'name': 'solution.zip'}], 'a2'),
+    ([], None),
+    (None, None),
+])
+def test_attachment_id(response_data, expected):
+    """ id загруженного файла из ответа Райды - объекта или списка """
+    assert attachment_id(response_data) == expected
+
+
+@override_settings(UPLOAD_MAX_FILE_SIZE=1024, DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+def test_too_large_body_rejected_before_reading():
+    """ ASGI: тело больше max_request_size() отклоняется по Content-Length, приложение и тело не читаются """
+    sent = []
+
+    async def app(scope, receive, send):
+        raise AssertionError('запрос не должен дойти до приложения')
+
+    async def receive():
+        raise AssertionError('тело запроса не должно читаться')
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': URL, 'headers': [(b'content-length', b'4096')]}
+    asyncio.run(UploadSizeLimitMiddleware(app)(scope, receive, send))
+
+    assert sent[0]['status'] == 413
+    assert json.loads(sent[1]['body'])['detail']['code'] == 'FILE_TOO_LARGE'
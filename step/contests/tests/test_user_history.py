@@ -7,7 +7,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-settings.configure()
+if not settings.configured:
+    settings.configure()
 
 BASE_URL = "http://127.0.0.1:8000" #"https://step.skroy.ru"
 BASE_URL_1 = os.getenv('BASE_URL_UC')
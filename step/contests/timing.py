@@ -0,0 +1,202 @@
+"""
+Разбивка времени запроса к API по этапам и профилирование медленных запросов.
+
+Этапы (в порядке выполнения): auth - проверка JWT (JWTAuthentication), headers - проверка заголовков
+(HeadersSerializer), configs - получение конфигов, upstream - суммарное время ожидания внешних сервисов
+(по contests.metrics, вызовы из пула потоков складываются), transform - преобразование данных Райды
+в ответ API, render - кодирование ответа. Время этапов отдается в заголовке Server-Timing (SERVER_TIMING)
+и видно во вкладке Network инструментов разработчика браузера.
+
+Если задан PROFILE_SAMPLE_RATE, доля запросов выполняется под cProfile, и для запросов дольше
+PROFILE_SLOW_THRESHOLD_MS в лог пишется отчет (функции по накопленному времени), а в PROFILE_DIR, если задан,
+сохраняется файл .prof для snakeviz/pstats. Одновременно профилируется не больше одного запроса на процесс.
+Профилируется поток, в котором выполняется представление (в асинхронном режиме - цикл событий,
+поэтому в отчет попадают и одновременно выполнявшиеся запросы), работа в пуле потоков в отчет не попадает.
+"""
+import cProfile
+import contextvars
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestStats, current_request, view_name
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('auth', 'headers', 'configs', 'upstream', 'transform', 'render')
+
+# число строк отчета профилировщика
+PROFILE_REPORT_LINES = 40
+
+profile_lock = threading.Lock()
+
+
+class RequestTimings:
+    """ Время этапов одного запроса к API, в секундах (обновляется и из потоков пула) """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] += seconds
+
+    def header(self, stats: Optional[RequestStats]) -> str:
+        """ Значение заголовка Server-Timing, длительности в миллисекундах """
+        phases = dict(self.phases)
+        if stats is not None and stats.calls:
+            phases['upstream'] = stats.seconds
+        entries = []
+        for name in PHASES:
+            if name in phases:
+                entry = f'{name};dur={phases[name] * 1000:.1f}'
+                if name == 'upstream':
+                    entry += f';desc="{stats.calls} calls"'
+                entries.append(entry)
+        entries.append(f'total;dur={self.elapsed * 1000:.1f}')
+        return ', '.join(entries)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    'request_timings', default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """ Учет времени блока как этапа name текущего запроса (вне запроса - без учета) """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed_phase(name: str) -> Callable:
+    """ Декоратор: время выполнения функции учитывается как этап name """
+
+    def decorator(function: Callable) -> Callable:
+        if iscoroutinefunction(function):
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with phase(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def start_profiler() -> Optional[cProfile.Profile]:
+    """ Профилировщик для выбранного запроса или None """
+    if settings.PROFILE_SAMPLE_RATE <= 0 or random.random() >= settings.PROFILE_SAMPLE_RATE:
+        return None
+    if not profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # профилировщик уже запущен в этом потоке (например, отладчиком)
+        profile_lock.release()
+        return None
+    return profiler
+
+
+def stop_profiler(profiler: cProfile.Profile, request, timings: RequestTimings, server_timing: str):
+    profiler.disable()
+    profile_lock.release()
+    elapsed_ms = timings.elapsed * 1000
+    if elapsed_ms < settings.PROFILE_SLOW_THRESHOLD_MS:
+        return
+    view = view_name(request)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_REPORT_LINES)
+    logger.warning("Медленный запрос %s %s (%s): %.0f мс, %s\n%s", request.method, request.path, view,
+                   elapsed_ms, server_timing, report.getvalue())
+    if settings.PROFILE_DIR:
+        path = os.path.join(settings.PROFILE_DIR, f'{time.strftime("%Y%m%d-%H%M%S")}-{view}-{os.getpid()}.prof')
+        try:
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError as err:
+            logger.error("Не удалось сохранить профиль запроса в %s: %s", path, err)
+
+
+class ServerTimingMiddleware:
+    """
+    Заголовок Server-Timing с временем этапов запроса и выборочное профилирование медленных запросов.
+    Стоит после UpstreamMetricsMiddleware, чтобы учитывать вызовы внешних сервисов запроса.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        profiler = start_profiler()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            if profiler is not None:
+                profiler.disable()
+                profile_lock.release()
+            raise
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings, profiler)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        profiler = start_profiler()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            if profiler is not None:
+                profiler.disable()
+                profile_lock.release()
+            raise
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings, profiler)
+
+    def finish(self, request, response, timings: RequestTimings, profiler: Optional[cProfile.Profile]):
+        server_timing = timings.header(current_request.get())
+        if profiler is not None:
+            stop_profiler(profiler, request, timings, server_timing)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing
+        return response
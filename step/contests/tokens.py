@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import httpx
+import jwt
+from django.conf import settings
+from django.core.cache import caches
+from requests.exceptions import RequestException
+
+from .cache import SingleFlight, AsyncSingleFlight
+from .http_client import raida, async_raida
+from .jsonbackend import json_body
+from .metrics import upstream_operation
+from .resilience import current_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    """
+    Сервисный токен доступа к Райде, общий для всех запросов процесса и (через бэкенд кэша Django) всех воркеров.
+
+    Время жизни токена берется из его claim exp. За refresh_margin секунд до истечения токен обновляется
+    в фоне, а запросы продолжают использовать текущий. Получение нового токена выполняется одним
+    потоком или одной корутиной процесса и, благодаря блокировке в кэше, одним воркером: остальные
+    ждут, пока новый токен появится в кэше, и не дождавшись, сами не входят, а продолжают с текущим токеном.
+    """
+
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='token-refresh')
+
+    def __init__(self, url: str, username: str, password: str, cache_alias: str, cache_key: str,
+                 refresh_margin: float, default_ttl: float, lock_wait: float = 3):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.cache_alias = cache_alias
+        self.cache_key = cache_key
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.lock_wait = lock_wait
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._flight = SingleFlight()
+        self._aflight = AsyncSingleFlight()
+        self._tasks = set()
+
+    @property
+    def backend(self):
+        return caches[self.cache_alias]
+
+    @property
+    def lock_key(self) -> str:
+        return f"{self.cache_key}:lock"
+
+    def expires_in(self, token: Optional[str]) -> float:
+        """ Сколько секунд осталось до истечения токена по его claim exp (подпись не проверяется) """
+        try:
+            exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+        except jwt.PyJWTError:
+            exp = None
+        if not exp:
+            return self.default_ttl
+        return exp - time.time()
+
+    def _current(self) -> Tuple[Optional[str], float]:
+        with self._lock:
+            return self._token, self._expires_at
+
+    def _remember(self, token: str, expires_at: float):
+        with self._lock:
+            self._token = token
+            self._expires_at = expires_at
+
+    def _forget(self, token: str) -> bool:
+        with self._lock:
+            if self._token != token:
+                return False
+            self._token = None
+            self._expires_at = 0
+            return True
+
+    def _adopt(self, entry: Optional[dict]) -> Optional[str]:
+        """ Принять токен, полученный другим воркером, если он еще действителен """
+        if entry and entry['expires_at'] > time.time():
+            self._remember(entry['token'], entry['expires_at'])
+            return entry['token']
+        return None
+
+    def _store(self, token: str) -> dict:
+        expires_at = time.time() + self.expires_in(token)
+        self._remember(token, expires_at)
+        return {'token': token, 'expires_at': expires_at}
+
+    def _timeout(self, entry: dict) -> int:
+        return max(int(entry['expires_at'] - time.time()), 1)
+
+    # синхронный вариант
+
+    def get(self) -> Optional[str]:
+        """ Действующий токен доступа к Райде или None, если получить его не удалось """
+        token, expires_at = self._current()
+        now = time.time()
+        if token is None or expires_at <= now:
+            token = self._adopt(self.backend.get(self.cache_key))
+            if token is None:
+                return self._flight.do('token', self._obtain)
+            _, expires_at = self._current()
+        if expires_at - now <= self.refresh_margin:
+            self._refresh_in_background()
+        return token
+
+    def refresh(self, rejected: Optional[str] = None) -> Optional[str]:
+        """ Получить новый токен взамен отклоненного Райдой (ответ 401) """
+        if rejected is not None and not self._forget(rejected):
+            # токен уже обновил другой поток
+            return self.get()
+        if rejected is not None and self.backend.get(self.cache_key, {}).get('token') == rejected:
+            self.backend.delete(self.cache_key)
+        return self._flight.do('token', self._obtain)
+
+    def _obtain(self) -> Optional[str]:
+        owner = uuid.uuid4().hex
+        if not self.backend.add(self.lock_key, owner, timeout=int(self.lock_wait) + 1):
+            # токен уже получает другой воркер, ждем его появления в кэше
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(0.1)
+                token = self._adopt(self.backend.get(self.cache_key))
+                if token is not None:
+                    return token
+            return self._waited()
+        try:
+            return self._login()
+        finally:
+            # блокировка могла истечь и достаться другому воркеру, ее удаляет только владелец
+            if self.backend.get(self.lock_key) == owner:
+                self.backend.delete(self.lock_key)
+
+    def _waited(self) -> Optional[str]:
+        """
+        Токен после ожидания чужой блокировки: новый вход не выполняется, чтобы воркеры не входили одновременно.
+        Возвращается текущий токен процесса (запрос с истекшим токеном получит 401 и повторит обновление).
+        """
+        logger.warning("Токен доступа к Райде не появился в кэше за %s с", self.lock_wait)
+        token, _ = self._current()
+        return token
+
+    def _access_token(self, response) -> Optional[str]:
+        """ Токен из ответа Райды на вход или None (с записью в лог), если токена в ответе нет """
+        if response.status_code != 200:
+            logger.error("Не удалось получить токен доступа к Райде: HTTP %s", response.status_code)
+            return None
+        try:
+            token = json_body(response).get('access_token')
+        except (ValueError, AttributeError):
+            token = None
+        if not token:
+            logger.error("Не удалось получить токен доступа к Райде: в ответе нет access_token")
+            return None
+        return token
+
+    @upstream_operation('get_token')
+    def _login(self) -> Optional[str]:
+        try:
+            response = raida.post(self.url, data={'username': self.username, 'password': self.password})
+        except RequestException as err:
+            logger.error("Не удалось получить токен доступа к Райде: %s", err)
+            return None
+        token = self._access_token(response)
+        if token is None:
+            return None
+        entry = self._store(token)
+        self.backend.set(self.cache_key, entry, timeout=self._timeout(entry))
+        return entry['token']
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                entry = self.backend.get(self.cache_key)
+                # другой воркер мог уже обновить токен
+                if not entry or entry['expires_at'] - time.time() <= self.refresh_margin:
+                    entry = None
+                if self._adopt(entry) is None:
+                    self._flight.do('token', self._obtain)
+            except Exception:
+                logger.exception("Ошибка фонового обновления токена доступа к Райде")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        self._executor.submit(refresh)
+
+    # асинхронный вариант
+
+    async def aget(self) -> Optional[str]:
+        """ Асинхронный вариант get """
+        token, expires_at = self._current()
+        now = time.time()
+        if token is None or expires_at <= now:
+            token = self._adopt(await self.backend.aget(self.cache_key))
+            if token is None:
+                return await self._aflight.do('token', self._aobtain)
+            _, expires_at = self._current()
+        if expires_at - now <= self.refresh_margin:
+            self._arefresh_in_background()
+        return token
+
+    async def arefresh(self, rejected: Optional[str] = None) -> Optional[str]:
+        """ Асинхронный вариант refresh """
+        if rejected is not None and not self._forget(rejected):
+            return await self.aget()
+        if rejected is not None and (await self.backend.aget(self.cache_key, {})).get('token') == rejected:
+            await self.backend.adelete(self.cache_key)
+        return await self._aflight.do('token', self._aobtain)
+
+    async def _aobtain(self) -> Optional[str]:
+        owner = uuid.uuid4().hex
+        if not await self.backend.aadd(self.lock_key, owner, timeout=int(self.lock_wait) + 1):
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                token = self._adopt(await self.backend.aget(self.cache_key))
+                if token is not None:
+                    return token
+            return self._waited()
+        try:
+            return await self._alogin()
+        finally:
+            if await self.backend.aget(self.lock_key) == owner:
+                await self.backend.adelete(self.lock_key)
+
+    @upstream_operation('get_token')
+    async def _alogin(self) -> Optional[str]:
+        try:
+            response = await async_raida.post(self.url, data={'username': self.username, 'password': self.password})
+        except httpx.RequestError as err:
+            logger.error("Не удалось получить токен доступа к Райде: %s", err)
+            return None
+        token = self._access_token(response)
+        if token is None:
+            return None
+        entry = self._store(token)
+        await self.backend.aset(self.cache_key, entry, timeout=self._timeout(entry))
+        return entry['token']
+
+    def _arefresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        async def refresh():
+            # задача получает копию контекста запроса, но его бюджет времени к фоновому обновлению не относится
+            current_deadline.set(None)
+            try:
+                entry = await self.backend.aget(self.cache_key)
+                if not entry or entry['expires_at'] - time.time() <= self.refresh_margin:
+                    entry = None
+                if self._adopt(entry) is None:
+                    await self._aflight.do('token', self._aobtain)
+            except Exception:
+                logger.exception("Ошибка фонового обновления токена доступа к Райде")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        # храним ссылку на задачу, чтобы ее не удалил сборщик мусора до завершения
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+raida_token = TokenManager(
+    url=f"{settings.BASE_URL}/api/users/token/",
+    username=settings.USERNAME,
+    password=settings.PASSWORD,
+    cache_alias=settings.RAIDA_TOKEN_CACHE_ALIAS,
+    cache_key='raida:access_token',
+    refresh_margin=settings.RAIDA_TOKEN_REFRESH_MARGIN,
+    default_ttl=settings.RAIDA_TOKEN_DEFAULT_TTL,
+)
+
+# при ответе 401 клиенты Райды получают новый токен и один раз повторяют запрос
+raida.token_manager = raida_token
+async_raida.token_manager = raida_token
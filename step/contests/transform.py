@@ -0,0 +1,189 @@
+"""
+Преобразование задач Райды в элементы ответов API.
+
+Каждый формат описывается декларативно списком полей Field: имя поля в ответе API, путь к значению
+в задаче Райды ('status.id', 'custom_fields.cf_deadline') и необязательное преобразование значения.
+По описанию при импорте модуля один раз собирается функция преобразования, которая на каждый вызов
+выполняет только обращения к словарям: без создания сериализаторов, валидации полей и промежуточных объектов.
+Проверка входных данных (validate) включается отдельно для форматов, где она нужна.
+"""
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .dates import datetime_convert, history_date
+
+EMPTY: Dict = {}
+
+
+def text(value):
+    # строковые поля страницы конкурса раньше проходили через CharField, который обрезает пробелы
+    return value.strip() if isinstance(value, str) else value
+
+
+def is_uuid(value: Any) -> bool:
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+class TransformError(ValueError):
+    """ Данные из Райды не прошли проверку формата """
+
+
+class Field:
+    """ Поле ответа API: путь к значению в задаче Райды, преобразование и проверка значения """
+    __slots__ = ('name', 'path', 'convert', 'required', 'check')
+
+    def __init__(
+            self,
+            name: str,
+            source: Optional[str] = None,
+            convert: Optional[Callable[[Any], Any]] = None,
+            required: bool = False,
+            check: Optional[Callable[[Any], bool]] = None
+    ):
+        self.name = name
+        self.path: Tuple[str, ...] = tuple((source or name).split('.'))
+        self.convert = convert
+        self.required = required
+        self.check = check
+
+    def value(self, data: Dict) -> Any:
+        for key in self.path:
+            data = (data or EMPTY).get(key)
+        return data
+
+
+class Transformer:
+    """
+    Преобразование словаря из Райды в словарь ответа API по списку полей.
+
+    Функция преобразования генерируется по полям один раз: для общего префикса путей ('custom_fields')
+    вложенный словарь достается один раз, поля ответа идут в порядке объявления.
+    """
+    __slots__ = ('name', 'fields', 'validate', '_transform')
+
+    def __init__(self, name: str, *fields: Field, validate: bool = False):
+        self.name = name
+        self.fields = fields
+        self.validate = validate
+        self._transform = compile_transform(name, fields)
+
+    def __call__(self, data: Dict) -> Dict:
+        if self.validate:
+            self.check(data)
+        return self._transform(data)
+
+    def check(self, data: Dict):
+        """ Проверка обязательных полей и формата значений, TransformError со списком ошибок """
+        if not isinstance(data, dict):
+            raise TransformError(f"{self.name}: ожидается объект, получено {type(data).__name__}")
+        errors = []
+        for field in self.fields:
+            value = field.value(data)
+            if value is None:
+                if field.required:
+                    errors.append(f"{'.'.join(field.path)}: обязательное поле")
+            elif field.check is not None and not field.check(value):
+                errors.append(f"{'.'.join(field.path)}: некорректное значение {value!r}")
+        if errors:
+            raise TransformError(f"{self.name}: " + '; '.join(errors))
+
+    def many(self, items: Optional[List[Dict]]) -> Optional[List[Dict]]:
+        """ Преобразование списка (None остается None) """
+        if items is None:
+            return None
+        transform = self._transform
+        return [transform(item) for item in items]
+
+
+def compile_transform(name: str, fields: Tuple[Field, ...]) -> Callable[[Dict], Dict]:
+    """ Сборка функции преобразования по списку полей """
+    namespace: Dict[str, Any] = {'EMPTY': EMPTY}
+    prefixes: Dict[Tuple[str, ...], str] = {(): 'data'}
+    lines = []
+
+    def variable(prefix: Tuple[str, ...]) -> str:
+        if prefix not in prefixes:
+            parent = variable(prefix[:-1])
+            prefixes[prefix] = f"v{len(prefixes)}"
+            lines.append(f"    {prefixes[prefix]} = {parent}.get({prefix[-1]!r}) or EMPTY")
+        return prefixes[prefix]
+
+    items = []
+    for index, field in enumerate(fields):
+        expression = f"{variable(field.path[:-1])}.get({field.path[-1]!r})"
+        if field.convert is not None:
+            namespace[f"c{index}"] = field.convert
+            expression = f"c{index}({expression})"
+        items.append(f"        {field.name!r}: {expression},")
+
+    source = '\n'.join(["def transform(data):", *lines, "    return {", *items, "    }", ""])
+    exec(compile(source, f"<transform {name}>", 'exec'), namespace)
+    return namespace['transform']
+
+
+attachment = Transformer(
+    'attachment',
+    Field('id', convert=text),
+    Field('name', convert=text),
+)
+
+# элемент списка конкурсов (активные, архив) и основа элемента раздела "мои задания"
+contest_item = Transformer(
+    'contest_item',
+    Field('id'),
+    Field('title'),
+    Field('description'),
+    Field('status_id', 'status.id'),
+    Field('status_name', 'status.name'),
+    Field('deadline', 'custom_fields.cf_deadline', datetime_convert),
+    Field('award', 'custom_fields.cf_award'),
+    Field('brief', 'custom_fields.cf_brief'),
+    Field('profession', 'custom_fields.cf_profession'),
+    Field('projects', 'custom_fields.cf_projects'),
+    Field('konkurs_category', 'custom_fields.cf_konkurs_category'),
+)
+
+# элемент списка задач конкурса
+contest_task_item = Transformer(
+    'contest_task_item',
+    Field('id'),
+    Field('title'),
+    Field('description'),
+    Field('status_id', 'status.id'),
+    Field('status_name', 'status.name'),
+    Field('deadline', 'custom_fields.cf_deadline', datetime_convert),
+    Field('award', 'custom_fields.cf_award'),
+    Field('brief', 'custom_fields.cf_brief'),
+    Field('projects', 'custom_fields.cf_projects'),
+    Field('konkurs_category', 'custom_fields.cf_konkurs_category'),
+)
+
+# конкурс в элементе истории участия (заявка и решение добавляются в history_item)
+history_contest = Transformer(
+    'history_contest',
+    Field('id'),
+    Field('title'),
+    Field('created_at', convert=history_date),
+    Field('deadline', 'custom_fields.cf_deadline', history_date),
+)
+
+# страница конкурса: данные проверяются так же, как раньше при разборе сериализатором
+contest_details = Transformer(
+    'contest_details',
+    Field('id', required=True, check=is_uuid),
+    Field('title', convert=text),
+    Field('description', convert=text, check=lambda value: isinstance(value, str)),
+    Field('created_at', convert=lambda value: datetime_convert(text(value)), required=True),
+    Field('status_id', 'status.id', required=True, check=is_uuid),
+    Field('status_name', 'status.name', convert=text, required=True),
+    Field('deadline', 'custom_fields.cf_deadline', lambda value: datetime_convert(text(value))),
+    Field('award', 'custom_fields.cf_award', text),
+    Field('profession', 'custom_fields.cf_profession', text),
+    Field('category', 'custom_fields.cf_konkurs_category', text),
+    Field('attachments', convert=attachment.many, check=lambda value: isinstance(value, list)),
+    validate=True,
+)
@@ -0,0 +1,160 @@
+"""
+Загрузка файлов решений и их передача в Райду.
+
+Прием файла. Тело запроса больше max_request_size() (UPLOAD_MAX_FILE_SIZE и остальные поля формы, не больше
+DATA_UPLOAD_MAX_MEMORY_SIZE) отклоняется по заголовку Content-Length до чтения тела: при ASGI - оберткой
+UploadSizeLimitMiddleware над приложением (step.asgi), потому что Django при ASGI читает тело целиком
+до вызова представления; при WSGI - в UploadSizeLimitHandler.handle_raw_input. Запрос без Content-Length
+(chunked) проверяется только по мере разбора частей (UploadSizeLimitHandler.receive_data_chunk), при ASGI -
+уже после приема всего тела.
+
+Файл не передается в Райду напрямую из входящего запроса: Django сохраняет его в память (до
+FILE_UPLOAD_MAX_MEMORY_SIZE) или во временный файл на диске. В Райду файл передается потоком из этой копии:
+тело multipart/form-data (MultipartFile) читается частями по UPLOAD_CHUNK_SIZE, а не собирается целиком
+в памяти, как при requests.post(files=...).
+"""
+import uuid
+from typing import AsyncIterator, Iterator, Optional
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from urllib3.fields import format_multipart_header_param
+
+
+class FileTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = 'FILE_TOO_LARGE'
+
+    def __init__(self, max_size: int):
+        # обработчик исключений DRF отдает detail-словарь как есть, поэтому ответ в общем формате ошибок API
+        super().__init__({'detail': {
+            'code': self.default_code,
+            'message': f'Размер файла превышает {max_size} байт'
+        }})
+
+
+def max_request_size() -> int:
+    """ Наибольший размер тела запроса: файл решения и остальные поля формы """
+    return settings.UPLOAD_MAX_FILE_SIZE + (settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0)
+
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    """ Обработчик загрузки, прерывающий прием файла больше UPLOAD_MAX_FILE_SIZE байт """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # вызывается до чтения тела: при WSGI слишком большое тело не читается вовсе
+        if content_length and content_length > max_request_size():
+            raise FileTooLarge(settings.UPLOAD_MAX_FILE_SIZE)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.UPLOAD_MAX_FILE_SIZE:
+            raise FileTooLarge(settings.UPLOAD_MAX_FILE_SIZE)
+        # часть передается следующим обработчикам (в память или во временный файл)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI-обертка приложения: запрос с Content-Length больше max_request_size() получает ответ 413
+    до чтения тела (Django при ASGI читает тело запроса целиком до вызова представления).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            length = content_length(scope)
+            if length is not None and length > max_request_size():
+                await self.reject(send)
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def reject(send):
+        error = FileTooLarge(settings.UPLOAD_MAX_FILE_SIZE)
+        response = JsonResponse(error.detail, status=error.status_code, json_dumps_params={'ensure_ascii': False})
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(b'content-type', response['Content-Type'].encode()),
+                        (b'content-length', str(len(response.content)).encode()),
+                        (b'connection', b'close')],
+        })
+        await send({'type': 'http.response.body', 'body': response.content})
+
+
+def content_length(scope) -> Optional[int]:
+    """ Значение заголовка Content-Length ASGI-запроса (None, если заголовка нет или он неверный) """
+    for name, value in scope.get('headers', ()):
+        if name == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class MultipartFile:
+    """
+    Тело запроса multipart/form-data с одним файлом, которое читается из файла частями.
+
+    Для requests передается как data (итерируемое с известной длиной), для httpx - как content (aiter()).
+    Каждый обход начинается с начала файла, поэтому тело можно отправить повторно (повтор после 401).
+    """
+
+    def __init__(self, field_name: str, file, chunk_size: int = None):
+        self.file = file
+        self.chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+        self.boundary = uuid.uuid4().hex
+        file_name = getattr(file, 'name', None) or field_name
+        content_type = getattr(file, 'content_type', None) or 'application/octet-stream'
+        self.head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; {format_multipart_header_param("name", field_name)}; '
+            f'{format_multipart_header_param("filename", file_name.rsplit("/", 1)[-1])}\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self.size = getattr(file, 'size', None)
+        if self.size is None:
+            self.size = file.seek(0, 2)
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    @property
+    def headers(self) -> dict:
+        return {'Content-Type': self.content_type, 'Content-Length': str(len(self))}
+
+    def __len__(self) -> int:
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        self.file.seek(0)
+        yield self.head
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+        yield self.tail
+
+    def aiter(self) -> 'AsyncMultipartFile':
+        return AsyncMultipartFile(self)
+
+
+class AsyncMultipartFile:
+    """ MultipartFile для httpx.AsyncClient: повторно обходимый асинхронный итератор частей """
+
+    def __init__(self, body: MultipartFile):
+        self.body = body
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        # файл загружен в память или во временный файл на локальном диске, чтение части не блокирует надолго
+        for chunk in self.body:
+            yield chunk
@@ -1,9 +1,16 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import (
-    ArchiveContestsView, ContestDetailsView, ActiveContestsView, UserTasksView, QuitContestView, UserHistoryView,
-    UserTaskView, ContestTasksView, SolutionView
-)
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        ArchiveContestsView, ContestDetailsView, ActiveContestsView, UserTasksView, QuitContestView, UserHistoryView,
+        UserTaskView, ContestTasksView, SolutionView
+    )
+else:
+    from .views import (
+        ArchiveContestsView, ContestDetailsView, ActiveContestsView, UserTasksView, QuitContestView, UserHistoryView,
+        UserTaskView, ContestTasksView, SolutionView
+    )
 
 urlpatterns = [
     path('contests/<uuid:contest_id>/', ContestDetailsView.as_view(), name='contest_details'),
@@ -1,20 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiResponse, inline_serializer, OpenApiParameter
 from rest_framework import status, permissions, serializers
-from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
+from .metrics import in_request_context
+from .pagination import PaginationSerializer, get_page, paginate
+from .parsers import JSONParser
+from .submission import SubmissionWorkflow
+from .streaming import NDJSONRenderer, stream_format, streaming_response
+from .readmodel import read_contests, fetch_contest_local
 from .serializers import (GetArchiveSerializer, ErrorResponseSerializer, ContestDetailsResponseSerializer,
                           CreateTaskSerializer, TaskResponseSerializer, QueryParamsSerializer,
                           GetContestTasksListSerializer, GetUserTasksListSerializer, GetUserHistoryListSerializer,
                           HeadersSerializer, SolutionSerializer)
-from .services import (get_token, get_contest, get_contests, get_user_task, get_tasks, get_history, contest_exists, create_task,
-                       get_contest_tasks, get_configs, task_solution_status, post_attachments, patch_task)
+from .services import (get_token, get_contests_cached, get_user_task, get_tasks, get_history, contest_exists, create_task,
+                       get_contest_tasks, get_contest_tasks_cached, get_configs, task_solution_status, patch_task,
+                       get_contest_cached, is_normalized_contest, contest_details_response)
+
+# общий пул потоков страницы конкурса: потоки переиспользуются, а число одновременных запросов к Райде ограничено
+details_executor = ThreadPoolExecutor(max_workers=settings.CONTEST_DETAILS_WORKERS,
+                                      thread_name_prefix='contest-details')
 
 
 class BaseContestView(APIView):
-    """Родительский класс для исключения дублирования кода в части документация swagger."""
+    """
+    Родительский класс для исключения дублирования кода в части документация swagger и общих шагов обработки
+    запроса: валидации заголовков, разбора конфигураций проекта и сборки ответа. Асинхронные представления
+    (contests.async_views) наследуют эти шаги и отличаются только вызовами сервисного слоя.
+    """
+
+    # потоковая отдача списка (см. contests.streaming)
+    STREAMING = False
+    STREAM_PARAMETER = OpenApiParameter(
+        'stream', OpenApiTypes.STR, OpenApiParameter.QUERY, enum=['1', 'ndjson'],
+        description="Потоковая отдача списка: 1 - JSON в том же формате, ndjson - по одному элементу на строку"
+    )
 
     COMMON_RESPONSES = {
         400: OpenApiResponse(
@@ -39,15 +66,97 @@ class BaseContestView(APIView):
         ),
     }
 
+    # конфиги, которые представление запрашивает в сервисе конфигов, и пути к нужным значениям в ответе
+    CONFIGS: List[str] = []
+    CONFIG_VALUES: Dict[str, Tuple[str, ...]] = {}
+
+    @staticmethod
+    def configs_request(request) -> Tuple[Optional[Dict], Optional[Response]]:
+        """
+        Параметры запроса в сервис конфигов из заголовков Project-ID, Account-ID и Authorization.
+        Если заголовки не прошли валидацию, вместо параметров возвращается ответ с ошибкой.
+        """
+        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
+        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
+        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
+        if not serializer.is_valid():
+            return None, Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
+        # токен из заголовков нужен для авторизации в сервисе конфигов
+        auth_token = request.META.get('HTTP_AUTHORIZATION')
+        return {'project_id': project_id, 'account_id': account_id, 'auth_token': auth_token}, None
+
+    def list_options(self, request) -> Tuple[Optional[Dict], Optional[str], Optional[Response]]:
+        """ Параметры страницы (limit/offset или cursor) и формат потоковой отдачи списка, если она поддерживается """
+        page, page_error = get_page(request.query_params)
+        if page_error:
+            return None, None, Response(page_error, status=status.HTTP_400_BAD_REQUEST)
+        # потоковая отдача списка (?stream=1, ?stream=ndjson или Accept: application/x-ndjson)
+        return page, stream_format(request) if self.STREAMING else None, None
+
+    def config_values(self, configs: Tuple[Dict, int]) -> Tuple[Optional[Dict], Optional[Response]]:
+        """
+        Значения из ответа сервиса конфигов по путям CONFIG_VALUES.
+        Если сервис конфигов вернул ошибку или конфигурации в неправильном формате, вместо значений возвращается ответ.
+        """
+        if configs[1] > 200:
+            return None, Response({'detail': configs[0]}, status=configs[1])
+        try:
+            values = {}
+            for name, path in self.CONFIG_VALUES.items():
+                value = configs[0].get('data')
+                for key in path:
+                    value = value.get(key)
+                values[name] = value
+        except (AttributeError, TypeError):
+            return None, Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
+        return values, None
+
+    @staticmethod
+    def page_response(result_data: Tuple[Dict, int], page: Optional[Dict], stream: Optional[str],
+                      asynchronous: bool = False):
+        """ Ответ со страницей списка из результата сервисного слоя, потоковый при stream """
+        result_data = paginate(result_data, page)
+        if stream:
+            response = streaming_response(result_data, stream, asynchronous=asynchronous)
+            if response is not None:
+                return response
+        return Response(result_data[0], status=result_data[1])
+
+    @staticmethod
+    def bad_request(serializer) -> Response:
+        response = {'detail': {
+            "code": "BAD_REQUEST",
+            "message": serializer.errors
+        }}
+        return Response(response, status=status.HTTP_400_BAD_REQUEST)
+
 
 class ArchiveContestsView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [JSONParser]
 
+    CONFIGS = ['node_id', 'contest_process_id', 'contest_status_id']
+    CONFIG_VALUES = {
+        'node_id': ('node_id', 'value'),
+        'contest_process_id': ('contest_process_id', 'value'),
+        'status_id_done': ('contest_status_id', 'done'),
+        'status_id_no_winner': ('contest_status_id', 'no_winner'),
+    }
+
+    @staticmethod
+    def contests_query(values: Dict) -> Dict:
+        return dict(
+            node_id=values['node_id'],
+            process_id=values['contest_process_id'],
+            status_ids=(values['status_id_done'], values['status_id_no_winner']),
+            message="Получение списка всех конкурсов со статусом Завершен и Победитель не выбран. Архив конкурсов."
+        )
+
     @extend_schema(
         summary="Получение списка архивных конкурсов",
         description="Получение списка всех конкурсов со статусом Завершен и Победитель не выбран. Архив конкурсов.",
         parameters=[
+            PaginationSerializer,
             OpenApiParameter('Project-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER, required=True),
             OpenApiParameter('Account-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER)
         ],
@@ -62,48 +171,48 @@ class ArchiveContestsView(BaseContestView):
     )
     def get(self, request):
         access_token = get_token()
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['node_id', 'contest_process_id', 'contest_status_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            node_id = configs.get('data').get('node_id').get('value')
-            contest_process_id = configs.get('data').get('contest_process_id').get('value')
-            status_id_done = configs.get('data').get('contest_status_id').get('done')
-            status_id_no_winner = configs.get('data').get('contest_status_id').get('no_winner')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
-        result_data = get_contests(
-            token=access_token,
-            node_id=node_id,
-            process_id=contest_process_id,
-            status_ids=(status_id_done, status_id_no_winner),
-            projects_ids=None,
-            message="Получение списка всех конкурсов со статусом Завершен и Победитель не выбран. Архив конкурсов."
-        )
-
-        return Response(result_data[0], status=result_data[1])
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        contests = self.contests_query(values)
+        # список из локальной модели чтения, если она включена и синхронизирована недавно, иначе из Райды
+        result_data = read_contests(**contests)
+        if result_data is None:
+            result_data = get_contests_cached(token=access_token, projects_ids=None, **contests)
+        return self.page_response(result_data, page, stream)
 
 
 class ActiveContestsView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [JSONParser]
 
+    CONFIGS = ['node_id', 'contest_process_id', 'contest_status_id']
+    CONFIG_VALUES = {
+        'node_id': ('node_id', 'value'),
+        'contest_process_id': ('contest_process_id', 'value'),
+        'status_id_acceptance_works': ('contest_status_id', 'acceptance_works'),
+    }
+
+    @staticmethod
+    def contests_query(values: Dict) -> Dict:
+        return dict(
+            node_id=values['node_id'],
+            process_id=values['contest_process_id'],
+            status_ids=values['status_id_acceptance_works'],
+            message="Получение списка всех конкурсов со статусом Прием работ. Активные конкурсы."
+        )
+
     @extend_schema(
         summary="Получение списка активных конкурсов",
         description="Получение списка всех конкурсов со статусом Прием работ. Активные конкурсы.",
         parameters=[
+            PaginationSerializer,
             OpenApiParameter('Project-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER, required=True),
             OpenApiParameter('Account-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER)
         ],
@@ -118,41 +227,48 @@ class ActiveContestsView(BaseContestView):
     )
     def get(self, request):
         access_token = get_token()
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['node_id', 'contest_process_id', 'contest_status_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            node_id = configs.get('data').get('node_id').get('value')
-            contest_process_id = configs.get('data').get('contest_process_id').get('value')
-            status_id_acceptance_works = configs.get('data').get('contest_status_id').get('acceptance_works')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
-        result_data = get_contests(
-            token=access_token,
-            node_id=node_id,
-            process_id=contest_process_id,
-            status_ids=status_id_acceptance_works,
-            projects_ids=None,
-            message="Получение списка всех конкурсов со статусом Прием работ. Активные конкурсы."
-        )
-        return Response(result_data[0], status=result_data[1])
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        contests = self.contests_query(values)
+        # список из локальной модели чтения, если она включена и синхронизирована недавно, иначе из Райды
+        result_data = read_contests(**contests)
+        if result_data is None:
+            result_data = get_contests_cached(token=access_token, projects_ids=None, **contests)
+        return self.page_response(result_data, page, stream)
 
 
 class ContestDetailsView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
 
+    CONFIGS = ['task_process_id', 'node_id', 'task_status_id', 'contest_process_id']
+    CONFIG_VALUES = {
+        'task_process_id': ('task_process_id', 'value'),
+        'contest_process_id': ('contest_process_id', 'value'),
+        'node_id': ('node_id', 'value'),
+        'task_status_id': ('task_status_id',),
+    }
+
+    @staticmethod
+    def details_response(contest: Tuple[Dict, int], result: Tuple[Dict, int], values: Dict) -> Response:
+        """ Ответ из данных конкурса и заявки пользователя на участие в нем """
+        # проверяем, существует ли такой конкурс
+        if contest[1] != 200 or not is_normalized_contest(contest[0], values['contest_process_id']):
+            return Response({'detail': dict(code='NOT_FOUND', message='Конкурс не найден.')},
+                            status=status.HTTP_404_NOT_FOUND)
+        # id заявки пользователя на участие в конкурсе, если она есть, и ее статус (отправлено решение или нет)
+        if result[1] != 200:
+            return Response({'detail': result[0]}, status=result[1])
+        user_data = {'user_task_id': result[0].get('user_task'), 'user_task_status': result[0].get('task_status')}
+        response_data = contest_details_response({**contest[0]['data'], **user_data})
+        return Response(response_data, status=contest[1])
+
     @extend_schema(
         summary="Получение конкретного конкурса",
         description="Получение данных одного конкурса по его id",
@@ -170,54 +286,57 @@ class ContestDetailsView(BaseContestView):
         tags=['Contests']
     )
     def get(self, request, contest_id):
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
         # валидируем заголовки
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        # получаем токен из заголовков для авторизации в сервисе конфигов
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
+        query, error = self.configs_request(request)
+        if error:
+            return error
         # получаем конфиги из сервиса конфигов
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['task_process_id', 'node_id', 'task_status_id', 'contest_process_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            task_process_id = configs.get('data').get('task_process_id').get('value')
-            contest_process_id = configs.get('data').get('contest_process_id').get('value')
-            node_id = configs.get('data').get('node_id').get('value')
-            task_status_id = configs.get('data').get('task_status_id')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
         # получаем токен для доступа к Райде
         access_token = get_token()
-        # проверяем, существует ли такой конкурс
-        if not contest_exists(access_token, contest_id, node_id, contest_process_id):
-            return Response({'detail': dict(code='NOT_FOUND', message='Конкурс не найден.')},
-                            status=status.HTTP_404_NOT_FOUND)
         # получаем id пользователя из объекта Request
         user_id = request.auth.get('user_id')
-        # получаем id заявки пользователя на участие в конкурсе, если она есть, и ее статус (отправлено решение или нет)
-        result = get_user_task(access_token, contest_id, user_id, task_process_id, node_id, task_status_id)
-        if result[1] != 200:
-            return Response({'detail': result[0]}, status=result[1])
-        user_data = {'user_task_id': result[0].get('user_task'), 'user_task_status': result[0].get('task_status')}
-        contest_data = get_contest(access_token, contest_id, node_id)
-        response_data = contest_data[0]
-        if contest_data[1] == 200:
-            response_data['data'].update(user_data)
-        return Response(response_data, status=contest_data[1])
+        # параллельно получаем данные конкурса и заявку пользователя на участие в нем
+        # данные конкурса общие для всех пользователей и берутся из кэша (или модели чтения),
+        # заявка пользователя - из индекса участия пользователя (get_participation)
+        contest_future = details_executor.submit(in_request_context(get_contest_cached), access_token, contest_id,
+                                                 values['node_id'], fetch_contest_local)
+        task_future = details_executor.submit(in_request_context(get_user_task), access_token, contest_id, user_id,
+                                              values['task_process_id'], values['node_id'], values['task_status_id'])
+        contest = contest_future.result()
+        result = task_future.result()
+        return self.details_response(contest, result, values)
 
 
 class QuitContestView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
 
+    CONFIGS = ['task_process_id', 'contest_process_id', 'node_id', 'task_status_id']
+    CONFIG_VALUES = {
+        'task_process_id': ('task_process_id', 'value'),
+        'node_id': ('node_id', 'value'),
+        'task_status_id': ('task_status_id',),
+        'task_status_rejection': ('task_status_id', 'rejection'),
+    }
+
+    @staticmethod
+    def task_solution_error(task_solution: Tuple[Dict, int]) -> Optional[Response]:
+        """ Ответ с ошибкой, если заявки нет или ее статус не удалось получить """
+        if task_solution[1] > 200:
+            return Response({'detail': task_solution[0]}, status=task_solution[1])
+        if task_solution[0].get('code') not in ('TASK_COMPLETED', 'TASK_UNCOMPLETED'):
+            return Response({'detail': dict(code='NOT_FOUND', message='Заявка на участие не найдена.')},
+                            status=status.HTTP_404_NOT_FOUND)
+        return None
+
+    @staticmethod
+    def quit_response(response_data: Tuple[Dict, int]) -> Response:
+        if response_data[1] > 200:
+            return Response({'detail': response_data[0]}, status=response_data[1])
+        return Response(data={'detail': {'code': 'OK', 'message': 'Статус заявки изменен на "Отказ"'}}, status=status.HTTP_200_OK)
+
     @extend_schema(
         summary="Отказ от участия в конкурсе",
         description="Отказ от участия в конкурсе: изменение статуса заявки на 'Отказ'",
@@ -235,51 +354,59 @@ class QuitContestView(BaseContestView):
         tags=['Contests']
     )
     def delete(self, request, task_id):
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
         # валидируем заголовки
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        # получаем токен из заголовков для авторизации в сервисе конфигов
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
+        query, error = self.configs_request(request)
+        if error:
+            return error
         # получаем конфиги из сервиса конфигов
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['task_process_id', 'contest_process_id', 'node_id', 'task_status_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            task_process_id = configs.get('data').get('task_process_id').get('value')
-            node_id = configs.get('data').get('node_id').get('value')
-            task_status_id = configs.get('data').get('task_status_id')
-            task_status_rejection = configs.get('data').get('task_status_id').get('rejection')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
         # получаем токен для запросов в Райду
         access_token = get_token()
+        user_id = request.auth.get('user_id')
         # проверяем, есть ли заявка на конкурс с данным task_id
-        task_solution = task_solution_status(access_token, task_id, task_process_id, node_id, task_status_id)
-        if task_solution[1] > 200:
-            return Response({'detail': task_solution[0]}, status=task_solution[1])
-        task_solution = task_solution[0]
-        if task_solution.get('code') not in ('TASK_COMPLETED', 'TASK_UNCOMPLETED'):
-            return Response({'detail': dict(code='NOT_FOUND', message='Заявка на участие не найдена.')},
-                            status=status.HTTP_404_NOT_FOUND)
+        task_solution = task_solution_status(access_token, task_id, values['task_process_id'], values['node_id'],
+                                             values['task_status_id'])
+        error = self.task_solution_error(task_solution)
+        if error:
+            return error
         # меняем статус заявки на конкурс на "Отказ"
-        response_data = patch_task(access_token, task_id, node_id, task_status_rejection, {})
-        if response_data[1] > 200:
-            return Response({'detail': response_data[0]}, status=response_data[1])
-        return Response(data={'detail': {'code': 'OK', 'message': 'Статус заявки изменен на "Отказ"'}}, status=status.HTTP_200_OK)
+        response_data = patch_task(access_token, task_id, values['node_id'], values['task_status_rejection'], {}, user_id,
+                                   values['task_process_id'])
+        return self.quit_response(response_data)
 
 
 class UserTaskView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
 
+    CONFIGS = ['task_process_id', 'contest_process_id', 'node_id', 'task_status_id']
+    CONFIG_VALUES = {
+        'task_process_id': ('task_process_id', 'value'),
+        'contest_process_id': ('contest_process_id', 'value'),
+        'node_id': ('node_id', 'value'),
+        'task_status_id': ('task_status_id',),
+        'task_status_new': ('task_status_id', 'new'),
+    }
+
+    @staticmethod
+    def existing_task_error(task: Tuple[Dict, int]) -> Optional[Response]:
+        """ Ответ с ошибкой, если заявку не удалось получить или она уже существует """
+        if task[1] > 200:
+            return Response({'detail': task[0]}, status=task[1])
+        if task[0] and task[0].get('user_task'):
+            response = {
+                "detail": {
+                    "code": "ENTITY_EXISTS",
+                    "message": "Задача для участия в конкурсе уже существует."
+                },
+                "info": {
+                    "api_version": "0.0.1",
+                }
+            }
+            return Response(response, status=status.HTTP_409_CONFLICT)
+        return None
+
     @extend_schema(
         summary="Создание задачи для участия в конкурсе",
         description="Создание задачи для участия в конкурсе",
@@ -302,74 +429,70 @@ class UserTaskView(BaseContestView):
         tags=['Contests']
     )
     def post(self, request):
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
-        # валидируем заголовкм
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        # получаем токен из заголовков для авторизации в сервисе конфигов
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
+        # валидируем заголовки
+        query, error = self.configs_request(request)
+        if error:
+            return error
         # получаем конфиги из сервиса конфигов
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['task_process_id', 'contest_process_id', 'node_id', 'task_status_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            task_process_id = configs.get('data').get('task_process_id').get('value')
-            contest_process_id = configs.get('data').get('contest_process_id').get('value')
-            node_id = configs.get('data').get('node_id').get('value')
-            task_status_id = configs.get('data').get('task_status_id')
-            task_status_new = configs.get('data').get('task_status_id').get('new')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
         # получаем id пользователя из объекта Request
         user_id = request.auth.get('user_id')
         # валидируем данные, полученные от пользователя
         serializer = CreateTaskSerializer(data=request.data)
-        if serializer.is_valid():
-            contest_id = serializer.validated_data['contest_id']
-            # получаем токен для запросов в Райду
-            access_token = get_token()
-            # проверяем, есть ли конкурс с данным contest_id
-            if contest_exists(access_token, contest_id, node_id, contest_process_id):
-                # проверяем, есть ли заявка на данный конкурс с любым статусом, кроме "Отказ"
-                task = get_user_task(access_token, contest_id, user_id, task_process_id, node_id, task_status_id)
-                if task[1] > 200:
-                    return Response({'detail': task[0]}, status=task[1])
-                if task[0] and task[0].get('user_task'):
-                    response = {
-                        "detail": {
-                            "code": "ENTITY_EXISTS",
-                            "message": "Задача для участия в конкурсе уже существует."
-                        },
-                        "info": {
-                            "api_version": "0.0.1",
-                        }
-                    }
-                    return Response(response, status=status.HTTP_409_CONFLICT)
-                # создаем новую заявку на участие в конкурсе
-                new_contest = create_task(access_token, contest_id, user_id, node_id, task_process_id,
-                                          task_status_new)
-                return Response(new_contest[0], status=new_contest[1])
+        if not serializer.is_valid():
+            return self.bad_request(serializer)
+        contest_id = serializer.validated_data['contest_id']
+        # получаем токен для запросов в Райду
+        access_token = get_token()
+        # проверяем, есть ли конкурс с данным contest_id
+        if not contest_exists(access_token, contest_id, values['node_id'], values['contest_process_id']):
             return Response({'detail': dict(code='NOT_FOUND', message='Конкурс не найден.')},
                             status=status.HTTP_404_NOT_FOUND)
-        response = {'detail': {
-            "code": "BAD_REQUEST",
-            "message": serializer.errors
-        }}
-        return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        # проверяем, есть ли заявка на данный конкурс с любым статусом, кроме "Отказ"
+        task = get_user_task(access_token, contest_id, user_id, values['task_process_id'], values['node_id'],
+                             values['task_status_id'], fresh=True)
+        error = self.existing_task_error(task)
+        if error:
+            return error
+        # создаем новую заявку на участие в конкурсе
+        new_contest = create_task(access_token, contest_id, user_id, values['node_id'], values['task_process_id'],
+                                  values['task_status_new'])
+        return Response(new_contest[0], status=new_contest[1])
 
 
 class SolutionView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = (JSONParser, MultiPartParser)
 
+    CONFIGS = ['task_process_id', 'contest_process_id', 'node_id', 'task_status_id']
+    CONFIG_VALUES = {
+        'task_process_id': ('task_process_id', 'value'),
+        'node_id': ('node_id', 'value'),
+        'task_status_id': ('task_status_id',),
+    }
+
+    @staticmethod
+    def workflow_arguments(request, serializer, values: Dict) -> Dict:
+        """ Параметры отправки решения: заявка, файл и кастомные поля, если они были переданы """
+        solution_link = serializer.validated_data['solution_link'] if 'solution_link' in serializer.validated_data else None
+        comments = serializer.validated_data['comments'] if 'comments' in serializer.validated_data else None
+        custom_fields = {}
+        if solution_link:
+            custom_fields['solution_link'] = solution_link
+        if comments:
+            custom_fields['comments'] = comments
+        return dict(
+            node_id=values['node_id'],
+            task_process_id=values['task_process_id'],
+            task_status_id=values['task_status_id'],
+            user_id=request.auth.get('user_id'),
+            task_id=serializer.validated_data['task_id'],
+            file=request.FILES.getlist("solution_file")[0],
+            custom_fields=custom_fields
+        )
+
     @extend_schema(
         summary="Отправить решение на конкурс",
         description="Отправить решение на конкурс",
@@ -383,86 +506,75 @@ class SolutionView(BaseContestView):
                 description="Successful Response",
                 response=ErrorResponseSerializer()
             ),
+            413: OpenApiResponse(
+                description="Размер файла решения превышает допустимый",
+                response=ErrorResponseSerializer()
+            ),
             **BaseContestView.COMMON_RESPONSES
         },
         tags=['Contests']
     )
     def post(self, request):
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
         # валидируем заголовки
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        # получаем токен из заголовков для авторизации в сервисе конфигов
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
+        query, error = self.configs_request(request)
+        if error:
+            return error
         # получаем конфиги из сервиса конфигов
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['task_process_id', 'contest_process_id', 'node_id', 'task_status_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            task_process_id = configs.get('data').get('task_process_id').get('value')
-            node_id = configs.get('data').get('node_id').get('value')
-            task_status_id = configs.get('data').get('task_status_id')
-            task_status_completed = configs.get('data').get('task_status_id').get('completed')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
-        # получаем id пользователя из объекта Request
-        user_id = request.auth.get('user_id')
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
         # валидируем данные, полученные от пользователя
         serializer = SolutionSerializer(data=request.data)
-        if serializer.is_valid():
-            task_id = serializer.validated_data['task_id']
-            # получаем токен для доступа к Райде
-            access_token = get_token()
-            # проверяем, существует ли заявка с таким task_id, и было ли к ней прикреплено решение
-            task_status = task_solution_status(access_token, task_id, task_process_id, node_id, task_status_id)
-            if task_status[1] > 200:
-                return Response({'detail': task_status[0]}, status=task_status[1])
-            task_status = task_status[0]
-            # если решение не было отправлено ранее
-            if task_status.get('code') == 'TASK_UNCOMPLETED':
-                solution_file = request.FILES.getlist("solution_file")
-                # посылаем полученный файл в Райду
-                send_solution = post_attachments(access_token, task_id, user_id, node_id, solution_file[0])
-                if send_solution[1] > 200:
-                    return Response({'detail': send_solution[0]}, status=send_solution[1])
-                # составляем словарь для кастомных полей, если они были переданы
-                solution_link = serializer.validated_data['solution_link'] if 'solution_link' in serializer.validated_data else None
-                comments = serializer.validated_data['comments'] if 'comments' in serializer.validated_data else None
-                custom_fields = {}
-                if solution_link:
-                    custom_fields['solution_link'] = solution_link
-                if comments:
-                    custom_fields['comments'] = comments
-                # меняем статус заявки на "решение отправлено" и добавляем к заявке ссылку на решение и комментарии
-                change_status = patch_task(access_token, task_id, node_id, task_status_completed, custom_fields)
-                if change_status[1] > 200:
-                    return Response({'detail': change_status[0]}, status=change_status[1])
-                return Response({'detail': {'code': 'OK', 'message': 'Решение успешно отправлено'}}, status=status.HTTP_200_OK)
-            else:
-                return Response({'detail': task_status}, status=status.HTTP_400_BAD_REQUEST)
-        response = {'detail': {
-            "code": "BAD_REQUEST",
-            "message": serializer.errors
-        }}
-        return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return self.bad_request(serializer)
+        # получаем токен для доступа к Райде
+        access_token = get_token()
+        # проверяем заявку, затем посылаем файл в Райду и меняем статус заявки на "решение отправлено"
+        data, status_code = SubmissionWorkflow(access_token, **self.workflow_arguments(request, serializer, values)).run()
+        return Response(data, status=status_code)
 
 
 class UserTasksView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [JSONParser]
 
+    CONFIGS = ['node_id', 'contest_process_id', 'contest_status_id', 'task_status_id', 'task_process_id']
+    CONFIG_VALUES = {
+        'node_id': ('node_id', 'value'),
+        'contest_process_id': ('contest_process_id', 'value'),
+        'process_task_id': ('task_process_id', 'value'),
+        'acceptance_works': ('contest_status_id', 'acceptance_works'),
+        'acceptance_works_done': ('contest_status_id', 'acceptance_works_done'),
+        'voting': ('contest_status_id', 'voting'),
+        'sum_results': ('contest_status_id', 'sum_results'),
+        'done': ('contest_status_id', 'done'),
+        'task_status_id_rejection': ('task_status_id', 'rejection'),
+    }
+
+    @staticmethod
+    def tasks_query(values: Dict) -> Dict:
+        return dict(
+            node_id=values['node_id'],
+            process_id=values['contest_process_id'],
+            process_task_id=values['process_task_id'],
+            status_ids=(
+                values['acceptance_works'],
+                values['acceptance_works_done'],
+                values['voting'],
+                values['sum_results'],
+                values['done']
+            ),
+            task_status_id_rejection=values['task_status_id_rejection'],
+            projects_ids=None,
+            message="Получение списка всех конкурсов со статусом Прием работ, Прием работ окончен, Голосование, "
+                    "Подведение итогов, Завершен. Для раздела мои задания."
+        )
+
     @extend_schema(
         summary="Получение списка заданий пользователя",
         description="Получение списка всех заданий пользователя. Мои задания.",
         parameters=[
+            PaginationSerializer,
             OpenApiParameter('Project-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER, required=True),
             OpenApiParameter('Account-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER)
         ],
@@ -478,63 +590,42 @@ class UserTasksView(BaseContestView):
     )
     def get(self, request):
         access_token = get_token()
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['node_id', 'contest_process_id', 'contest_status_id', 'task_status_id', 'task_process_id']
-        )
-
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            node_id = configs.get('data').get('node_id').get('value')
-            contest_process_id = configs.get('data').get('contest_process_id').get('value')
-            process_task_id = configs.get('data').get('task_process_id').get('value')
-            acceptance_works = configs.get('data').get('contest_status_id').get('acceptance_works')
-            acceptance_works_done = configs.get('data').get('contest_status_id').get('acceptance_works_done')
-            voting = configs.get('data').get('contest_status_id').get('voting')
-            sum_results = configs.get('data').get('contest_status_id').get('sum_results')
-            done = configs.get('data').get('contest_status_id').get('done')
-            task_status_id_rejection = configs.get('data').get('task_status_id').get('rejection')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
-        if request.auth:
-            user_id = request.auth.get('user_id')
-
-        result_data = get_tasks(
-            token=access_token,
-            node_id=node_id,
-            process_id=contest_process_id,
-            process_task_id=process_task_id,
-            status_ids=(
-                acceptance_works,
-                acceptance_works_done,
-                voting,
-                sum_results,
-                done
-            ),
-            task_status_id_rejection=task_status_id_rejection,
-            projects_ids=None,
-            user_id=user_id,
-            message="Получение списка всех конкурсов со статусом Прием работ, Прием работ окончен, Голосование, "
-                    "Подведение итогов, Завершен. Для раздела мои задания."
-        )
-
-        return Response(result_data[0], status=result_data[1])
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        result_data = get_tasks(token=access_token, user_id=request.auth.get('user_id'), **self.tasks_query(values))
+        return self.page_response(result_data, page, stream)
 
 
 class UserHistoryView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [JSONParser]
 
+    CONFIGS = ['node_id', 'contest_process_id', 'task_process_id', 'contest_status_id']
+    CONFIG_VALUES = {
+        'node_id': ('node_id', 'value'),
+        'contest_process_id': ('contest_process_id', 'value'),
+        'task_process_id': ('task_process_id', 'value'),
+        'done': ('contest_status_id', 'done'),
+    }
+
+    @staticmethod
+    def history_query(values: Dict) -> Dict:
+        return dict(
+            node_id=values['node_id'],
+            process_id=values['contest_process_id'],
+            task_process_id=values['task_process_id'],
+            status_ids=values['done'],
+            projects_ids=None,
+            message="Получение списка всех конкурсов со статусом Завершен. Для раздела история участия."
+        )
+
     @extend_schema(
         summary="Получение списка завершенных конкурсов пользователя",
         description="Получение списка всех завершенных конкурсов, где пользователя участвовал. История участия.",
@@ -553,55 +644,57 @@ class UserHistoryView(BaseContestView):
     )
     def get(self, request, user_id=None):
         access_token = get_token()
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['node_id', 'contest_process_id', 'task_process_id', 'contest_status_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            node_id = configs.get('data').get('node_id').get('value')
-            contest_process_id = configs.get('data').get('contest_process_id').get('value')
-            task_process_id = configs.get('data').get('task_process_id').get('value')
-            done = configs.get('data').get('contest_status_id').get('done')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
         if user_id is None and request.auth:
             user_id = request.auth.get('user_id')
-
-        result_data = get_history(
-            token=access_token,
-            node_id=node_id,
-            process_id=contest_process_id,
-            task_process_id=task_process_id,
-            status_ids=(
-                done
-            ),
-            projects_ids=None,
-            user_id=user_id,
-            message="Получение списка всех конкурсов со статусом Завершен. Для раздела история участия."
-        )
+        result_data = get_history(token=access_token, user_id=user_id, **self.history_query(values))
         return Response(result_data[0], status=result_data[1])
 
 
 class ContestTasksView(BaseContestView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [JSONParser]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    # задачи конкурса без пагинации преобразуются по мере потоковой отдачи (?stream)
+    STREAMING = True
+
+    CONFIGS = ['node_id', 'task_process_id', 'task_status_id']
+    CONFIG_VALUES = {
+        'node_id': ('node_id', 'value'),
+        'task_process_id': ('task_process_id', 'value'),
+        'status_id_task_approved': ('task_status_id', 'approved'),
+        'status_id_task_completed': ('task_status_id', 'completed'),
+    }
+
+    @staticmethod
+    def tasks_query(request, values: Dict, contest_id) -> Dict:
+        status_ids = request.query_params.getlist('status')
+
+        if not status_ids:
+            status_ids = (values['status_id_task_approved'], values['status_id_task_completed'])
+        else:
+            status_ids = tuple(status_ids) if len(status_ids) > 1 else ''.join(status_ids)
+
+        return dict(
+            node_id=values['node_id'],
+            process_id=values['task_process_id'],
+            contest_id=contest_id,
+            task_status=status_ids,
+            message="Получение списка задач конкурса по статусам"
+        )
 
     @extend_schema(
         summary="Получение списка задач конкурса по статусам",
         description="Получение списка задач/участий в конкурсах по переданным статусам/у в рамках конкретного конкурса",
         parameters=[
             QueryParamsSerializer,
+            PaginationSerializer,
+            BaseContestView.STREAM_PARAMETER,
             OpenApiParameter('Project-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER, required=True),
             OpenApiParameter('Account-ID', OpenApiTypes.UUID, OpenApiParameter.HEADER)
         ],
@@ -616,42 +709,20 @@ class ContestTasksView(BaseContestView):
     )
     def get(self, request, contest_id):
         access_token = get_token()
-        project_id = request.META.get('HTTP_PROJECT_ID') if request.META.get('HTTP_PROJECT_ID') else None
-        account_id = request.META.get('HTTP_ACCOUNT_ID') if request.META.get('HTTP_ACCOUNT_ID') else None
-        serializer = HeadersSerializer(data={'project_id': project_id, 'account_id': account_id})
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
-        auth_token = request.META.get('HTTP_AUTHORIZATION')
-        configs = get_configs(
-            project_id=project_id,
-            account_id=account_id,
-            auth_token=auth_token,
-            configs=['node_id', 'task_process_id', 'task_status_id']
-        )
-        if configs[1] > 200:
-            return Response({'detail': configs[0]}, status=configs[1])
-        configs = configs[0]
-        try:
-            node_id = configs.get('data').get('node_id').get('value')
-            task_process_id = configs.get('data').get('task_process_id').get('value')
-            status_id_task_approved = configs.get('data').get('task_status_id').get('approved')
-            status_id_task_completed = configs.get('data').get('task_status_id').get('completed')
-        except:
-            return Response(data={'detail': {'code': 'SERVICE_ERROR', 'message': 'Неправильный формат конфигураций для проекта'}}, status=500)
-
-        status_ids = request.query_params.getlist('status')
-
-        if not status_ids:
-            status_ids = (status_id_task_approved, status_id_task_completed)
+        query, error = self.configs_request(request)
+        if error:
+            return error
+        page, stream, error = self.list_options(request)
+        if error:
+            return error
+        values, error = self.config_values(get_configs(configs=self.CONFIGS, **query))
+        if error:
+            return error
+        tasks = self.tasks_query(request, values, contest_id)
+        if stream and page is None:
+            # без пагинации задачи преобразуются по мере потоковой отдачи, мимо кэша
+            result_data = get_contest_tasks(token=access_token, lazy=True, **tasks)
         else:
-            status_ids = tuple(status_ids) if len(status_ids) > 1 else ''.join(status_ids)
-
-        result_data = get_contest_tasks(
-            token=access_token,
-            node_id=node_id,
-            process_id=task_process_id,
-            contest_id=contest_id,
-            task_status=status_ids,
-            message="Получение списка задач конкурса по статусам"
-        )
-        return Response(result_data[0], status=result_data[1])
+            # страницы одного списка берутся из короткого кэша, а не повторным запросом к Райде
+            result_data = get_contest_tasks_cached(token=access_token, **tasks)
+        return self.page_response(result_data, page, stream)
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'step.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from contests.uploads import UploadSizeLimitMiddleware  # noqa: E402
+
+# слишком большие загрузки отклоняются по Content-Length до того, как Django прочитает тело запроса
+application = UploadSizeLimitMiddleware(django_application)
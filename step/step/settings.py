@@ -63,7 +63,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'corsheaders.middleware.CorsMiddleware'
+    'corsheaders.middleware.CorsMiddleware',
+    'contests.resilience.RequestDeadlineMiddleware',
+    'contests.metrics.UpstreamMetricsMiddleware',
+    'contests.timing.ServerTimingMiddleware',
 ]
 
 SITE_ID = 1
@@ -94,8 +97,142 @@ PASSWORD = str(os.getenv('PASSWD_RAIDA'))
 ACCESS_TOKEN_PUBLIC_KEY = os.getenv('ACCESS_TOKEN_PUBLIC_KEY')
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM')
 
+# Кэш проверенных JWT-токенов: максимальное число записей и время жизни записи, в секундах
+# (запись не живет дольше срока действия токена)
+JWT_CACHE_MAXSIZE = int(os.getenv('JWT_CACHE_MAXSIZE', 4096))
+JWT_CACHE_TTL = int(os.getenv('JWT_CACHE_TTL', 300))
+
 CONFIGS_SERVICE_URL = os.getenv('CONFIGS_SERVICE_URL')
 
+# Максимальное число параллельных запросов к Райде в рамках одного запроса к API
+UPSTREAM_MAX_WORKERS = int(os.getenv('UPSTREAM_MAX_WORKERS', 8))
+
+# Потоки общего пула страницы конкурса (на каждый воркер): запрос к API занимает два потока
+CONTEST_DETAILS_WORKERS = int(os.getenv('CONTEST_DETAILS_WORKERS', 16))
+
+# Пул keep-alive соединений к Райде и сервису конфигов (на каждый воркер) и таймауты запросов, в секундах
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 20))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', 30))
+
+# Ограничение одновременных запросов к каждому внешнему сервису (на каждый воркер) и время ожидания
+# свободного места, в секундах; запрос, не дождавшийся места, отклоняется с ответом 503
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', 20))
+UPSTREAM_BULKHEAD_WAIT = float(os.getenv('UPSTREAM_BULKHEAD_WAIT', 1))
+
+# Автоматический выключатель для Райды и сервиса конфигов (contests.resilience): число последних вызовов
+# в окне, минимальное число вызовов для решения, доли ошибок и медленных вызовов для размыкания,
+# длительность медленного вызова и время в разомкнутом состоянии (в секундах), число пробных вызовов
+CIRCUIT_BREAKER_WINDOW = int(os.getenv('CIRCUIT_BREAKER_WINDOW', 50))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv('CIRCUIT_BREAKER_MIN_CALLS', 10))
+CIRCUIT_BREAKER_ERROR_RATE = float(os.getenv('CIRCUIT_BREAKER_ERROR_RATE', 0.5))
+CIRCUIT_BREAKER_SLOW_RATE = float(os.getenv('CIRCUIT_BREAKER_SLOW_RATE', 0.8))
+CIRCUIT_BREAKER_SLOW_CALL = float(os.getenv('CIRCUIT_BREAKER_SLOW_CALL', 5))
+CIRCUIT_BREAKER_OPEN_TIMEOUT = float(os.getenv('CIRCUIT_BREAKER_OPEN_TIMEOUT', 30))
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(os.getenv('CIRCUIT_BREAKER_HALF_OPEN_CALLS', 3))
+
+# Повтор идемпотентных запросов к внешним сервисам при временных ошибках: число попыток, начальная
+# и наибольшая пауза между попытками, в секундах (пауза растет вдвое и выбирается случайно в этих пределах)
+UPSTREAM_RETRY_ATTEMPTS = int(os.getenv('UPSTREAM_RETRY_ATTEMPTS', 3))
+UPSTREAM_RETRY_BASE_DELAY = float(os.getenv('UPSTREAM_RETRY_BASE_DELAY', 0.1))
+UPSTREAM_RETRY_MAX_DELAY = float(os.getenv('UPSTREAM_RETRY_MAX_DELAY', 1))
+
+# Бюджет времени на обработку запроса к API, в секундах (0 - без ограничения): таймауты и повторы вызовов
+# внешних сервисов не выходят за него
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 20))
+
+# Отправлять заголовок Idempotency-Key при создании заявок и загрузке решений в Райду; только тогда эти запросы
+# повторяются при временных ошибках (включать, если Райда поддерживает заголовок)
+RAIDA_IDEMPOTENCY_KEYS = bool(int(os.getenv('RAIDA_IDEMPOTENCY_KEYS', 0)))
+
+# Запрашивать в RQL-запросах к Райде только используемые поля задач (проекция, см. contests.projections)
+RQL_FIELD_PROJECTION = bool(int(os.getenv('RQL_FIELD_PROJECTION', 1)))
+
+# Размер страницы списков по умолчанию (если передан только offset) и максимальный размер страницы
+PAGINATION_DEFAULT_LIMIT = int(os.getenv('PAGINATION_DEFAULT_LIMIT', 50))
+PAGINATION_MAX_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', 500))
+
+# Число элементов списка в одной части потокового ответа (?stream=1)
+STREAM_CHUNK_ITEMS = int(os.getenv('STREAM_CHUNK_ITEMS', 100))
+
+# Файлы решений: наибольший размер файла в байтах (проверяется при приеме) и размер части при передаче в Райду
+UPLOAD_MAX_FILE_SIZE = int(os.getenv('UPLOAD_MAX_FILE_SIZE', 50 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 64 * 1024))
+# Принятый файл до этого размера хранится в памяти, больше - во временном файле на диске; наибольший размер
+# остальных полей запроса (вместе с файлом задает наибольший размер тела, см. contests.uploads)
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 2621440))
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('DATA_UPLOAD_MAX_MEMORY_SIZE', 2621440))
+FILE_UPLOAD_HANDLERS = [
+    'contests.uploads.UploadSizeLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Кэш значений из сервиса конфигов (отдельно для каждого токена пользователя): время жизни записей и ошибок,
+# в секундах, и максимальное число записей
+CONFIGS_CACHE_TTL = int(os.getenv('CONFIGS_CACHE_TTL', 300))
+CONFIGS_CACHE_ERROR_TTL = int(os.getenv('CONFIGS_CACHE_ERROR_TTL', 5))
+CONFIGS_CACHE_MAXSIZE = int(os.getenv('CONFIGS_CACHE_MAXSIZE', 8192))
+
+# Кэш списков конкурсов: время жизни свежей записи и время, в течение которого отдается устаревшая запись
+# на время фонового обновления, в секундах
+CONTESTS_CACHE_ALIAS = 'default'
+CONTESTS_CACHE_TTL = int(os.getenv('CONTESTS_CACHE_TTL', 60))
+CONTESTS_CACHE_STALE_TTL = int(os.getenv('CONTESTS_CACHE_STALE_TTL', 300))
+
+# Сервисный токен Райды: за сколько секунд до истечения обновлять его в фоне, время жизни токена без claim exp
+# и кэш, через который токен разделяется между воркерами
+RAIDA_TOKEN_CACHE_ALIAS = 'default'
+RAIDA_TOKEN_REFRESH_MARGIN = int(os.getenv('RAIDA_TOKEN_REFRESH_MARGIN', 300))
+RAIDA_TOKEN_DEFAULT_TTL = int(os.getenv('RAIDA_TOKEN_DEFAULT_TTL', 3600))
+
+# Кэш данных отдельных конкурсов: время жизни свежей записи и время, в течение которого отдается устаревшая
+# запись на время фонового обновления, в секундах
+CONTEST_CACHE_TTL = int(os.getenv('CONTEST_CACHE_TTL', 30))
+CONTEST_CACHE_STALE_TTL = int(os.getenv('CONTEST_CACHE_STALE_TTL', 120))
+
+# Сколько еще хранить устаревшие списки и данные конкурсов, чтобы отдавать их, если Райда недоступна, в секундах
+CACHE_STALE_IF_ERROR = int(os.getenv('CACHE_STALE_IF_ERROR', 3600))
+
+# Индекс участия (все заявки пользователя): время жизни записи и время отдачи устаревшей записи, в секундах.
+# Изменения заявок через этот сервис сразу отражаются в индексе, TTL ограничивает отставание от изменений в Райде
+PARTICIPATION_CACHE_TTL = int(os.getenv('PARTICIPATION_CACHE_TTL', 15))
+PARTICIPATION_CACHE_STALE_TTL = int(os.getenv('PARTICIPATION_CACHE_STALE_TTL', 0))
+
+# Кэш списков задач конкурса, из которого отдаются страницы списка, в секундах
+CONTEST_TASKS_CACHE_TTL = int(os.getenv('CONTEST_TASKS_CACHE_TTL', 15))
+
+# Размер кэша преобразованных дат (строка даты из Райды и формат ответа API)
+DATE_FORMAT_CACHE_MAXSIZE = int(os.getenv('DATE_FORMAT_CACHE_MAXSIZE', 4096))
+
+# Локальная модель чтения каталога конкурсов (команда sync_contests): включение, допустимый возраст данных,
+# интервал синхронизации и интервал полной синхронизации, в секундах
+CONTESTS_READ_MODEL = bool(int(os.getenv('CONTESTS_READ_MODEL', 0)))
+CONTESTS_READ_MODEL_MAX_AGE = int(os.getenv('CONTESTS_READ_MODEL_MAX_AGE', 180))
+CONTESTS_SYNC_INTERVAL = int(os.getenv('CONTESTS_SYNC_INTERVAL', 60))
+CONTESTS_SYNC_FULL_INTERVAL = int(os.getenv('CONTESTS_SYNC_FULL_INTERVAL', 3600))
+# Процессы конкурсов для синхронизации: пары node_id:process_id через пробел
+CONTESTS_SYNC_TARGETS = [tuple(target.split(':', 1)) for target in os.getenv('CONTESTS_SYNC_TARGETS', '').split()]
+
+# Асинхронные представления (adrf + httpx) для запуска через ASGI: gunicorn -k uvicorn.workers.UvicornWorker step.asgi
+ASYNC_VIEWS = bool(int(os.getenv('ASYNC_VIEWS', 0)))
+
+# Эндпоинт /metrics (Prometheus): включение, токен (заголовок Authorization: Bearer <токен>) и адреса,
+# с которых разрешен доступ, через пробел. Пустые токен и список адресов - проверка не выполняется
+METRICS_ENABLED = bool(int(os.getenv('METRICS_ENABLED', 0)))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '').split()
+
+# Заголовок Server-Timing с временем этапов запроса (auth, headers, configs, upstream, transform, render).
+# Выключен по умолчанию: заголовок видят все клиенты API, включать для отладки
+SERVER_TIMING = bool(int(os.getenv('SERVER_TIMING', 0)))
+
+# Профилирование медленных запросов: доля запросов под cProfile (0 - выключено), порог в миллисекундах,
+# после которого отчет пишется в лог, и каталог для файлов .prof (пусто - только лог)
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_THRESHOLD_MS = int(os.getenv('PROFILE_SLOW_THRESHOLD_MS', 1000))
+PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+
 WSGI_APPLICATION = 'step.wsgi.application'
 
 # Database
@@ -110,6 +247,18 @@ DATABASES = {
 
 SCRIPT_NAME = '/archive'
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Для общего кэша между воркерами gunicorn указать, например,
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache и CACHE_LOCATION=redis://127.0.0.1:6379
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -159,9 +308,22 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'contests.authentication.JWTAuthentication',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'contests.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'contests.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Библиотека для кодирования и разбора JSON: auto (orjson, simplejson или json - первая установленная),
+# orjson, simplejson или json
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'API Contests',
     # 'DESCRIPTION': 'Текст',